@@ -11,7 +11,13 @@ def estacion_calentamiento(calentamiento, temperatura_objetivo):
     calentamiento.controlar_potencia(temperatura_objetivo)
     calentamiento.medir_temperatura()
 
-def estacion_estiramiento(estiramiento, velocidad, pasos_micro):
+def estacion_estiramiento(estiramiento, velocidad, pasos_micro, monitoreo, master):
+    # El monitoreo del diámetro corre en su hilo durante el estiramiento y hasta el reporte
+    try:
+        monitoreo.iniciar()
+        monitoreo.publicar_en_tk(master, lambda t, d: print(f"Diámetro: {d:.1f} µm"), intervalo_ms=1000)
+    except (IOError, ValueError) as e:
+        print(f"Monitoreo de diámetro no disponible: {e}")
     estiramiento.mover_motores(velocidad, pasos_micro)
 
 def estacion_enfriamiento(enfriamiento):
@@ -21,9 +27,12 @@ def estacion_corte(corte):
     corte.cortar()
     corte.recolectar()
 
-def estacion_reporte(reporte, configuracion, encendido, monitoreo):
-    diametro_final = monitoreo.medir_diametro()
-    reporte.mostrar_estado(configuracion, encendido, diametro_final)
+def estacion_reporte(reporte, configuracion, encendido, monitoreo, master):
+    monitoreo.detener()
+    if monitoreo.error is not None:
+        print(f"Error en el monitoreo de diámetro: {monitoreo.error}")
+    # El reporte se muestra cuando llega el diámetro (puede medirse un cuadro en el hilo de monitoreo)
+    monitoreo.medir_diametro(master, lambda d: reporte.mostrar_estado(configuracion, encendido, d))
 
 # ✅ AGREGA ESTA FUNCIÓN ABAJO
 def crear_estaciones(master, config, avanzar_callback):
@@ -36,7 +45,8 @@ def crear_estaciones(master, config, avanzar_callback):
         lambda: estacion_calentamiento(master.calentamiento, config.temperatura), avanzar_callback))
 
     estaciones.append(EstacionFrame(master, "Estiramiento",
-        lambda: estacion_estiramiento(master.estiramiento, config.velocidad, pasos_micro=1000), avanzar_callback))
+        lambda: estacion_estiramiento(master.estiramiento, config.velocidad, pasos_micro=1000,
+                                      monitoreo=master.monitoreo, master=master), avanzar_callback))
 
     estaciones.append(EstacionFrame(master, "Enfriamiento",
         lambda: estacion_enfriamiento(master.enfriamiento), avanzar_callback))
@@ -45,6 +55,7 @@ def crear_estaciones(master, config, avanzar_callback):
         lambda: estacion_corte(master.corte), avanzar_callback))
 
     estaciones.append(EstacionFrame(master, "Reporte",
-        lambda: estacion_reporte(master.reporte, config, master.sistema.encendido, master.monitoreo), avanzar_callback))
+        lambda: estacion_reporte(master.reporte, config, master.sistema.encendido, master.monitoreo,
+                                 master), avanzar_callback))
 
     return estaciones
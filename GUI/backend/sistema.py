@@ -1,4 +1,27 @@
 # backend/sistema.py
+import os
+import sys
+import time
+import threading
+from collections import deque
+
+# Carpeta del algoritmo PDSeI (medidor_taper.py); actualizar si el proyecto se aloja en otra ruta
+RUTA_PDSEI = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..", "PDSeI_for_tapers")
+
+ESPERA_MEDICION = 10.0   # s que el reporte espera la medición de un solo cuadro
+
+
+def pdsei():
+    # Import diferido del algoritmo PDSeI (medidor_taper y el script que carga)
+    if RUTA_PDSEI not in sys.path:
+        sys.path.append(RUTA_PDSEI)
+    import medidor_taper
+    return medidor_taper
+
+
+def leer_gris(ruta):
+    # Misma decodificación que PDSeI (BGR->GRAY salvo JPEG de un canal), para medir lo mismo
+    return pdsei().pipeline().leer_gris(ruta)
 
 class ConfiguracionParametros:
     def __init__(self, temperatura=0.0, velocidad=0.0, longitud=0.0, diametro=0.0):
@@ -63,11 +86,219 @@ class CorteRecepcion:
         print("Fibra recolectada")
 
 
+class FuenteVideo:
+    """Cuadros de un archivo de video (ruta) o de una cámara (índice) con OpenCV."""
+
+    def __init__(self, origen=0):
+        import cv2
+        self.cv2 = cv2
+        self.cap = cv2.VideoCapture(origen)
+        if not self.cap.isOpened():
+            raise IOError(f"No se pudo abrir la fuente de video: {origen}")
+        self.es_archivo = isinstance(origen, str)
+        self.fps = self.cap.get(cv2.CAP_PROP_FPS) or 0.0
+        self.n = 0
+
+    def leer(self):
+        # (tiempo en s, cuadro en gris) o None al terminar
+        ok, cuadro = self.cap.read()
+        if not ok:
+            return None
+        # En un archivo el tiempo sale del número de cuadro; en la cámara, del reloj
+        t = self.n / self.fps if self.es_archivo and self.fps > 0 else time.monotonic()
+        self.n += 1
+        if cuadro.ndim == 3:
+            cuadro = self.cv2.cvtColor(cuadro, self.cv2.COLOR_BGR2GRAY)
+        return t, cuadro
+
+    def cerrar(self):
+        self.cap.release()
+
+
+class FuenteCuadros:
+    """Cuadros ya grabados (arreglos en gris o rutas de imágenes), para probar sin cámara."""
+
+    def __init__(self, cuadros, fps=30.0):
+        self.cuadros = list(cuadros)
+        self.fps = fps
+        self.n = 0
+
+    def leer(self):
+        if self.n >= len(self.cuadros):
+            return None
+        cuadro = self.cuadros[self.n]
+        if isinstance(cuadro, str):
+            cuadro = leer_gris(cuadro)
+        t = self.n / self.fps
+        self.n += 1
+        return t, cuadro
+
+    def cerrar(self):
+        pass
+
+
 class MonitoreoDiametro:
-    def medir_diametro(self):
-        diametro = 50.0
-        print(f"Diámetro medido: {diametro} µm")
-        return diametro
+    """
+    Monitoreo del diámetro durante el estiramiento: un hilo lee cuadros de la
+    fuente (cualquier objeto con leer() -> (t, gris) | None y cerrar()),
+    calcula el ancho de la cintura con el algoritmo de PDSeI y guarda
+    (t, diámetro en µm) en un buffer circular de tamaño fijo.
+    El hilo nunca toca la interfaz: la GUI consulta ultima() o usa
+    publicar_en_tk(), que revisa el buffer con after() desde el hilo de Tk.
+    Con origen (índice de cámara o ruta de video) y sin fuente, cada iniciar()
+    abre una FuenteVideo nueva; así OpenCV no se carga al arrancar la GUI.
+    medir_diametro() también mide en el hilo y entrega el resultado con after().
+    """
+
+    def __init__(self, fuente=None, calibracion=15.15, capacidad=2000, origen=None):
+        self.fuente = fuente
+        self.origen = origen
+        self.calibracion = calibracion
+        self.mediciones = deque(maxlen=capacidad)
+        self.cuadros = 0
+        self.descartados = 0
+        self.error = None
+        self._medidor = None
+        self._lock = threading.Lock()
+        self._detener = threading.Event()
+        self._hilo = None
+        self._max_cuadros = None
+        self._t_primero = self._t_ultimo = None
+
+    def _crear_medidor(self, alto, ancho):
+        # Import diferido: el algoritmo solo se carga al medir el primer cuadro
+        medidor_taper = pdsei()
+        return medidor_taper.MedidorTaper(medidor_taper.ConfigMedicion(calibracion=self.calibracion),
+                                          alto=alto, ancho=ancho)
+
+    def medir_cuadro(self, gris):
+        # Diámetro de la cintura en µm, o None si el cuadro se descarta (en blanco, ruidoso, ...)
+        if self._medidor is None or gris.shape != (self._medidor.alto, self._medidor.ancho):
+            self._medidor = self._crear_medidor(*gris.shape)
+        cintura = self._medidor.cintura(gris)
+        return None if cintura is None else cintura[0]
+
+    def _registrar(self, t, diametro):
+        with self._lock:
+            self._t_ultimo = time.perf_counter()
+            if self.cuadros == 0:
+                self._t_primero = self._t_ultimo
+            self.cuadros += 1
+            if diametro is None:
+                self.descartados += 1
+            else:
+                self.mediciones.append((t, diametro))
+
+    @property
+    def activo(self):
+        return self._hilo is not None and self._hilo.is_alive()
+
+    def iniciar(self, fuente=None, max_cuadros=None):
+        # max_cuadros: el hilo termina solo después de medir esa cantidad de cuadros
+        if self.activo:
+            return
+        if fuente is None and self.origen is not None:
+            fuente = FuenteVideo(self.origen)
+        if fuente is not None:
+            self.fuente = fuente
+        if self.fuente is None:
+            raise ValueError("No hay fuente de cuadros para el monitoreo")
+        self.error = None
+        self._max_cuadros = max_cuadros
+        self._detener.clear()
+        self._hilo = threading.Thread(target=self._bucle, name="MonitoreoDiametro", daemon=True)
+        self._hilo.start()
+
+    def _bucle(self):
+        n = 0
+        try:
+            while not self._detener.is_set():
+                lectura = self.fuente.leer()
+                if lectura is None:
+                    break
+                t, cuadro = lectura
+                self._registrar(t, self.medir_cuadro(cuadro))
+                n += 1
+                if self._max_cuadros is not None and n >= self._max_cuadros:
+                    break
+        except Exception as e:
+            # Sin print: la consola de la GUI es un widget de Tk
+            self.error = e
+        finally:
+            self.fuente.cerrar()
+
+    def detener(self, timeout=2.0):
+        self._detener.set()
+        if self._hilo is not None:
+            self._hilo.join(timeout)
+
+    def ultima(self):
+        with self._lock:
+            return self.mediciones[-1] if self.mediciones else None
+
+    def historial(self):
+        # Copia de [(t, diámetro), ...] para graficar sin bloquear al hilo de medición
+        with self._lock:
+            return list(self.mediciones)
+
+    def cuadros_por_segundo(self):
+        # Desde el primer cuadro medido (sin la carga del algoritmo)
+        with self._lock:
+            if self.cuadros < 2:
+                return 0.0
+            return (self.cuadros - 1) / max(self._t_ultimo - self._t_primero, 1e-9)
+
+    def publicar_en_tk(self, widget, callback, intervalo_ms=100):
+        # callback(t, diámetro) en el hilo de Tk con cada medición nueva, hasta que el monitoreo termine
+        ultima_publicada = [None]
+
+        def revisar():
+            ultima = self.ultima()
+            if ultima is not None and ultima is not ultima_publicada[0]:
+                ultima_publicada[0] = ultima
+                callback(*ultima)
+            if self.activo:
+                widget.after(intervalo_ms, revisar)
+
+        widget.after(intervalo_ms, revisar)
+
+    def medir_diametro(self, widget, callback, espera=ESPERA_MEDICION):
+        # callback(diámetro en µm o None) en el hilo de Tk. Sin mediciones del
+        # monitoreo se mide un solo cuadro en el hilo de monitoreo: la carga del
+        # algoritmo y Canny no bloquean la GUI
+        def entregar():
+            ultima = self.ultima()
+            if ultima is None:
+                print("Diámetro medido: sin cuadros válidos")
+                callback(None)
+                return
+            print(f"Diámetro medido: {ultima[1]:.2f} µm")
+            callback(ultima[1])
+
+        if self.ultima() is not None or self.activo or (self.fuente is None and self.origen is None):
+            entregar()
+            return
+        try:
+            self.iniciar(max_cuadros=1)
+        except Exception as e:
+            print(f"No se pudo medir el diámetro: {e}")
+            entregar()
+            return
+
+        limite = time.monotonic() + espera
+
+        def revisar():
+            if self.activo and time.monotonic() < limite:
+                widget.after(50, revisar)
+                return
+            if self.activo:
+                self._detener.set()
+                print(f"No se pudo medir el diámetro: sin cuadro en {espera:g} s")
+            elif self.error is not None:
+                print(f"No se pudo medir el diámetro: {self.error}")
+            entregar()
+
+        widget.after(50, revisar)
 
 
 class ReporteEstado:
@@ -76,7 +307,11 @@ class ReporteEstado:
         print(f"Temp: {configuracion.temperatura} °C")
         print(f"Velocidad: {configuracion.velocidad} mm/s")
         print(f"Longitud: {configuracion.longitud} mm")
-        print(f"Diametro objetivo: {configuracion.diametro} µm")
-        print(f"Diametro final: {diametro_final} mm")
+        print(f"Diametro objetivo: {configuracion.diametro} mm")
+        # El monitoreo mide en µm; None si no hubo cuadros válidos
+        if diametro_final is None:
+            print("Diametro final: sin medición")
+        else:
+            print(f"Diametro final: {diametro_final / 1000:.3f} mm ({diametro_final:.1f} µm)")
         print(f"Estado: {'Encendido' if encendido else 'Apagado'}")
         print("----------------------------")
@@ -0,0 +1,128 @@
+# -- coding: utf-8 --
+"""
+Benchmark del arranque de la GUI.
+
+Cada medición corre en un proceso nuevo (como al encender la máquina):
+ - tiempo de importación de los módulos que usa main.py, para ver cuáles
+   pesan (tensorflow se incluye solo como referencia, si está instalado);
+ - tiempo hasta el primer cuadro: desde que arranca el intérprete hasta que la
+   ventana de selección de modo está dibujada;
+ - tiempo hasta que el botón Automático queda listo (red inversa y grilla de
+   recetas cargadas en segundo plano).
+
+Uso (desde la carpeta GUI):
+    python benchmark_arranque.py [--repeticiones N] [--sin-ventana]
+
+La parte de la ventana necesita customtkinter, pyserial y una pantalla; con
+--sin-ventana (o si faltan) solo se miden las importaciones.
+"""
+
+import os
+import sys
+import json
+import argparse
+import subprocess
+import importlib.util
+
+CARPETA = os.path.dirname(os.path.abspath(__file__))
+
+MODULOS = [
+    "numpy",
+    "customtkinter",
+    "serial",
+    "backend.sistema",
+    "modos.seleccion_modo",
+    "modos.modo_automatico",
+    "tensorflow",
+]
+
+CODIGO_IMPORTACION = r'''
+import sys, time, json
+t0 = time.perf_counter()
+import {modulo}
+sys.stdout.write(json.dumps(time.perf_counter() - t0))
+'''
+
+CODIGO_VENTANA = r'''
+import sys, time, json
+t0 = time.perf_counter()
+import main
+app = main.FiberTaperApp()
+while not app.winfo_viewable():
+    app.update()
+app.update_idletasks()
+app.update()
+t_cuadro = time.perf_counter() - t0
+while not (app.auto_listo.is_set() and app.seleccion_modo.boton_auto.cget("state") == "normal"):
+    app.update()
+    time.sleep(0.005)
+t_listo = time.perf_counter() - t0
+pesados = [m for m in ("tensorflow", "sklearn", "joblib") if m in sys.modules]
+app.destroy()
+sys.__stdout__.write(json.dumps([t_cuadro, t_listo, pesados]))
+'''
+
+
+def correr(codigo):
+    # Un proceso nuevo por medición: los tiempos incluyen importaciones en frío (salvo la caché del disco)
+    resultado = subprocess.run([sys.executable, "-c", codigo], cwd=CARPETA, capture_output=True, text=True,
+                               env=dict(os.environ, TF_CPP_MIN_LOG_LEVEL="3"))
+    if resultado.returncode != 0:
+        raise RuntimeError(resultado.stderr.strip().splitlines()[-1] if resultado.stderr.strip() else "error")
+    return json.loads(resultado.stdout.strip().splitlines()[-1])
+
+
+def disponible(modulo):
+    try:
+        return importlib.util.find_spec(modulo) is not None
+    except ModuleNotFoundError:
+        return False
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark del arranque de la GUI")
+    parser.add_argument("--repeticiones", type=int, default=3)
+    parser.add_argument("--sin-ventana", action="store_true", help="medir solo las importaciones")
+    args = parser.parse_args()
+    sys.path.insert(0, CARPETA)
+
+    print("Importación (mediana de procesos nuevos):")
+    for modulo in MODULOS:
+        if not disponible(modulo):
+            print(f"  {modulo:<24} no instalado")
+            continue
+        try:
+            tiempos = sorted(correr(CODIGO_IMPORTACION.format(modulo=modulo)) for _ in range(args.repeticiones))
+        except RuntimeError as e:
+            print(f"  {modulo:<24} error: {e}")
+            continue
+        print(f"  {modulo:<24} {tiempos[len(tiempos) // 2] * 1e3:8.1f} ms")
+
+    if args.sin_ventana:
+        return 0
+    faltan = [m for m in ("customtkinter", "serial") if not disponible(m)]
+    if faltan:
+        print(f"Sin medición de la ventana: falta {', '.join(faltan)}")
+        return 0
+
+    cuadros, listos = [], []
+    for _ in range(args.repeticiones):
+        try:
+            t_cuadro, t_listo, pesados = correr(CODIGO_VENTANA)
+        except RuntimeError as e:
+            print(f"Sin medición de la ventana: {e}")
+            return 0
+        cuadros.append(t_cuadro)
+        listos.append(t_listo)
+    cuadros.sort()
+    listos.sort()
+    print(f"Primer cuadro: {cuadros[len(cuadros) // 2] * 1e3:.0f} ms   "
+          f"modo automático listo: {listos[len(listos) // 2] * 1e3:.0f} ms")
+    if pesados:
+        print(f"* Se importaron al arrancar: {', '.join(pesados)}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,84 @@
+# -- coding: utf-8 --
+"""
+Benchmark de MonitoreoDiametro (backend/sistema.py) sin cámara.
+
+Reproduce como un clip las capturas de PDSeI_for_tapers/caracterizar (o un
+archivo de video con --video) y mide:
+ - cuadros por segundo del hilo de monitoreo (objetivo: >= 30 en un núcleo);
+ - cuánto se retrasa el hilo principal (el de Tk en la GUI) mientras tanto,
+   simulando un after() cada 10 ms;
+ - la diferencia del diámetro de cintura con ancho_min_waist_um de
+   golden/caracterizar.csv.
+
+Uso:
+    python benchmark_monitoreo.py [--cuadros N] [--capacidad N] [--video ARCHIVO]
+
+Requisitos: numpy, scipy, opencv-python, matplotlib
+"""
+
+import os
+import sys
+import csv
+import time
+import argparse
+
+from backend.sistema import MonitoreoDiametro, FuenteCuadros, FuenteVideo, RUTA_PDSEI, leer_gris
+
+CARPETA_IMAGENES = os.path.join(RUTA_PDSEI, "caracterizar")
+GOLDEN = os.path.join(RUTA_PDSEI, "golden", "caracterizar.csv")
+
+
+def correr(monitoreo, fuente, periodo_tk=0.010):
+    monitoreo.iniciar(fuente)
+    retraso_max = 0.0
+    while monitoreo.activo:
+        t0 = time.perf_counter()
+        time.sleep(periodo_tk)
+        retraso_max = max(retraso_max, time.perf_counter() - t0 - periodo_tk)
+    monitoreo.detener()
+    if monitoreo.error is not None:
+        raise monitoreo.error
+    return retraso_max
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark del monitoreo de diámetro")
+    parser.add_argument("--cuadros", type=int, default=600, help="cuadros del clip de capturas")
+    parser.add_argument("--capacidad", type=int, default=256, help="tamaño del buffer circular")
+    parser.add_argument("--video", default=None, help="archivo de video a usar en lugar de las capturas")
+    args = parser.parse_args()
+
+    monitoreo = MonitoreoDiametro(calibracion=15.15, capacidad=args.capacidad)
+
+    if args.video:
+        fuente = FuenteVideo(args.video)
+    else:
+        files = sorted(f for f in os.listdir(CARPETA_IMAGENES) if f.lower().endswith(".jpg"))
+        grises = [leer_gris(os.path.join(CARPETA_IMAGENES, f)) for f in files]
+
+        # Cintura de cada captura frente a golden
+        with open(GOLDEN, 'r', newline='', encoding='utf-8') as f:
+            golden = {row["imagen"]: float(row["ancho_min_waist_um"]) for row in csv.DictReader(f)}
+        difs = []
+        for fname, gris in zip(files, grises):
+            esperado = golden.get(os.path.splitext(fname)[0])
+            diametro = monitoreo.medir_cuadro(gris)
+            if esperado is not None and diametro is not None:
+                difs.append(abs(diametro - esperado) / esperado)
+        print(f"Cintura vs golden ({len(difs)} capturas): mayor diferencia relativa {max(difs):.1e}")
+
+        fuente = FuenteCuadros([grises[i % len(grises)] for i in range(args.cuadros)])
+
+    retraso = correr(monitoreo, fuente)
+    fps = monitoreo.cuadros_por_segundo()
+    print(f"Cuadros: {monitoreo.cuadros} ({monitoreo.descartados} descartados), "
+          f"buffer: {len(monitoreo.mediciones)}/{monitoreo.mediciones.maxlen}")
+    print(f"Monitoreo: {fps:.1f} cuadros/s   retraso máximo del hilo principal: {retraso * 1e3:.1f} ms")
+    ultima = monitoreo.ultima()
+    if ultima is not None:
+        print(f"Última medición: t = {ultima[0]:.3f} s, diámetro = {ultima[1]:.2f} µm")
+    return 0 if fps >= 30 else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
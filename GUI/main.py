@@ -1,13 +1,11 @@
 from customtkinter import CTk, CTkTextbox
 from tkinter import messagebox
-import tensorflow as tf
-import numpy as np
 import sys
+import threading
 
 from modos.seleccion_modo import SeleccionModo
 from modos.modo_manual import ModoManualFrame
 from modos.modo_pruebas import ModoPruebasFrame
-from modos.modo_automatico import ModoAutomatico
 from comunicacion.serial_com import SerialCom
 
 from backend.sistema import (
@@ -24,6 +22,9 @@ from backend.sistema import (
 from backend.estaciones import crear_estaciones
 from widgets.consola import TextRedirector
 
+# Cámara del monitoreo de diámetro (índice de OpenCV) o ruta de un video grabado
+CAMARA_MONITOREO = 0
+
 
 
 class FiberTaperApp(CTk):
@@ -40,7 +41,7 @@ class FiberTaperApp(CTk):
         self.estiramiento = EstiramientoMotorPAP()
         self.enfriamiento = Enfriamiento()
         self.corte = CorteRecepcion()
-        self.monitoreo = MonitoreoDiametro()
+        self.monitoreo = MonitoreoDiametro(origen=CAMARA_MONITOREO)
         self.reporte = ReporteEstado()
 
         self.frames_estaciones = []
@@ -59,6 +60,37 @@ class FiberTaperApp(CTk):
         )
         self.seleccion_modo.pack(fill="both", expand=True)
 
+        # La red inversa (numpy) y la grilla de recetas se cargan en segundo plano cuando ya corre mainloop
+        self.auto_listo = threading.Event()
+        self.auto_error = None
+        self.auto_mensajes = []
+        self.seleccion_modo.indicar_auto_listo(False)
+        self.after(0, self.precargar_modo_automatico)
+
+    def precargar_modo_automatico(self):
+        def cargar():
+            try:
+                from modos.modo_automatico import cargar_recetas
+                cargar_recetas(informar=self.auto_mensajes.append)
+            except Exception as e:
+                self.auto_error = e
+            self.auto_listo.set()
+
+        threading.Thread(target=cargar, daemon=True).start()
+        self.revisar_modo_automatico()
+
+    def revisar_modo_automatico(self):
+        # Tk solo desde el hilo principal: se consulta el evento con after()
+        if not self.auto_listo.is_set():
+            self.after(100, self.revisar_modo_automatico)
+            return
+        for mensaje in self.auto_mensajes:
+            print(mensaje)
+        if self.auto_error is not None:
+            print(f"No se pudo cargar la red inversa: {self.auto_error}")
+        # Con error también se habilita: al pulsarlo se reintenta y se muestra el mensaje
+        self.seleccion_modo.indicar_auto_listo(True)
+
     def iniciar_modo_manual(self):
         self.seleccion_modo.pack_forget()
         self.manual_frame = ModoManualFrame(self, self.reiniciar)
@@ -97,6 +129,7 @@ class FiberTaperApp(CTk):
             # 1. Leer parámetros desde config
             longitud = float(self.configuracion.longitud)
             diametro = float(self.configuracion.diametro)
+            from modos.modo_automatico import ModoAutomatico
             modo_auto = ModoAutomatico(self, self.reiniciar)
             comando = modo_auto.ejecutar(longitud, diametro)
             print("Comando enviado al Arduino:", comando)
@@ -0,0 +1,89 @@
+# modos/cache_recetas.py
+"""
+Caché LRU de recetas (DE, LE) del modo automático.
+
+La clave es el objetivo (longitud, diámetro) cuantizado a la resolución real
+de la máquina, y la receta guardada es la del punto cuantizado, así dos
+pedidos que la máquina no distingue reciben exactamente el mismo comando.
+La caché se guarda en un .json pequeño junto al modelo y sobrevive a los
+reinicios de la GUI; lleva la firma (hash del contenido) del .npz de la red,
+que incluye los escaladores, y se descarta sola si el modelo cambia.
+"""
+import os
+import json
+from collections import OrderedDict
+
+from modos.grilla_recetas import hash_archivo
+
+RESOLUCION_LONGITUD = 0.01     # mm
+RESOLUCION_DIAMETRO = 0.001    # mm
+CAPACIDAD = 256
+
+CARPETA = os.path.dirname(os.path.abspath(__file__))
+RUTA_CACHE = os.path.join(CARPETA, "cache_recetas.json")
+
+
+class CacheRecetas:
+    def __init__(self, ruta_npz, ruta=RUTA_CACHE, capacidad=CAPACIDAD):
+        self.ruta = ruta
+        self.capacidad = capacidad
+        self.firma = f"{hash_archivo(ruta_npz)}|{RESOLUCION_LONGITUD}|{RESOLUCION_DIAMETRO}"
+        self.recetas = OrderedDict()    # clave -> (DE, LE), de la menos a la más reciente
+        self.aciertos = 0
+        self.fallos = 0
+        self.cargar()
+
+    @staticmethod
+    def clave(longitud, diametro):
+        return (round(longitud / RESOLUCION_LONGITUD), round(diametro / RESOLUCION_DIAMETRO))
+
+    @staticmethod
+    def punto(clave):
+        # Objetivo cuantizado (longitud, diámetro) de una clave
+        return clave[0] * RESOLUCION_LONGITUD, clave[1] * RESOLUCION_DIAMETRO
+
+    def receta(self, longitud, diametro, calcular):
+        # calcular(longitud, diametro) -> (DE, LE) solo se llama si la receta no está guardada
+        clave = self.clave(longitud, diametro)
+        u = self.recetas.get(clave)
+        if u is not None:
+            self.recetas.move_to_end(clave)
+            self.aciertos += 1
+            return u
+
+        self.fallos += 1
+        u = tuple(float(v) for v in calcular(*self.punto(clave)))
+        self.recetas[clave] = u
+        if len(self.recetas) > self.capacidad:
+            self.recetas.popitem(last=False)
+        self.guardar()
+        return u
+
+    def resumen(self):
+        return f"{self.aciertos} aciertos, {self.fallos} fallos ({len(self.recetas)}/{self.capacidad} recetas)"
+
+    def cargar(self):
+        # Un archivo de otro modelo, de otra resolución o dañado se ignora (se sobrescribe en el próximo fallo)
+        try:
+            with open(self.ruta, 'r', encoding='utf-8') as f:
+                datos = json.load(f)
+            if datos.get("firma") != self.firma:
+                return
+            recetas = OrderedDict(((int(i), int(j)), (float(DE), float(LE))) for i, j, DE, LE in datos["recetas"])
+        except (OSError, ValueError, KeyError, TypeError):
+            return
+        while len(recetas) > self.capacidad:
+            recetas.popitem(last=False)
+        self.recetas = recetas
+
+    def guardar(self):
+        datos = {"firma": self.firma,
+                 "recetas": [[i, j, DE, LE] for (i, j), (DE, LE) in self.recetas.items()]}
+        tmp = self.ruta + ".tmp"
+        try:
+            with open(tmp, 'w', encoding='utf-8') as f:
+                json.dump(datos, f)
+            os.replace(tmp, self.ruta)
+        except OSError as e:
+            # Sin disco la caché sigue funcionando en memoria
+            print(f"[Recetas] No se pudo guardar la caché: {e}")
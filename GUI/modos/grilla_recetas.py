@@ -0,0 +1,150 @@
+# modos/grilla_recetas.py
+"""
+Tabla precalculada de recetas (DE, LE) de la red inversa sobre todo el rango
+de entrada válido de la GUI (longitud 4-38 mm, diámetro 0.2-1.2 mm).
+
+La red se evalúa una sola vez sobre una grilla densa y la tabla se guarda en
+un .npy que se abre en memoria mapeada; cada consulta es una interpolación
+bilineal entre los cuatro puntos vecinos, sin evaluar el modelo. Al construir
+la tabla se informa el error máximo de la interpolación frente a la red
+completa (evaluada en el centro de cada celda, donde el error es mayor).
+
+El nombre del .npy depende del contenido del .npz de la red y del tamaño de
+la grilla: si se exporta otro modelo se construye una tabla nueva y la
+anterior se borra.
+
+Uso:
+    python -m modos.grilla_recetas [--n-longitud N] [--n-diametro N]   (desde la carpeta GUI)
+"""
+import os
+import glob
+import hashlib
+import argparse
+import numpy as np
+
+RANGO_LONGITUD = (4.0, 38.0)    # mm
+RANGO_DIAMETRO = (0.2, 1.2)     # mm
+N_LONGITUD = 341                # paso de 0.1 mm
+N_DIAMETRO = 201                # paso de 0.005 mm
+
+CARPETA = os.path.dirname(os.path.abspath(__file__))
+
+
+def hash_archivo(path):
+    with open(path, 'rb') as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
+
+class GrillaRecetas:
+    def __init__(self, tabla):
+        # tabla: (n_longitud, n_diametro, 2) con (DE, LE) en cada punto de la grilla
+        self.tabla = tabla
+        self.n_longitud, self.n_diametro = tabla.shape[:2]
+        self.paso_longitud = (RANGO_LONGITUD[1] - RANGO_LONGITUD[0]) / (self.n_longitud - 1)
+        self.paso_diametro = (RANGO_DIAMETRO[1] - RANGO_DIAMETRO[0]) / (self.n_diametro - 1)
+
+    @staticmethod
+    def en_rango(longitud, diametro):
+        return (RANGO_LONGITUD[0] <= longitud <= RANGO_LONGITUD[1]
+                and RANGO_DIAMETRO[0] <= diametro <= RANGO_DIAMETRO[1])
+
+    def receta(self, longitud, diametro):
+        # Una sola consulta (DE, LE) con aritmética de Python: más rápido que consultar() para escalares
+        if not self.en_rango(longitud, diametro):
+            raise ValueError("Longitud o diámetro fuera del rango de la grilla de recetas")
+        fi = (longitud - RANGO_LONGITUD[0]) / self.paso_longitud
+        fj = (diametro - RANGO_DIAMETRO[0]) / self.paso_diametro
+        i = min(int(fi), self.n_longitud - 2)
+        j = min(int(fj), self.n_diametro - 2)
+        t, u = fi - i, fj - j
+        (a, b), (c, d) = self.tabla[i:i + 2, j:j + 2].tolist()
+        return tuple((1 - t) * (1 - u) * a[k] + (1 - t) * u * b[k] + t * (1 - u) * c[k] + t * u * d[k]
+                     for k in range(2))
+
+    def consultar(self, longitud, diametro):
+        """
+        Interpolación bilineal de (DE, LE). Acepta escalares o arreglos de la
+        misma forma; devuelve un arreglo (..., 2).
+        """
+        longitud = np.asarray(longitud, dtype=np.float64)
+        diametro = np.asarray(diametro, dtype=np.float64)
+        if (np.any(longitud < RANGO_LONGITUD[0]) or np.any(longitud > RANGO_LONGITUD[1])
+                or np.any(diametro < RANGO_DIAMETRO[0]) or np.any(diametro > RANGO_DIAMETRO[1])):
+            raise ValueError("Longitud o diámetro fuera del rango de la grilla de recetas")
+
+        fi = (longitud - RANGO_LONGITUD[0]) / self.paso_longitud
+        fj = (diametro - RANGO_DIAMETRO[0]) / self.paso_diametro
+        i = np.minimum(fi.astype(np.intp), self.n_longitud - 2)
+        j = np.minimum(fj.astype(np.intp), self.n_diametro - 2)
+        t = (fi - i)[..., None]
+        u = (fj - j)[..., None]
+        g = self.tabla
+        return ((1 - t) * (1 - u) * g[i, j] + t * (1 - u) * g[i + 1, j]
+                + (1 - t) * u * g[i, j + 1] + t * u * g[i + 1, j + 1])
+
+
+def puntos_grilla(n_longitud, n_diametro):
+    L, D = np.meshgrid(np.linspace(*RANGO_LONGITUD, n_longitud),
+                       np.linspace(*RANGO_DIAMETRO, n_diametro), indexing='ij')
+    return L, D
+
+
+def error_interpolacion(red, grilla):
+    # Centros de las celdas: el punto más lejano de los cuatro vecinos
+    L, D = puntos_grilla(grilla.n_longitud, grilla.n_diametro)
+    Lc = (L[:-1, :-1] + L[1:, 1:]) / 2
+    Dc = (D[:-1, :-1] + D[1:, 1:]) / 2
+    exacto = red.predecir(np.column_stack([Lc.ravel(), Dc.ravel()]))
+    interpolado = grilla.consultar(Lc.ravel(), Dc.ravel())
+    return np.max(np.abs(interpolado - exacto), axis=0)
+
+
+def construir_grilla(red, ruta, n_longitud=N_LONGITUD, n_diametro=N_DIAMETRO, informar=print):
+    L, D = puntos_grilla(n_longitud, n_diametro)
+    tmp = ruta + ".tmp"
+    tabla = np.lib.format.open_memmap(tmp, mode='w+', dtype=np.float64, shape=(n_longitud, n_diametro, 2))
+    # Toda la grilla en una sola evaluación vectorizada de la red
+    tabla[:] = red.predecir(np.column_stack([L.ravel(), D.ravel()])).reshape(n_longitud, n_diametro, 2)
+    tabla.flush()
+    del tabla
+    os.replace(tmp, ruta)
+
+    grilla = GrillaRecetas(np.load(ruta, mmap_mode='r'))
+    err_de, err_le = error_interpolacion(red, grilla)
+    informar(f"[Recetas] Grilla {n_longitud}x{n_diametro} guardada en {os.path.basename(ruta)}; "
+          f"error máx. de interpolación: DE {err_de:.2e} mm/s, LE {err_le:.2e} mm")
+    return grilla
+
+
+def ruta_grilla(ruta_npz, carpeta=CARPETA, n_longitud=N_LONGITUD, n_diametro=N_DIAMETRO):
+    firma = hashlib.sha256(f"{hash_archivo(ruta_npz)}|{RANGO_LONGITUD}|{RANGO_DIAMETRO}|"
+                           f"{n_longitud}|{n_diametro}".encode('utf-8')).hexdigest()[:16]
+    return os.path.join(carpeta, f"grilla_recetas_{firma}.npy")
+
+
+def obtener_grilla(red, ruta_npz, carpeta=CARPETA, n_longitud=N_LONGITUD, n_diametro=N_DIAMETRO, informar=print):
+    # Abre la tabla del modelo actual o la construye (y borra las de modelos anteriores).
+    # informar recibe el mensaje de construcción (fuera del hilo de Tk no se debe usar print)
+    ruta = ruta_grilla(ruta_npz, carpeta, n_longitud, n_diametro)
+    if os.path.exists(ruta):
+        return GrillaRecetas(np.load(ruta, mmap_mode='r'))
+    grilla = construir_grilla(red, ruta, n_longitud, n_diametro, informar)
+    for vieja in glob.glob(os.path.join(carpeta, "grilla_recetas_*.npy")):
+        if vieja != ruta:
+            os.remove(vieja)
+    return grilla
+
+
+if __name__ == "__main__":
+    from modos.rni_numpy import RedInversaNumpy
+    parser = argparse.ArgumentParser(description="Construir la grilla de recetas de la red inversa")
+    parser.add_argument("--modelo", default=os.path.join(CARPETA, "inverse_nn_fijo.npz"))
+    parser.add_argument("--n-longitud", type=int, default=N_LONGITUD)
+    parser.add_argument("--n-diametro", type=int, default=N_DIAMETRO)
+    args = parser.parse_args()
+    red = RedInversaNumpy(args.modelo)
+    # Siempre reconstruye, para ver el error de interpolación
+    ruta = ruta_grilla(args.modelo, n_longitud=args.n_longitud, n_diametro=args.n_diametro)
+    if os.path.exists(ruta):
+        os.remove(ruta)
+    obtener_grilla(red, args.modelo, n_longitud=args.n_longitud, n_diametro=args.n_diametro)
@@ -1,18 +1,49 @@
 from comunicacion.serial_com import SerialCom
-import tensorflow as tf
+import os
+import threading
 import numpy as np
-import joblib
-from sklearn.preprocessing import MinMaxScaler
+from modos.rni_numpy import RedInversaNumpy
+from modos.grilla_recetas import obtener_grilla
+from modos.recetas_lote import comando_receta
+from modos.cache_recetas import CacheRecetas
 
-model = tf.keras.models.load_model(r'C:\Users\tangi\OneDrive\Documentos\UNT\TESIS II\DESARROLLO\GUI\GUI_FiberTaperv4\modos\inverse_nn_fijo.keras') #cargar la red neuronal
+# Red inversa y escaladores X e Y exportados desde el .keras y los .pkl con INN/exportar_rni.py
+# (inferencia con NumPy, sin TensorFlow)
+ruta_rni = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'inverse_nn_fijo.npz')
 
-# En tu caso, carga los .pkl generados desde el notebook:
-scaler_X_inv = joblib.load(
-    r'C:\Users\tangi\OneDrive\Documentos\UNT\TESIS II\DESARROLLO\GUI\GUI_FiberTaperv4\modos\scaler_X_inv_fijo.pkl'
-)
-scaler_y_inv = joblib.load(
-    r'C:\Users\tangi\OneDrive\Documentos\UNT\TESIS II\DESARROLLO\GUI\GUI_FiberTaperv4\modos\scaler_y_inv_fijo.pkl'
-)
+# La red, la tabla (DE, LE) precalculada sobre el rango válido (se construye una sola vez por modelo)
+# y la caché de recetas ya pedidas se cargan en la primera llamada a cargar_recetas(); main.py la hace
+# en segundo plano al arrancar
+_recetas = None
+_carga_recetas = threading.Lock()
+
+
+def cargar_recetas(informar=print):
+    # -> (red_inversa, grilla_recetas, cache_recetas); si otro hilo ya las está cargando, espera a que termine
+    global _recetas
+    with _carga_recetas:
+        if _recetas is None:
+            red_inversa = RedInversaNumpy(ruta_rni)
+            _recetas = (red_inversa, obtener_grilla(red_inversa, ruta_rni, informar=informar),
+                        CacheRecetas(ruta_rni))
+    return _recetas
+
+
+def calcular_receta(red_inversa, grilla_recetas, longitud, diametro):
+    #Prepara entrada y normaliza
+    y_d = np.array([[longitud, diametro]])
+    
+    if grilla_recetas.en_rango(longitud, diametro):
+        #Receta interpolada de la grilla precalculada (sin evaluar la red)
+        return grilla_recetas.receta(longitud, diametro)
+    
+    y_d_scaled = red_inversa.escalar_x(y_d)
+    
+    #Predicción de la red inversa
+    u_scaled = red_inversa.predecir_escalado(y_d_scaled)
+    
+    #Revertir la normalización
+    return red_inversa.desescalar_y(u_scaled)[0]
 
 
 class ModoAutomatico:
@@ -25,25 +56,19 @@ class ModoAutomatico:
 
     def ejecutar(self, longitud, diametro):
         
-        #Prepara entrada y normaliza
-        y_d = np.array([[longitud, diametro]])
-        y_d_scaled = scaler_X_inv.transform(y_d)
+        red_inversa, grilla_recetas, cache_recetas = cargar_recetas()
         
-        #Predicción de la red inversa
-        u_scaled = model.predict(y_d_scaled)
-        
-        #Revertir la normalización
-        u = scaler_y_inv.inverse_transform(u_scaled)[0]
+        #Receta del objetivo cuantizado a la resolución de la máquina (de la caché si ya se pidió)
+        u = cache_recetas.receta(longitud, diametro,
+                                 lambda L, D: calcular_receta(red_inversa, grilla_recetas, L, D))
+        print(f"[Recetas] Caché: {cache_recetas.resumen()}")
         
         #Desepaquetar variables
         #DO, NO, UE, DE, LO, LE = u  #RNI con 6 salidas
         
         DE, LE = u   #RNI con 2 salidas
         
-        u = model.predict(y_d)
-        u = u.flatten()
-        
-        comando = f"M:DO={6.5},NO={int(8)},UE={int(2)},DE={DE:.3f},LO={15},LE={LE:.3f}"   #para RNNI con solo 2 salidas
+        comando = comando_receta(DE, LE)   #para RNNI con solo 2 salidas (DO, NO, UE y LO fijos)
         #comando = f"M:DO={DO:.3f},NO={int(NO)},UE={int(UE)},DE={DE:.3f},LO={LO:.3f},LE={LE:.3f}"       #RNI con 6 salidas
         #comando = f"M:DO={u[0]},NO={int(u[1])},UE={int(u[2])},DE={u[3]},LO={u[4]},LE={u[5]}"
         print(f"Enviando: {comando}")
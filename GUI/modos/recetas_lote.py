@@ -0,0 +1,118 @@
+# modos/recetas_lote.py
+"""
+Recetas de la red inversa para muchos pedidos a la vez (órdenes de producción).
+
+predecir_recetas evalúa todos los pares (longitud, diámetro) en una sola
+llamada vectorizada de la red, y comando_receta arma el mismo comando que
+envía el modo automático al Arduino, con los valores fijos DO, NO, UE y LO.
+
+Uso (desde la carpeta GUI):
+    python -m modos.recetas_lote pedidos.csv [--salida recetas.csv]
+
+El archivo de pedidos es un CSV con una fila por taper: columnas de longitud
+y diámetro en mm (se reconocen por nombre, p. ej. "Longitud(mm)" y
+"Diametro(mm)"; sin encabezado se usan las dos primeras) y opcionalmente una
+columna "pedido" o "id" que se copia a la salida.
+"""
+import os
+import csv
+import argparse
+import numpy as np
+
+# Parámetros constantes de la receta (la RNI solo predice DE y LE)
+DO = 6.5    # mm/s
+NO = 8
+UE = 2
+LO = 15     # mm
+
+CARPETA = os.path.dirname(os.path.abspath(__file__))
+
+
+def comando_receta(DE, LE):
+    return f"M:DO={DO},NO={int(NO)},UE={int(UE)},DE={DE:.3f},LO={LO},LE={LE:.3f}"
+
+
+def predecir_recetas(red, longitudes, diametros):
+    # (DE, LE) de todos los pedidos en una sola evaluación de la red
+    x = np.column_stack([np.asarray(longitudes, dtype=np.float64), np.asarray(diametros, dtype=np.float64)])
+    u = red.predecir(x)
+    return u[:, 0], u[:, 1]
+
+
+def columna(encabezado, *claves):
+    for i, nombre in enumerate(encabezado):
+        nombre = nombre.strip().lower()
+        if any(nombre.startswith(c) for c in claves):
+            return i
+    return None
+
+
+def leer_pedidos(ruta):
+    # -> (ids, longitudes, diámetros)
+    with open(ruta, 'r', newline='', encoding='utf-8-sig') as f:
+        filas = [fila for fila in csv.reader(f) if any(c.strip() for c in fila)]
+    if not filas:
+        raise ValueError(f"No hay pedidos en {ruta}")
+
+    try:
+        float(filas[0][0])
+        encabezado = None
+    except ValueError:
+        encabezado, filas = filas[0], filas[1:]
+
+    i_id = None
+    i_long, i_diam = 0, 1
+    if encabezado is not None:
+        i_id = columna(encabezado, "pedido", "id")
+        i_long = columna(encabezado, "longitud", "length")
+        i_diam = columna(encabezado, "diametro", "diámetro", "diameter")
+        if i_long is None or i_diam is None:
+            raise ValueError(f"{ruta}: faltan las columnas de longitud y diámetro")
+
+    ids, longitudes, diametros = [], [], []
+    for n, fila in enumerate(filas, start=1):
+        try:
+            longitudes.append(float(fila[i_long]))
+            diametros.append(float(fila[i_diam]))
+        except (ValueError, IndexError):
+            raise ValueError(f"{ruta}: pedido {n} no válido: {fila}")
+        ids.append(fila[i_id].strip() if i_id is not None else str(n))
+    return ids, np.array(longitudes), np.array(diametros)
+
+
+def escribir_recetas(ruta, ids, longitudes, diametros, DE, LE, en_rango):
+    with open(ruta, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.writer(f)
+        writer.writerow(["pedido", "longitud_mm", "diametro_mm", "DO", "NO", "UE", "DE", "LO", "LE",
+                         "comando", "fuera_de_rango"])
+        for i in range(len(ids)):
+            writer.writerow([ids[i], longitudes[i], diametros[i], DO, NO, UE, f"{DE[i]:.3f}", LO, f"{LE[i]:.3f}",
+                             comando_receta(DE[i], LE[i]), "" if en_rango[i] else "si"])
+
+
+def main():
+    from modos.rni_numpy import RedInversaNumpy
+    from modos.grilla_recetas import RANGO_LONGITUD, RANGO_DIAMETRO
+
+    parser = argparse.ArgumentParser(description="Recetas de la red inversa para un archivo de pedidos")
+    parser.add_argument("pedidos", help="CSV con longitud y diámetro (mm) de cada taper")
+    parser.add_argument("--salida", default=None, help="CSV de recetas (por defecto <pedidos>_recetas.csv)")
+    parser.add_argument("--modelo", default=os.path.join(CARPETA, "inverse_nn_fijo.npz"))
+    args = parser.parse_args()
+
+    ids, longitudes, diametros = leer_pedidos(args.pedidos)
+    DE, LE = predecir_recetas(RedInversaNumpy(args.modelo), longitudes, diametros)
+    en_rango = ((RANGO_LONGITUD[0] <= longitudes) & (longitudes <= RANGO_LONGITUD[1])
+                & (RANGO_DIAMETRO[0] <= diametros) & (diametros <= RANGO_DIAMETRO[1]))
+
+    salida = args.salida or os.path.splitext(args.pedidos)[0] + "_recetas.csv"
+    escribir_recetas(salida, ids, longitudes, diametros, DE, LE, en_rango)
+    print(f"{len(ids)} recetas guardadas en {salida}")
+    if not en_rango.all():
+        print(f"* {np.count_nonzero(~en_rango)} pedido(s) fuera del rango válido "
+              f"(longitud {RANGO_LONGITUD[0]:g}-{RANGO_LONGITUD[1]:g} mm, "
+              f"diámetro {RANGO_DIAMETRO[0]:g}-{RANGO_DIAMETRO[1]:g} mm)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,61 @@
+# modos/rni_numpy.py
+"""
+Inferencia de la Red Neuronal Inversa (RNI) solo con NumPy.
+
+El modelo (capas Dense) y los dos MinMaxScaler se leen de un único .npz
+generado por INN/exportar_rni.py, así la GUI no necesita TensorFlow, scikit-learn
+ni joblib. El resultado coincide con model.predict dentro de 1e-6.
+
+    red = RedInversaNumpy("inverse_nn_fijo.npz")
+    DE, LE = red.predecir([[longitud, diametro]])[0]
+"""
+import numpy as np
+
+
+def sigmoide(x):
+    # Igual a 1 / (1 + exp(-x)) sin desbordes para x muy negativos
+    return 0.5 * (1.0 + np.tanh(0.5 * x))
+
+
+ACTIVACIONES = {
+    "linear": lambda x: x,
+    "tanh": np.tanh,
+    "sigmoid": sigmoide,
+    "relu": lambda x: np.maximum(x, 0.0),
+}
+
+
+class RedInversaNumpy:
+    def __init__(self, ruta_npz):
+        with np.load(ruta_npz, allow_pickle=False) as datos:
+            n_capas = int(datos["n_capas"])
+            self.pesos = [datos[f"W{i}"].astype(np.float64) for i in range(n_capas)]
+            self.sesgos = [datos[f"b{i}"].astype(np.float64) for i in range(n_capas)]
+            self.activaciones = [str(a) for a in datos["activaciones"]]
+            self.x_scale = datos["x_scale"].astype(np.float64)
+            self.x_min = datos["x_min"].astype(np.float64)
+            self.y_scale = datos["y_scale"].astype(np.float64)
+            self.y_min = datos["y_min"].astype(np.float64)
+        desconocidas = set(self.activaciones) - set(ACTIVACIONES)
+        if desconocidas:
+            raise ValueError(f"Activaciones no soportadas: {', '.join(sorted(desconocidas))}")
+        self._funciones = [ACTIVACIONES[a] for a in self.activaciones]
+
+    def predecir_escalado(self, x_escalado):
+        # Equivalente a model.predict: entradas y salidas en la escala [0, 1] de los escaladores
+        h = np.atleast_2d(np.asarray(x_escalado, dtype=np.float64))
+        for W, b, f in zip(self.pesos, self.sesgos, self._funciones):
+            h = f(h @ W + b)
+        return h
+
+    def escalar_x(self, x):
+        # MinMaxScaler.transform
+        return np.atleast_2d(np.asarray(x, dtype=np.float64)) * self.x_scale + self.x_min
+
+    def desescalar_y(self, y_escalado):
+        # MinMaxScaler.inverse_transform
+        return (np.asarray(y_escalado, dtype=np.float64) - self.y_min) / self.y_scale
+
+    def predecir(self, x):
+        # [[longitud, diametro], ...] -> [[DE, LE], ...] en unidades reales
+        return self.desescalar_y(self.predecir_escalado(self.escalar_x(x)))
@@ -50,7 +50,15 @@ class SeleccionModo(CTkFrame):
 
         ctk.CTkButton(botones_frame, fg_color="#1E2BDD", hover_color="#1E2BDD", text="Manual", width=100, command=iniciar_manu).grid(row=0, column=0, padx=5, pady=10)
         ctk.CTkButton(botones_frame, fg_color="#1E2BDD", hover_color="#1E2BDD", text="Pruebas", width=100, command=iniciar_pruebas).grid(row=0, column=1, padx=5, pady=10)
-        ctk.CTkButton(botones_frame, fg_color="#1E2BDD", hover_color="#1E2BDD", text="Automático", width=100, command=lambda: self.validar_y_continuar(iniciar_auto)).grid(row=0, column=2, padx=5, pady=10)
+        self.boton_auto = ctk.CTkButton(botones_frame, fg_color="#1E2BDD", hover_color="#1E2BDD", text="Automático", width=100, command=lambda: self.validar_y_continuar(iniciar_auto))
+        self.boton_auto.grid(row=0, column=2, padx=5, pady=10)
+
+    def indicar_auto_listo(self, listo):
+        # Indicador de carga de la red inversa en el botón del modo automático
+        if listo:
+            self.boton_auto.configure(text="Automático", state="normal")
+        else:
+            self.boton_auto.configure(text="Cargando...", state="disabled")
 
     def crear_entrada(self, frame, texto, fila, columna):
         ctk.CTkLabel(frame, text=texto).grid(row=fila*2-1, column=columna, padx=25, pady=2, sticky="w")
@@ -69,17 +77,19 @@ class SeleccionModo(CTkFrame):
         self.teclado.entrada = entrada_objetivo
 
     def validar_y_continuar(self, callback):
+        from modos.grilla_recetas import RANGO_LONGITUD, RANGO_DIAMETRO   # numpy se importa recién aquí
         try:
             longitud = float(self.long_entry.get())
             diametro = float(self.diam_entry.get())
 
             # Validar rango
-            if not (4 <= longitud <= 38):
-                messagebox.showerror("Error", "La longitud debe estar entre 4 y 38 mm.")
+            # (mismo rango que la grilla de recetas del modo automático)
+            if not (RANGO_LONGITUD[0] <= longitud <= RANGO_LONGITUD[1]):
+                messagebox.showerror("Error", f"La longitud debe estar entre {RANGO_LONGITUD[0]:g} y {RANGO_LONGITUD[1]:g} mm.")
                 return
 
-            if not (0.2 <= diametro <= 1.2):
-                messagebox.showerror("Error", "El diámetro debe estar entre 0.2 y 1.2 mm.")
+            if not (RANGO_DIAMETRO[0] <= diametro <= RANGO_DIAMETRO[1]):
+                messagebox.showerror("Error", f"El diámetro debe estar entre {RANGO_DIAMETRO[0]:g} y {RANGO_DIAMETRO[1]:g} mm.")
                 return
 
             # Si todo es válido, se guarda en la configuración
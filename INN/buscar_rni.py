@@ -0,0 +1,217 @@
+# -- coding: utf-8 --
+"""
+Búsqueda de arquitecturas de la Red Neuronal Inversa con validación cruzada.
+
+Cada candidato (capas ocultas, activaciones y tasa de aprendizaje) se entrena
+en k pliegues (KFold) con parada temprana (hasta --epocas, restaurando los
+mejores pesos) sobre una parte interna del entrenamiento del pliegue
+(--fraccion-parada); el pliegue de validación queda intacto y solo se usa
+para medir. Las tareas candidato×pliegue corren en un pool de procesos, uno
+por núcleo, cada uno limitado a --hilos hilos de TensorFlow/BLAS para no
+sobresuscribir la CPU.
+
+El resultado es una tabla (busqueda_rni/resultados.csv) ordenada por el MSE
+de validación promedio (escalado, como el loss del notebook) con el MAE y R²
+de DE y LE en unidades reales. El mejor candidato se reentrena con todos los
+datos durante el promedio de sus mejores épocas y se guarda como
+inverse_nn_fijo.keras, scaler_X_inv_fijo.pkl y scaler_y_inv_fijo.pkl en la
+carpeta de salida, listos para exportar_rni.py.
+
+Los escaladores MinMax se ajustan en cada pliegue solo con su parte de
+entrenamiento, para que el pliegue de validación no se filtre en el escalado;
+el ajuste con todos los datos queda para el reentrenamiento final exportado.
+
+Uso (en el entorno del notebook, con TensorFlow, scikit-learn y joblib):
+    python buscar_rni.py [--datos datos2_clean.xlsx] [--pliegues 5] [--epocas 500]
+                         [--paciencia 50] [--fraccion-parada 0.2] [--procesos N] [--hilos 1]
+                         [--candidatos N] [--semilla 42] [--salida busqueda_rni]
+"""
+
+import os
+import csv
+import time
+import argparse
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import numpy as np
+
+from datos_inn import cargar_datos, RUTA_DATOS
+from entrenar_rni import ARQUITECTURA, EPOCAS, crear_modelo, ajustar_escaladores, guardar_artefactos
+
+CARPETA = os.path.dirname(os.path.abspath(__file__))
+
+# (capas ocultas, tasa de aprendizaje); el primero es el modelo actual del notebook
+CANDIDATOS = [(ARQUITECTURA, 1e-3)] + [
+    (capas, tasa)
+    for capas in ([(16, 'tanh'), (16, 'tanh')],
+                  [(32, 'tanh'), (32, 'tanh')],
+                  [(32, 'tanh'), (32, 'sigmoid'), (32, 'tanh')],
+                  [(64, 'relu'), (64, 'relu')],
+                  [(32, 'relu'), (32, 'tanh'), (16, 'tanh')])
+    for tasa in (1e-3, 3e-3)
+] + [(ARQUITECTURA, 3e-3)]
+
+PLIEGUES = 5
+PACIENCIA = 50
+FRACCION_PARADA = 0.20   # del entrenamiento de cada pliegue, para la parada temprana
+
+
+def describir(capas):
+    return "-".join(f"{n}{a}" for n, a in capas)
+
+
+def iniciar_proceso(hilos):
+    # Antes de importar TensorFlow en el proceso: límite de hilos de TF y de las bibliotecas BLAS
+    for variable in ("OMP_NUM_THREADS", "MKL_NUM_THREADS", "OPENBLAS_NUM_THREADS",
+                     "TF_NUM_INTRAOP_THREADS", "TF_NUM_INTEROP_THREADS"):
+        os.environ[variable] = str(hilos)
+    os.environ.setdefault("TF_CPP_MIN_LOG_LEVEL", "3")
+    import tensorflow as tf
+    tf.config.threading.set_intra_op_parallelism_threads(hilos)
+    tf.config.threading.set_inter_op_parallelism_threads(hilos)
+
+
+def evaluar_pliegue(capas, tasa, X_train, y_train, X_val, y_val, epocas, paciencia, semilla,
+                    fraccion_parada=FRACCION_PARADA):
+    # X e y en unidades reales; los escaladores se ajustan con el entrenamiento del pliegue
+    from tensorflow import keras
+    from sklearn.preprocessing import MinMaxScaler
+    from sklearn.model_selection import train_test_split
+    from sklearn.metrics import mean_absolute_error, r2_score
+    keras.utils.set_random_seed(semilla)
+
+    t0 = time.perf_counter()
+    scaler_x = MinMaxScaler().fit(X_train)
+    scaler_y = MinMaxScaler().fit(y_train)
+    X_train, X_val = scaler_x.transform(X_train), scaler_x.transform(X_val)
+    real = y_val
+    y_train, y_val = scaler_y.transform(y_train), scaler_y.transform(y_val)
+    # La parada temprana elige la época con una parte del entrenamiento, no con el pliegue que se mide
+    X_ajuste, X_parada, y_ajuste, y_parada = train_test_split(X_train, y_train, test_size=fraccion_parada,
+                                                              random_state=semilla)
+
+    modelo = crear_modelo(capas, tasa)
+    parada = keras.callbacks.EarlyStopping(monitor='val_loss', patience=paciencia, restore_best_weights=True)
+    historia = modelo.fit(X_ajuste, y_ajuste, epochs=epocas, verbose=0, validation_data=(X_parada, y_parada),
+                          callbacks=[parada])
+    pred = modelo.predict(X_val, verbose=0)
+
+    pred_real = scaler_y.inverse_transform(pred)
+    return {
+        "val_mse": float(np.mean((pred - y_val) ** 2)),
+        "mae_var": [float(mean_absolute_error(real[:, i], pred_real[:, i])) for i in range(real.shape[1])],
+        "r2_var": [float(r2_score(real[:, i], pred_real[:, i])) for i in range(real.shape[1])],
+        "epoca": int(np.argmin(historia.history['val_loss'])) + 1,
+        "tiempo": time.perf_counter() - t0,
+    }
+
+
+def tabla_resultados(candidatos, resultados):
+    # Promedio de los pliegues por candidato, ordenado por MSE de validación
+    filas = []
+    for i, (capas, tasa) in enumerate(candidatos):
+        r = resultados[i]
+        val_mse = np.array([p["val_mse"] for p in r])
+        mae = np.array([p["mae_var"] for p in r]).mean(axis=0)
+        r2 = np.array([p["r2_var"] for p in r]).mean(axis=0)
+        filas.append({
+            "capas": describir(capas), "tasa": tasa,
+            "val_mse": float(val_mse.mean()), "val_mse_std": float(val_mse.std()),
+            "mae_DE": float(mae[0]), "mae_LE": float(mae[1]), "r2_DE": float(r2[0]), "r2_LE": float(r2[1]),
+            "epocas": int(round(np.mean([p["epoca"] for p in r]))),
+            "tiempo_s": float(sum(p["tiempo"] for p in r)),
+            "indice": i,
+        })
+    filas.sort(key=lambda f: f["val_mse"])
+    for puesto, fila in enumerate(filas, start=1):
+        fila["puesto"] = puesto
+    return filas
+
+
+def guardar_tabla(ruta, filas):
+    columnas = ["puesto", "capas", "tasa", "val_mse", "val_mse_std", "mae_DE", "mae_LE", "r2_DE", "r2_LE",
+                "epocas", "tiempo_s"]
+    with open(ruta, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.DictWriter(f, fieldnames=columnas, extrasaction='ignore')
+        writer.writeheader()
+        writer.writerows(filas)
+
+
+def imprimir_tabla(filas, n=10):
+    print(f"{'#':>2}  {'capas':<44} {'tasa':>7} {'val_mse':>17} {'MAE DE':>8} {'MAE LE':>8} "
+          f"{'R² DE':>7} {'R² LE':>7} {'épocas':>6}")
+    for f in filas[:n]:
+        print(f"{f['puesto']:>2}  {f['capas']:<44} {f['tasa']:>7g} {f['val_mse']:>9.5f} ±{f['val_mse_std']:.5f} "
+              f"{f['mae_DE']:>8.4f} {f['mae_LE']:>8.4f} {f['r2_DE']:>7.3f} {f['r2_LE']:>7.3f} {f['epocas']:>6}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Búsqueda de arquitecturas de la RNI con validación cruzada")
+    parser.add_argument("--datos", default=RUTA_DATOS)
+    parser.add_argument("--pliegues", type=int, default=PLIEGUES)
+    parser.add_argument("--epocas", type=int, default=EPOCAS, help="máximo de épocas (con parada temprana)")
+    parser.add_argument("--paciencia", type=int, default=PACIENCIA)
+    parser.add_argument("--fraccion-parada", type=float, default=FRACCION_PARADA,
+                        help="fracción del entrenamiento de cada pliegue para la parada temprana")
+    parser.add_argument("--procesos", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--hilos", type=int, default=1, help="hilos de TensorFlow por proceso")
+    parser.add_argument("--candidatos", type=int, default=None, help="evaluar solo los N primeros candidatos")
+    parser.add_argument("--semilla", type=int, default=42)
+    parser.add_argument("--salida", default=os.path.join(CARPETA, "busqueda_rni"))
+    args = parser.parse_args()
+
+    from sklearn.model_selection import KFold
+
+    datos = cargar_datos(args.datos)
+    candidatos = CANDIDATOS[:args.candidatos] if args.candidatos else CANDIDATOS
+    pliegues = list(KFold(args.pliegues, shuffle=True, random_state=args.semilla).split(datos.X))
+
+    n_tareas = len(candidatos) * len(pliegues)
+    print(f"{datos.fuente}: {len(datos)} filas, {len(candidatos)} candidatos x {len(pliegues)} pliegues "
+          f"= {n_tareas} entrenamientos en {args.procesos} procesos de {args.hilos} hilo(s)")
+
+    t0 = time.perf_counter()
+    resultados = {i: [] for i in range(len(candidatos))}
+    # spawn: cada proceso importa TensorFlow de cero con sus límites de hilos
+    contexto = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(args.procesos, mp_context=contexto, initializer=iniciar_proceso,
+                             initargs=(args.hilos,)) as pool:
+        tareas = {}
+        for i, (capas, tasa) in enumerate(candidatos):
+            for k, (train, val) in enumerate(pliegues):
+                futuro = pool.submit(evaluar_pliegue, capas, tasa, datos.X[train], datos.y[train],
+                                     datos.X[val], datos.y[val], args.epocas, args.paciencia, args.semilla + k,
+                                     args.fraccion_parada)
+                tareas[futuro] = i
+        for hechas, futuro in enumerate(as_completed(tareas), start=1):
+            resultados[tareas[futuro]].append(futuro.result())
+            print(f"\r  {hechas}/{n_tareas} entrenamientos ({time.perf_counter() - t0:.0f} s)", end="", flush=True)
+    print()
+
+    filas = tabla_resultados(candidatos, resultados)
+    os.makedirs(args.salida, exist_ok=True)
+    ruta_tabla = os.path.join(args.salida, "resultados.csv")
+    guardar_tabla(ruta_tabla, filas)
+    imprimir_tabla(filas)
+    print(f"Tabla completa: {ruta_tabla}")
+
+    # El mejor, con todos los datos y el promedio de sus mejores épocas
+    mejor = filas[0]
+    capas, tasa = candidatos[mejor["indice"]]
+    print(f"Reentrenando el mejor ({mejor['capas']}, tasa {tasa:g}) con todos los datos, "
+          f"{mejor['epocas']} épocas")
+    iniciar_proceso(os.cpu_count() or 1)
+    from tensorflow import keras
+    keras.utils.set_random_seed(args.semilla)
+    scaler_x, scaler_y = ajustar_escaladores(datos)
+    modelo = crear_modelo(capas, tasa)
+    modelo.fit(scaler_x.transform(datos.X), scaler_y.transform(datos.y), epochs=mejor["epocas"], verbose=0)
+    for ruta in guardar_artefactos(modelo, scaler_x, scaler_y, args.salida):
+        print(f"Guardado: {ruta}")
+    print(f"Para la GUI: python exportar_rni.py --modelo {os.path.join(args.salida, 'inverse_nn_fijo.keras')} "
+          f"--scaler-x {os.path.join(args.salida, 'scaler_X_inv_fijo.pkl')} "
+          f"--scaler-y {os.path.join(args.salida, 'scaler_y_inv_fijo.pkl')}")
+
+
+if __name__ == "__main__":
+    main()
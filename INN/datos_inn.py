@@ -0,0 +1,154 @@
+# -- coding: utf-8 --
+"""
+Etapa de datos del entrenamiento de la Red Neuronal Inversa.
+
+El Excel de caracterización (datos2_clean.xlsx) se lee con pandas una sola
+vez: se validan los nombres de columnas y los valores, y se guarda como .npz
+en cache_datos/, con el hash del contenido del Excel en el nombre. Mientras el
+Excel no cambie, las siguientes corridas cargan el .npz directamente (sin
+pandas ni openpyxl); si se edita, se convierte de nuevo.
+
+    datos = cargar_datos("datos2_clean.xlsx")
+    datos.X        # [[Longitud, Diametro], ...]     (mm)
+    datos.y        # [[DE, LE], ...]                  (mm/s, mm)
+    datos.fijas    # [[DO, NO, UE, LO], ...]
+
+Uso:
+    python datos_inn.py [--datos datos2_clean.xlsx] [--forzar]
+"""
+
+import os
+import glob
+import hashlib
+import argparse
+import numpy as np
+
+CARPETA = os.path.dirname(os.path.abspath(__file__))
+RUTA_DATOS = os.path.join(CARPETA, "datos2_clean.xlsx")
+CARPETA_CACHE = os.path.join(CARPETA, "cache_datos")
+
+# Entradas de la RNI (objetivo del taper), salidas entrenadas y parámetros constantes de la receta
+COLUMNAS_X = ["Longitud(mm)", "Diametro(mm)"]
+COLUMNAS_Y = ["DE (mm/s)", "LE (mm)"]
+COLUMNAS_FIJAS = ["DO (mm/s)", "NO", "UE", "LO (mm)"]
+COLUMNAS_ENTERAS = ["NO", "UE"]
+
+VERSION_CACHE = 1   # subir si cambia el contenido del .npz o la validación
+
+
+def hash_archivo(path):
+    with open(path, 'rb') as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
+
+class DatosINN:
+    def __init__(self, X, y, fijas, fuente=""):
+        self.X = X
+        self.y = y
+        self.fijas = fijas
+        self.fuente = fuente
+
+    def __len__(self):
+        return len(self.X)
+
+    def valores_fijos(self):
+        # DO, NO, UE, LO como en el notebook (promedio de y_fijas)
+        return self.fijas.mean(axis=0)
+
+
+def validar(df, ruta):
+    # Columnas y valores; se hace una sola vez, al convertir el Excel
+    import pandas as pd
+    faltan = [c for c in COLUMNAS_X + COLUMNAS_Y + COLUMNAS_FIJAS if c not in df.columns]
+    if faltan:
+        raise ValueError(f"{ruta}: faltan las columnas {', '.join(faltan)} "
+                         f"(columnas encontradas: {', '.join(map(str, df.columns))})")
+
+    errores = []
+    for c in COLUMNAS_X + COLUMNAS_Y + COLUMNAS_FIJAS:
+        v = pd.to_numeric(df[c], errors='coerce').to_numpy(dtype=np.float64)
+        filas = np.flatnonzero(~np.isfinite(v)) + 2     # +2: encabezado y numeración de Excel
+        if len(filas):
+            errores.append(f"{c}: valores vacíos o no numéricos en las filas {filas.tolist()}")
+            continue
+        filas = np.flatnonzero(v <= 0) + 2
+        if len(filas):
+            errores.append(f"{c}: valores no positivos en las filas {filas.tolist()}")
+        if c in COLUMNAS_ENTERAS:
+            filas = np.flatnonzero(v != np.round(v)) + 2
+            if len(filas):
+                errores.append(f"{c}: valores no enteros en las filas {filas.tolist()}")
+    for c in COLUMNAS_X + COLUMNAS_Y:
+        if df[c].nunique() < 2:
+            errores.append(f"{c}: todos los valores son iguales (no se puede escalar)")
+    if errores:
+        raise ValueError(f"{ruta}:\n  " + "\n  ".join(errores))
+
+
+def convertir_excel(ruta_excel, ruta_npz, firma):
+    import pandas as pd
+    df = pd.read_excel(ruta_excel)
+    df.columns = df.columns.astype(str).str.strip()
+    # Filas totalmente vacías al final de la hoja
+    df = df.dropna(how='all', subset=[c for c in COLUMNAS_X + COLUMNAS_Y + COLUMNAS_FIJAS if c in df.columns])
+    validar(df, ruta_excel)
+
+    tmp = ruta_npz + ".tmp.npz"
+    np.savez(tmp,
+             X=df[COLUMNAS_X].to_numpy(dtype=np.float64),
+             y=df[COLUMNAS_Y].to_numpy(dtype=np.float64),
+             fijas=df[COLUMNAS_FIJAS].to_numpy(dtype=np.float64),
+             firma=np.array(firma), fuente=np.array(os.path.basename(ruta_excel)))
+    os.replace(tmp, ruta_npz)
+
+
+def ruta_cache(ruta_excel, carpeta_cache=CARPETA_CACHE):
+    # -> (ruta del .npz, firma); la firma cambia con el contenido del Excel y la versión de la conversión
+    firma = f"{hash_archivo(ruta_excel)}|{VERSION_CACHE}"
+    nombre = os.path.splitext(os.path.basename(ruta_excel))[0]
+    corto = hashlib.sha256(firma.encode('utf-8')).hexdigest()[:16]
+    return os.path.join(carpeta_cache, f"{nombre}_{corto}.npz"), firma
+
+
+def cargar_datos(ruta_excel=RUTA_DATOS, carpeta_cache=CARPETA_CACHE, forzar=False):
+    ruta_npz, firma = ruta_cache(ruta_excel, carpeta_cache)
+    if forzar or not os.path.exists(ruta_npz):
+        os.makedirs(carpeta_cache, exist_ok=True)
+        convertir_excel(ruta_excel, ruta_npz, firma)
+        # Conversiones de versiones anteriores del mismo Excel
+        nombre = os.path.splitext(os.path.basename(ruta_excel))[0]
+        for vieja in glob.glob(os.path.join(carpeta_cache, f"{nombre}_*.npz")):
+            if vieja != ruta_npz:
+                os.remove(vieja)
+
+    with np.load(ruta_npz, allow_pickle=False) as datos:
+        if str(datos["firma"]) != firma:
+            raise ValueError(f"{ruta_npz} no corresponde a {ruta_excel}; borrarlo o usar --forzar")
+        return DatosINN(datos["X"], datos["y"], datos["fijas"], fuente=str(datos["fuente"]))
+
+
+def main():
+    import time
+    parser = argparse.ArgumentParser(description="Convertir el Excel de entrenamiento a la caché .npz")
+    parser.add_argument("--datos", default=RUTA_DATOS)
+    parser.add_argument("--forzar", action="store_true", help="convertir aunque la caché exista")
+    args = parser.parse_args()
+
+    convertir = args.forzar or not os.path.exists(ruta_cache(args.datos)[0])
+    t0 = time.perf_counter()
+    datos = cargar_datos(args.datos, forzar=args.forzar)
+    t1 = time.perf_counter()
+    cargar_datos(args.datos)
+    t2 = time.perf_counter()
+    print(f"{datos.fuente}: {len(datos)} filas válidas")
+    for nombre, columnas, valores in (("X", COLUMNAS_X, datos.X), ("y", COLUMNAS_Y, datos.y),
+                                      ("fijas", COLUMNAS_FIJAS, datos.fijas)):
+        for c, v in zip(columnas, valores.T):
+            print(f"  {nombre:<6}{c:<14} {v.min():10.4f} - {v.max():10.4f}")
+    if convertir:
+        print(f"Conversión y validación del Excel: {(t1 - t0) * 1e3:.1f} ms")
+    print(f"Carga desde la caché: {(t2 - t1) * 1e3:.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,123 @@
+# -- coding: utf-8 --
+"""
+Entrenamiento de la Red Neuronal Inversa como script (el mismo flujo del
+notebook ModeloInverso4_fijo.ipynb, sin las gráficas).
+
+Los datos se cargan con datos_inn.cargar_datos, que convierte y valida el
+Excel una sola vez y luego lee la caché .npz. Se escalan X = [Longitud,
+Diametro] e y = [DE, LE] con MinMaxScaler, se separa 80/20 (random_state=42),
+se entrena la arquitectura del notebook y se guardan inverse_nn_fijo.keras,
+scaler_X_inv_fijo.pkl y scaler_y_inv_fijo.pkl.
+
+Uso (en el entorno del notebook, con TensorFlow, scikit-learn y joblib):
+    python entrenar_rni.py [--datos datos2_clean.xlsx] [--epocas 500] [--semilla N]
+                           [--salida CARPETA] [--sin-guardar]
+
+Luego ejecutar exportar_rni.py para generar el .npz que usa la GUI.
+"""
+
+import os
+import argparse
+import numpy as np
+
+from datos_inn import cargar_datos, RUTA_DATOS, COLUMNAS_Y
+
+CARPETA = os.path.dirname(os.path.abspath(__file__))
+
+# Capas ocultas (neuronas, activación) del notebook; la de salida es Dense(2, 'linear')
+ARQUITECTURA = [(30, 'linear'), (25, 'tanh'), (25, 'sigmoid'), (25, 'sigmoid'), (25, 'tanh')]
+EPOCAS = 500
+FRACCION_PRUEBA = 0.20
+SEMILLA_DIVISION = 42
+
+NOMBRE_MODELO = "inverse_nn_fijo.keras"
+NOMBRE_SCALER_X = "scaler_X_inv_fijo.pkl"
+NOMBRE_SCALER_Y = "scaler_y_inv_fijo.pkl"
+
+
+def crear_modelo(capas=ARQUITECTURA, tasa_aprendizaje=None):
+    from tensorflow import keras
+    modelo = keras.Sequential([keras.Input(shape=(2,))]
+                              + [keras.layers.Dense(n, activation=a) for n, a in capas]
+                              + [keras.layers.Dense(2, activation='linear')])
+    optimizador = keras.optimizers.Adam() if tasa_aprendizaje is None else keras.optimizers.Adam(tasa_aprendizaje)
+    modelo.compile(optimizer=optimizador, loss='mse', metrics=['mae'])
+    return modelo
+
+
+def ajustar_escaladores(datos):
+    from sklearn.preprocessing import MinMaxScaler
+    return MinMaxScaler().fit(datos.X), MinMaxScaler().fit(datos.y)
+
+
+def metricas(y_real, y_pred):
+    # En unidades reales; r2 y mae por variable de salida
+    from sklearn.metrics import mean_absolute_error, r2_score
+    return {
+        "mse": float(np.mean((y_real - y_pred) ** 2)),
+        "rmse": float(np.sqrt(np.mean((y_real - y_pred) ** 2))),
+        "mae": float(mean_absolute_error(y_real, y_pred)),
+        "mae_var": [float(mean_absolute_error(y_real[:, i], y_pred[:, i])) for i in range(y_real.shape[1])],
+        "r2_var": [float(r2_score(y_real[:, i], y_pred[:, i])) for i in range(y_real.shape[1])],
+    }
+
+
+def imprimir_metricas(m_train, m_test):
+    print(f"MSE  - Train: {m_train['mse']:.6f}, Test: {m_test['mse']:.6f}")
+    print(f"RMSE - Train: {m_train['rmse']:.6f}, Test: {m_test['rmse']:.6f}")
+    print(f"MAE  - Train: {m_train['mae']:.6f}, Test: {m_test['mae']:.6f}")
+    for i, nombre in enumerate(COLUMNAS_Y):
+        print(f"  {nombre:<10} MAE Train: {m_train['mae_var'][i]:.6f}, Test: {m_test['mae_var'][i]:.6f}   "
+              f"R² Train: {m_train['r2_var'][i]:.4f}, Test: {m_test['r2_var'][i]:.4f}")
+
+
+def guardar_artefactos(modelo, scaler_x, scaler_y, carpeta=CARPETA):
+    import joblib
+    from tensorflow import keras
+    rutas = [os.path.join(carpeta, n) for n in (NOMBRE_MODELO, NOMBRE_SCALER_X, NOMBRE_SCALER_Y)]
+    keras.models.save_model(modelo, rutas[0])
+    joblib.dump(scaler_x, rutas[1])
+    joblib.dump(scaler_y, rutas[2])
+    return rutas
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Entrenar la Red Neuronal Inversa (DE y LE)")
+    parser.add_argument("--datos", default=RUTA_DATOS)
+    parser.add_argument("--epocas", type=int, default=EPOCAS)
+    parser.add_argument("--semilla", type=int, default=None, help="semilla de TensorFlow (entrenamiento repetible)")
+    parser.add_argument("--salida", default=CARPETA, help="carpeta del .keras y los .pkl")
+    parser.add_argument("--sin-guardar", action="store_true", help="solo entrenar e imprimir métricas")
+    args = parser.parse_args()
+
+    datos = cargar_datos(args.datos)
+    print(f"{datos.fuente}: {len(datos)} filas")
+
+    from sklearn.model_selection import train_test_split
+    from tensorflow import keras
+    if args.semilla is not None:
+        keras.utils.set_random_seed(args.semilla)
+
+    scaler_x, scaler_y = ajustar_escaladores(datos)
+    X_train, X_test, y_train, y_test = train_test_split(
+        scaler_x.transform(datos.X), scaler_y.transform(datos.y),
+        test_size=FRACCION_PRUEBA, random_state=SEMILLA_DIVISION)
+
+    modelo = crear_modelo()
+    historia = modelo.fit(X_train, y_train, epochs=args.epocas, verbose=0, validation_data=(X_test, y_test))
+    print(f"Loss final (MSE escalado) - Train: {historia.history['loss'][-1]:.6f}, "
+          f"Val: {historia.history['val_loss'][-1]:.6f}")
+
+    m_train = metricas(scaler_y.inverse_transform(y_train),
+                       scaler_y.inverse_transform(modelo.predict(X_train, verbose=0)))
+    m_test = metricas(scaler_y.inverse_transform(y_test),
+                      scaler_y.inverse_transform(modelo.predict(X_test, verbose=0)))
+    imprimir_metricas(m_train, m_test)
+
+    if not args.sin_guardar:
+        for ruta in guardar_artefactos(modelo, scaler_x, scaler_y, args.salida):
+            print(f"Guardado: {ruta}")
+
+
+if __name__ == "__main__":
+    main()
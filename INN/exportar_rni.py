@@ -0,0 +1,119 @@
+# -- coding: utf-8 --
+"""
+Exporta la Red Neuronal Inversa (.keras) y sus escaladores X e Y (.pkl) a un
+único .npz para la inferencia con NumPy de la GUI (GUI/modos/rni_numpy.py).
+
+Contenido del .npz:
+ - n_capas, activaciones y, por capa Dense, W<i> (entradas x salidas) y b<i>
+ - x_scale, x_min, y_scale, y_min de los MinMaxScaler (x * scale + min)
+
+Después de exportar se compara la inferencia con NumPy contra model.predict
+sobre los datos de entrenamiento y una grilla de longitudes y diámetros; si la
+diferencia supera la tolerancia no se escribe el archivo.
+
+Uso (en el entorno del notebook, con TensorFlow y joblib):
+    python exportar_rni.py [--modelo inverse_nn_fijo.keras]
+                           [--scaler-x scaler_X_inv_fijo.pkl]
+                           [--scaler-y scaler_y_inv_fijo.pkl]
+                           [--salida inverse_nn_fijo.npz] [--datos datos2_clean.xlsx]
+
+Copiar luego el .npz a la carpeta GUI/modos junto con el resto de archivos.
+"""
+
+import os
+import sys
+import argparse
+import tempfile
+import numpy as np
+
+CARPETA = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(os.path.join(CARPETA, "..", "GUI", "modos"))
+from rni_numpy import RedInversaNumpy, ACTIVACIONES
+
+TOLERANCIA = 1e-6
+
+
+def parametros_modelo(model):
+    pesos, sesgos, activaciones = [], [], []
+    for capa in model.layers:
+        if type(capa).__name__ != "Dense":
+            raise ValueError(f"Capa no soportada: {capa.name} ({type(capa).__name__})")
+        activacion = capa.activation.__name__
+        if activacion not in ACTIVACIONES:
+            raise ValueError(f"Activación no soportada en {capa.name}: {activacion}")
+        W, b = capa.get_weights()
+        pesos.append(W)
+        sesgos.append(b)
+        activaciones.append(activacion)
+    return pesos, sesgos, activaciones
+
+
+def guardar_npz(ruta, pesos, sesgos, activaciones, scaler_x, scaler_y):
+    arreglos = {f"W{i}": W for i, W in enumerate(pesos)}
+    arreglos.update({f"b{i}": b for i, b in enumerate(sesgos)})
+    np.savez_compressed(
+        ruta, n_capas=np.array(len(pesos)), activaciones=np.array(activaciones),
+        x_scale=scaler_x.scale_, x_min=scaler_x.min_,
+        y_scale=scaler_y.scale_, y_min=scaler_y.min_, **arreglos)
+
+
+def entradas_prueba(scaler_x, ruta_datos):
+    # Grilla sobre el rango de entrenamiento (y algo más) + los datos del Excel si están
+    lo, hi = scaler_x.data_min_, scaler_x.data_max_
+    margen = 0.1 * (hi - lo)
+    L, D = np.meshgrid(np.linspace(lo[0] - margen[0], hi[0] + margen[0], 60),
+                       np.linspace(lo[1] - margen[1], hi[1] + margen[1], 60))
+    x = np.column_stack([L.ravel(), D.ravel()])
+    if ruta_datos and os.path.exists(ruta_datos):
+        import pandas as pd
+        df = pd.read_excel(ruta_datos)
+        df.columns = df.columns.str.strip()
+        x = np.vstack([x, df[["Longitud(mm)", "Diametro(mm)"]].values])
+    return x
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Exportar la RNI a .npz para inferencia con NumPy")
+    parser.add_argument("--modelo", default=os.path.join(CARPETA, "inverse_nn_fijo.keras"))
+    parser.add_argument("--scaler-x", default=os.path.join(CARPETA, "scaler_X_inv_fijo.pkl"))
+    parser.add_argument("--scaler-y", default=os.path.join(CARPETA, "scaler_y_inv_fijo.pkl"))
+    parser.add_argument("--salida", default=os.path.join(CARPETA, "inverse_nn_fijo.npz"))
+    parser.add_argument("--datos", default=os.path.join(CARPETA, "datos2_clean.xlsx"),
+                        help="Excel de entrenamiento para la verificación (opcional)")
+    args = parser.parse_args()
+
+    import joblib
+    from tensorflow import keras
+    model = keras.models.load_model(args.modelo)
+    scaler_x = joblib.load(args.scaler_x)
+    scaler_y = joblib.load(args.scaler_y)
+
+    pesos, sesgos, activaciones = parametros_modelo(model)
+    arquitectura = "→".join(str(n) for n in [pesos[0].shape[0]] + [W.shape[1] for W in pesos])
+    print(f"Modelo {arquitectura} ({', '.join(activaciones)})")
+
+    # Se escribe primero a un temporal para verificarlo antes de reemplazar la salida
+    fd, tmp = tempfile.mkstemp(suffix=".npz", dir=os.path.dirname(os.path.abspath(args.salida)))
+    os.close(fd)
+    try:
+        guardar_npz(tmp, pesos, sesgos, activaciones, scaler_x, scaler_y)
+        red = RedInversaNumpy(tmp)
+
+        x = entradas_prueba(scaler_x, args.datos)
+        x_escalado = scaler_x.transform(x)
+        dif_escalado = np.max(np.abs(red.predecir_escalado(x_escalado) - model.predict(x_escalado, verbose=0)))
+        esperado = scaler_y.inverse_transform(model.predict(x_escalado, verbose=0))
+        dif = np.max(np.abs(red.predecir(x) - esperado))
+        print(f"Verificación con {len(x)} entradas: diferencia máx. {dif_escalado:.2e} (escalada), "
+              f"{dif:.2e} (DE, LE)")
+        if dif_escalado > TOLERANCIA:
+            raise SystemExit(f"La inferencia con NumPy difiere de model.predict en más de {TOLERANCIA:g}")
+        os.replace(tmp, args.salida)
+    finally:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+    print(f"Guardado: {args.salida} ({os.path.getsize(args.salida) / 1024:.1f} KB)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,296 @@
+# -- coding: utf-8 --
+"""
+Reentrenamiento incremental de la Red Neuronal Inversa con tapers nuevos.
+
+Une las recetas con que se fabricaron los tapers (CSV con columnas imagen, DE
+y LE; DO, NO, UE y LO opcionales) con la longitud y el diámetro de cintura
+medidos por PDSeI (resumen_resultados.csv, por la columna imagen), y ajusta el
+modelo vigente unas pocas épocas partiendo de sus pesos, con los datos de
+entrenamiento anteriores más los nuevos.
+
+ - Los escaladores X e Y se conservan; solo se amplían si los datos nuevos
+   salen de su rango. En ese caso la primera y la última capa se corrigen para
+   que la red dé exactamente las mismas recetas con los escaladores nuevos
+   antes de seguir entrenando.
+ - Validación: el 20 % de prueba del notebook (random_state=42) más un 20 % de
+   los tapers nuevos, iguales para el modelo vigente y el ajustado. El error
+   es el MSE en la escala Y del modelo vigente.
+ - Solo si el error no empeora se publica una versión nueva en
+   versiones/vNNN/ (.keras, los dos .pkl, el .npz para la GUI, los tapers
+   acumulados e info.json). Con --gui el .npz se copia además a GUI/modos, y
+   la grilla y la caché de recetas de la GUI se regeneran solas.
+
+La versión vigente es la última de versiones/ o, si no hay, los archivos de
+esta carpeta. Los tapers de versiones anteriores se siguen usando en las
+siguientes.
+
+Uso (en el entorno del notebook, con TensorFlow, scikit-learn y joblib):
+    python reentrenar_rni.py --resumen resumen_resultados.csv --recetas recetas.csv
+                             [--epocas 30] [--tasa 1e-4] [--columna-longitud long_taper_grad_um] [--gui]
+"""
+
+import os
+import csv
+import glob
+import json
+import shutil
+import argparse
+import numpy as np
+
+from datos_inn import cargar_datos, RUTA_DATOS, COLUMNAS_FIJAS
+from entrenar_rni import (FRACCION_PRUEBA, SEMILLA_DIVISION, NOMBRE_MODELO, NOMBRE_SCALER_X, NOMBRE_SCALER_Y,
+                          guardar_artefactos)
+
+CARPETA = os.path.dirname(os.path.abspath(__file__))
+CARPETA_VERSIONES = os.path.join(CARPETA, "versiones")
+RUTA_NPZ_GUI = os.path.join(CARPETA, "..", "GUI", "modos", "inverse_nn_fijo.npz")
+NOMBRE_NPZ = "inverse_nn_fijo.npz"
+NOMBRE_TAPERS = "tapers_nuevos.csv"
+
+EPOCAS = 30
+TASA = 1e-4
+COLUMNA_LONGITUD = "long_taper_grad_um"
+COLUMNA_DIAMETRO = "ancho_min_waist_um"
+
+
+# ---------- Tapers nuevos ----------
+
+def numero(valor):
+    try:
+        v = float(valor)
+    except (TypeError, ValueError):
+        return None
+    return v if np.isfinite(v) else None
+
+
+def leer_resumen(ruta, columna_longitud=COLUMNA_LONGITUD):
+    # imagen -> (longitud_mm, diametro_mm), sin las imágenes descartadas por PDSeI
+    mediciones = {}
+    with open(ruta, 'r', newline='', encoding='utf-8') as f:
+        for fila in csv.DictReader(f):
+            if (fila.get("descarte") or "").strip():
+                continue
+            L = numero(fila.get(columna_longitud))
+            D = numero(fila.get(COLUMNA_DIAMETRO))
+            if L is not None and D is not None and L > 0 and D > 0:
+                mediciones[os.path.splitext(fila["imagen"].strip())[0]] = (L / 1000.0, D / 1000.0)
+    return mediciones
+
+
+def leer_recetas(ruta, valores_fijos):
+    # imagen -> (DE, LE); se saltan las recetas con DO, NO, UE o LO distintos de los del modelo
+    recetas, distintas = {}, []
+    with open(ruta, 'r', newline='', encoding='utf-8-sig') as f:
+        for fila in csv.DictReader(f):
+            fila = {k.strip(): v for k, v in fila.items() if k}
+            imagen = os.path.splitext((fila.get("imagen") or "").strip())[0]
+            DE = numero(fila.get("DE", fila.get("DE (mm/s)")))
+            LE = numero(fila.get("LE", fila.get("LE (mm)")))
+            if not imagen or DE is None or LE is None:
+                continue
+            fijas = [numero(fila.get(c, fila.get(c.split(" ")[0]))) for c in COLUMNAS_FIJAS]
+            if any(v is not None and not np.isclose(v, esperado) for v, esperado in zip(fijas, valores_fijos)):
+                distintas.append(imagen)
+                continue
+            recetas[imagen] = (DE, LE)
+    if distintas:
+        print(f"* {len(distintas)} receta(s) con DO/NO/UE/LO distintos de los del modelo, no se usan: "
+              f"{', '.join(distintas[:5])}{' ...' if len(distintas) > 5 else ''}")
+    return recetas
+
+
+def unir_tapers(mediciones, recetas):
+    imagenes = sorted(set(mediciones) & set(recetas))
+    sin_receta = len(set(mediciones) - set(recetas))
+    sin_medicion = len(set(recetas) - set(mediciones))
+    if sin_receta or sin_medicion:
+        print(f"* {sin_receta} medición(es) sin receta y {sin_medicion} receta(s) sin medición válida")
+    X = np.array([mediciones[i] for i in imagenes], dtype=np.float64).reshape(-1, 2)
+    y = np.array([recetas[i] for i in imagenes], dtype=np.float64).reshape(-1, 2)
+    return imagenes, X, y
+
+
+def leer_tapers(ruta):
+    # Tapers acumulados de una versión anterior
+    if not os.path.exists(ruta):
+        return [], np.empty((0, 2)), np.empty((0, 2))
+    with open(ruta, 'r', newline='', encoding='utf-8') as f:
+        filas = list(csv.DictReader(f))
+    imagenes = [r["imagen"] for r in filas]
+    X = np.array([[float(r["longitud_mm"]), float(r["diametro_mm"])] for r in filas]).reshape(-1, 2)
+    y = np.array([[float(r["DE"]), float(r["LE"])] for r in filas]).reshape(-1, 2)
+    return imagenes, X, y
+
+
+def guardar_tapers(ruta, imagenes, X, y):
+    with open(ruta, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.writer(f)
+        writer.writerow(["imagen", "longitud_mm", "diametro_mm", "DE", "LE"])
+        for imagen, (L, D), (DE, LE) in zip(imagenes, X, y):
+            writer.writerow([imagen, L, D, DE, LE])
+
+
+# ---------- Escaladores y modelo ----------
+
+def ampliar_escalador(scaler, datos):
+    # -> (escalador, True si cambió); el rango solo crece si los datos salen de él
+    from sklearn.preprocessing import MinMaxScaler
+    if len(datos) == 0 or (np.all(datos >= scaler.data_min_) and np.all(datos <= scaler.data_max_)):
+        return scaler, False
+    return MinMaxScaler().fit(np.vstack([scaler.data_min_, scaler.data_max_, datos])), True
+
+
+def reescalar_modelo(modelo, sx_viejo, sx_nuevo, sy_viejo, sy_nuevo):
+    # x_viejo = r * x_nuevo + c  ->  W0' = diag(r) W0, b0' = b0 + c W0
+    primera, ultima = modelo.layers[0], modelo.layers[-1]
+    if ultima.activation.__name__ != "linear":
+        raise ValueError("La última capa debe ser lineal para cambiar el escalador Y")
+    r = sx_viejo.scale_ / sx_nuevo.scale_
+    c = sx_viejo.min_ - r * sx_nuevo.min_
+    W, b = primera.get_weights()
+    primera.set_weights([W * r[:, None], b + c @ W])
+    # y_nuevo = s * y_viejo + t  ->  Wn' = Wn s, bn' = bn s + t
+    s = sy_nuevo.scale_ / sy_viejo.scale_
+    t = sy_nuevo.min_ - s * sy_viejo.min_
+    W, b = ultima.get_weights()
+    ultima.set_weights([W * s, b * s + t])
+
+
+def error_validacion(modelo, scaler_x, scaler_y, X, y, scaler_y_ref):
+    # MSE en la escala Y de referencia, comparable entre modelos con escaladores distintos
+    pred = scaler_y.inverse_transform(modelo.predict(scaler_x.transform(X), verbose=0))
+    return float(np.mean(((pred - y) * scaler_y_ref.scale_) ** 2))
+
+
+# ---------- Versiones ----------
+
+def version_vigente(carpeta_versiones=CARPETA_VERSIONES):
+    # -> (número, carpeta con los artefactos); 0 = los archivos originales de INN
+    versiones = sorted(glob.glob(os.path.join(carpeta_versiones, "v[0-9][0-9][0-9]")))
+    if not versiones:
+        return 0, CARPETA
+    return int(os.path.basename(versiones[-1])[1:]), versiones[-1]
+
+
+def publicar(carpeta, modelo, scaler_x, scaler_y, imagenes, X, y, info):
+    import exportar_rni
+    from rni_numpy import RedInversaNumpy
+
+    tmp = carpeta + ".tmp"
+    if os.path.exists(tmp):
+        shutil.rmtree(tmp)
+    os.makedirs(tmp)
+    guardar_artefactos(modelo, scaler_x, scaler_y, tmp)
+    pesos, sesgos, activaciones = exportar_rni.parametros_modelo(modelo)
+    ruta_npz = os.path.join(tmp, NOMBRE_NPZ)
+    exportar_rni.guardar_npz(ruta_npz, pesos, sesgos, activaciones, scaler_x, scaler_y)
+
+    # Mismo control que exportar_rni.py antes de dar la versión por buena
+    x = exportar_rni.entradas_prueba(scaler_x, None)
+    x_escalado = scaler_x.transform(x)
+    dif = np.max(np.abs(RedInversaNumpy(ruta_npz).predecir_escalado(x_escalado)
+                        - modelo.predict(x_escalado, verbose=0)))
+    if dif > exportar_rni.TOLERANCIA:
+        shutil.rmtree(tmp)
+        raise SystemExit(f"La inferencia con NumPy difiere de model.predict en {dif:.2e}; no se publica")
+
+    guardar_tapers(os.path.join(tmp, NOMBRE_TAPERS), imagenes, X, y)
+    with open(os.path.join(tmp, "info.json"), 'w', encoding='utf-8') as f:
+        json.dump(info, f, indent=2, ensure_ascii=False)
+    os.replace(tmp, carpeta)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Reentrenamiento incremental de la RNI con tapers nuevos")
+    parser.add_argument("--resumen", required=True, help="resumen_resultados.csv de PDSeI")
+    parser.add_argument("--recetas", required=True, help="CSV con imagen, DE y LE de cada taper medido")
+    parser.add_argument("--datos", default=RUTA_DATOS, help="Excel de entrenamiento original")
+    parser.add_argument("--epocas", type=int, default=EPOCAS)
+    parser.add_argument("--tasa", type=float, default=TASA, help="tasa de aprendizaje del ajuste")
+    parser.add_argument("--columna-longitud", default=COLUMNA_LONGITUD,
+                        help="columna de resumen_resultados.csv con la longitud del taper (µm)")
+    parser.add_argument("--semilla", type=int, default=None)
+    parser.add_argument("--gui", action="store_true", help="copiar el .npz publicado a GUI/modos")
+    args = parser.parse_args()
+
+    datos = cargar_datos(args.datos)
+    numero_vigente, carpeta_vigente = version_vigente()
+    img_prev, X_prev, y_prev = leer_tapers(os.path.join(carpeta_vigente, NOMBRE_TAPERS))
+
+    mediciones = leer_resumen(args.resumen, args.columna_longitud)
+    recetas = leer_recetas(args.recetas, datos.valores_fijos())
+    img_nuevas, X_nuevo, y_nuevo = unir_tapers(mediciones, recetas)
+    # Un taper ya usado en una versión anterior se reemplaza por la medición nueva
+    reemplazadas = set(img_nuevas)
+    quedan = [i for i, imagen in enumerate(img_prev) if imagen not in reemplazadas]
+    img_prev, X_prev, y_prev = [img_prev[i] for i in quedan], X_prev[quedan], y_prev[quedan]
+    print(f"Versión vigente: {'v%03d' % numero_vigente if numero_vigente else 'INN'} "
+          f"({len(datos)} filas del Excel, {len(img_prev)} tapers de versiones anteriores); "
+          f"tapers nuevos: {len(img_nuevas)}")
+    if not img_nuevas:
+        raise SystemExit("No hay tapers nuevos con receta y medición válidas")
+
+    import joblib
+    from tensorflow import keras
+    from sklearn.model_selection import train_test_split
+    if args.semilla is not None:
+        keras.utils.set_random_seed(args.semilla)
+
+    modelo = keras.models.load_model(os.path.join(carpeta_vigente, NOMBRE_MODELO))
+    sx_vigente = joblib.load(os.path.join(carpeta_vigente, NOMBRE_SCALER_X))
+    sy_vigente = joblib.load(os.path.join(carpeta_vigente, NOMBRE_SCALER_Y))
+
+    # Validación fija: la del notebook más un 20 % de los tapers nuevos (al menos uno)
+    i_train, i_val = train_test_split(np.arange(len(datos)), test_size=FRACCION_PRUEBA,
+                                      random_state=SEMILLA_DIVISION)
+    if len(img_nuevas) > 1:
+        n_train, n_val = train_test_split(np.arange(len(img_nuevas)), test_size=FRACCION_PRUEBA,
+                                          random_state=SEMILLA_DIVISION)
+    else:
+        n_train, n_val = np.array([], dtype=int), np.arange(1)
+    X_train = np.vstack([datos.X[i_train], X_prev, X_nuevo[n_train]])
+    y_train = np.vstack([datos.y[i_train], y_prev, y_nuevo[n_train]])
+    X_val = np.vstack([datos.X[i_val], X_nuevo[n_val]])
+    y_val = np.vstack([datos.y[i_val], y_nuevo[n_val]])
+
+    error_antes = error_validacion(modelo, sx_vigente, sy_vigente, X_val, y_val, sy_vigente)
+
+    X_todo = np.vstack([X_train, X_val])
+    y_todo = np.vstack([y_train, y_val])
+    scaler_x, cambio_x = ampliar_escalador(sx_vigente, X_todo)
+    scaler_y, cambio_y = ampliar_escalador(sy_vigente, y_todo)
+    if cambio_x or cambio_y:
+        reescalar_modelo(modelo, sx_vigente, scaler_x, sy_vigente, scaler_y)
+        print(f"Escaladores ampliados: X {scaler_x.data_min_} - {scaler_x.data_max_}, "
+              f"Y {scaler_y.data_min_} - {scaler_y.data_max_}")
+
+    modelo.compile(optimizer=keras.optimizers.Adam(args.tasa), loss='mse', metrics=['mae'])
+    modelo.fit(scaler_x.transform(X_train), scaler_y.transform(y_train), epochs=args.epocas, verbose=0,
+               validation_data=(scaler_x.transform(X_val), scaler_y.transform(y_val)))
+    error_despues = error_validacion(modelo, scaler_x, scaler_y, X_val, y_val, sy_vigente)
+    print(f"MSE de validación ({len(X_val)} filas): vigente {error_antes:.6f}, ajustado {error_despues:.6f}")
+
+    if error_despues > error_antes:
+        print("El error de validación empeora: no se publica una versión nueva")
+        return 1
+
+    carpeta = os.path.join(CARPETA_VERSIONES, f"v{numero_vigente + 1:03d}")
+    info = {
+        "base": os.path.basename(carpeta_vigente) if numero_vigente else "INN",
+        "resumen": os.path.abspath(args.resumen), "recetas": os.path.abspath(args.recetas),
+        "tapers_nuevos": len(img_nuevas), "tapers_acumulados": len(img_prev) + len(img_nuevas),
+        "epocas": args.epocas, "tasa": args.tasa, "columna_longitud": args.columna_longitud,
+        "mse_validacion_base": error_antes, "mse_validacion": error_despues,
+        "escaladores_ampliados": bool(cambio_x or cambio_y),
+    }
+    publicar(carpeta, modelo, scaler_x, scaler_y, img_prev + img_nuevas,
+             np.vstack([X_prev, X_nuevo]), np.vstack([y_prev, y_nuevo]), info)
+    print(f"Publicada: {carpeta}")
+    if args.gui:
+        shutil.copyfile(os.path.join(carpeta, NOMBRE_NPZ), RUTA_NPZ_GUI)
+        print(f"Copiado a la GUI: {os.path.abspath(RUTA_NPZ_GUI)}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
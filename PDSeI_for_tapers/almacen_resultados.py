@@ -0,0 +1,167 @@
+# -- coding: utf-8 --
+"""
+Almacén de resultados de PDSeI en una base SQLite (biblioteca estándar).
+
+Tablas:
+ - corridas:   run_id, fecha y parámetros del pipeline (JSON).
+ - resultados: una fila por (run_id, imagen) con las métricas escalares en
+               columnas (REAL, o TEXT si se indica en columnas_texto);
+               índices por imagen y por run_id.
+ - perfiles:   perfil de ancho suavizado y su pendiente por (run_id, imagen),
+               guardados como float32 en BLOB junto con la escala en X.
+
+Las escrituras son upserts: reprocesar una imagen dentro de la misma corrida
+reemplaza su fila en lugar de duplicarla.
+
+Uso típico desde un notebook:
+    almacen = AlmacenResultados("resultados.sqlite")
+    datos = almacen.consultar(run_id="20250101-120000")     # dict de arreglos
+    perfiles = almacen.perfiles(imagen="c10_gray")
+"""
+
+import json
+import time
+import sqlite3
+import numpy as np
+
+
+class AlmacenResultados:
+    def __init__(self, ruta, columnas=(), columnas_texto=()):
+        self.ruta = ruta
+        self.con = sqlite3.connect(ruta)
+        self.con.execute("PRAGMA journal_mode=WAL")
+        self.con.execute("PRAGMA synchronous=NORMAL")
+        self.con.executescript("""
+            CREATE TABLE IF NOT EXISTS corridas (
+                run_id     TEXT PRIMARY KEY,
+                fecha      TEXT,
+                parametros TEXT
+            );
+            CREATE TABLE IF NOT EXISTS resultados (
+                run_id TEXT NOT NULL,
+                imagen TEXT NOT NULL,
+                PRIMARY KEY (run_id, imagen)
+            );
+            CREATE TABLE IF NOT EXISTS perfiles (
+                run_id      TEXT NOT NULL,
+                imagen      TEXT NOT NULL,
+                n           INTEGER,
+                escala_x_um REAL,
+                ancho       BLOB,
+                gradiente   BLOB,
+                PRIMARY KEY (run_id, imagen)
+            );
+            CREATE INDEX IF NOT EXISTS idx_resultados_imagen ON resultados (imagen);
+            CREATE INDEX IF NOT EXISTS idx_resultados_run ON resultados (run_id);
+            CREATE INDEX IF NOT EXISTS idx_perfiles_imagen ON perfiles (imagen);
+            CREATE INDEX IF NOT EXISTS idx_perfiles_run ON perfiles (run_id);
+        """)
+        self.tipos = self._columnas_resultados()
+        # Métricas nuevas se agregan como columnas sin tocar las filas viejas
+        for col in columnas:
+            if col not in self.tipos:
+                tipo = "TEXT" if col in columnas_texto else "REAL"
+                self.con.execute(f'ALTER TABLE resultados ADD COLUMN "{col}" {tipo}')
+                self.tipos[col] = tipo
+        self.columnas = list(self.tipos)
+        self.con.commit()
+
+    def _columnas_resultados(self):
+        # {columna: tipo declarado}, sin la clave (run_id, imagen)
+        filas = self.con.execute("PRAGMA table_info(resultados)").fetchall()
+        return {f[1]: f[2].upper() for f in filas if f[1] not in ("run_id", "imagen")}
+
+    def _valor(self, col, valor):
+        if valor is None or valor == "":
+            return None
+        return str(valor) if self.tipos[col] == "TEXT" else float(valor)
+
+    def cerrar(self):
+        self.con.close()
+
+    # --- Escritura ---
+
+    def guardar_corrida(self, run_id, parametros):
+        self.con.execute(
+            "INSERT INTO corridas (run_id, fecha, parametros) VALUES (?, ?, ?) "
+            "ON CONFLICT (run_id) DO UPDATE SET fecha = excluded.fecha, parametros = excluded.parametros",
+            (run_id, time.strftime("%Y-%m-%d %H:%M:%S"), json.dumps(parametros, sort_keys=True)))
+        self.con.commit()
+
+    def guardar(self, run_id, fila, perfil_ancho=None, gradiente=None, escala_x_um=None):
+        """Upsert de las métricas de una imagen y, si se dan, de sus perfiles."""
+        cols = [c for c in self.columnas if c in fila]
+        nombres = ", ".join(f'"{c}"' for c in cols)
+        marcas = ", ".join("?" for _ in cols)
+        actualizar = ", ".join(f'"{c}" = excluded."{c}"' for c in cols)
+        sql = (f"INSERT INTO resultados (run_id, imagen, {nombres}) VALUES (?, ?, {marcas}) "
+               f"ON CONFLICT (run_id, imagen) DO UPDATE SET {actualizar}")
+        self.con.execute(sql, [run_id, fila["imagen"]] + [self._valor(c, fila[c]) for c in cols])
+
+        if perfil_ancho is not None:
+            ancho = np.asarray(perfil_ancho, dtype=np.float32)
+            grad = np.asarray(gradiente, dtype=np.float32)
+            self.con.execute(
+                "INSERT OR REPLACE INTO perfiles (run_id, imagen, n, escala_x_um, ancho, gradiente) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (run_id, fila["imagen"], len(ancho), escala_x_um, ancho.tobytes(), grad.tobytes()))
+        self.con.commit()
+
+    # --- Consultas ---
+
+    @staticmethod
+    def _filtro(run_id, imagen):
+        # run_id / imagen: None, un valor o una lista de valores
+        condiciones, valores = [], []
+        for campo, valor in (("run_id", run_id), ("imagen", imagen)):
+            if valor is None:
+                continue
+            if isinstance(valor, str):
+                valor = [valor]
+            valor = list(valor)
+            condiciones.append(f"{campo} IN ({', '.join('?' for _ in valor)})")
+            valores += valor
+        donde = (" WHERE " + " AND ".join(condiciones)) if condiciones else ""
+        return donde, valores
+
+    def corridas(self):
+        filas = self.con.execute("SELECT run_id, fecha, parametros FROM corridas ORDER BY fecha").fetchall()
+        return [{"run_id": r, "fecha": f, "parametros": json.loads(p) if p else {}} for r, f, p in filas]
+
+    def consultar(self, run_id=None, imagen=None, columnas=None):
+        """
+        Métricas escalares en formato columnar: {columna: np.ndarray}.
+        run_id e imagen aceptan un valor o una lista.
+        """
+        columnas = list(columnas) if columnas is not None else self.columnas
+        donde, valores = self._filtro(run_id, imagen)
+        nombres = ", ".join(["run_id", "imagen"] + [f'"{c}"' for c in columnas])
+        filas = self.con.execute(f"SELECT {nombres} FROM resultados{donde} ORDER BY run_id, imagen",
+                                 valores).fetchall()
+
+        datos = {"run_id": np.array([f[0] for f in filas], dtype=object),
+                 "imagen": np.array([f[1] for f in filas], dtype=object)}
+        for j, col in enumerate(columnas, start=2):
+            if self.tipos.get(col) == "TEXT":
+                datos[col] = np.array([f[j] for f in filas], dtype=object)
+            else:
+                # NULL (p. ej. métricas de una imagen descartada) -> NaN
+                datos[col] = np.array([f[j] for f in filas], dtype=np.float64)
+        return datos
+
+    def perfiles(self, run_id=None, imagen=None):
+        """
+        Perfiles float32 guardados: dict con run_id, imagen, escala_x_um y las
+        listas "ancho" y "gradiente" (un arreglo por fila).
+        """
+        donde, valores = self._filtro(run_id, imagen)
+        filas = self.con.execute(
+            f"SELECT run_id, imagen, escala_x_um, ancho, gradiente FROM perfiles{donde} "
+            f"ORDER BY run_id, imagen", valores).fetchall()
+        return {
+            "run_id": [f[0] for f in filas],
+            "imagen": [f[1] for f in filas],
+            "escala_x_um": np.array([f[2] if f[2] is not None else np.nan for f in filas]),
+            "ancho": [np.frombuffer(f[3], dtype=np.float32) for f in filas],
+            "gradiente": [np.frombuffer(f[4], dtype=np.float32) for f in filas],
+        }
@@ -0,0 +1,244 @@
+# -- coding: utf-8 --
+"""
+Benchmark de las versiones vectorizadas frente a las originales:
+ - extract_fiber_edges vs. extract_fiber_edges_bucles
+ - fill_gaps_in_profile vs. fill_gaps_in_profile_bucles
+ - Canny en modo pirámide (solo la banda de la fibra) vs. imagen completa
+ - Costura de capturas solapadas (--costura) vs. imagen completa
+
+Para cada imagen de la carpeta:
+ - Ejecuta Canny una sola vez (no entra en la medición).
+ - Mide ambas versiones de la extracción de bordes.
+ - Verifica que los perfiles resultantes sean idénticos (NaN incluidos).
+
+Para el relleno de huecos además se comparan ambas versiones sobre perfiles
+aleatorios (huecos en los extremos, huecos cortos y largos, perfiles vacíos,
+max_gap variable) y se mide el tiempo con perfiles ruidosos de cientos de huecos.
+
+Para el modo pirámide se recorren las imágenes en orden (reutilizando la
+banda entre imágenes, como en una corrida real) y se informa cuántos perfiles
+RAW coinciden con los de la imagen completa y la mayor diferencia en píxeles.
+
+Para la costura cada imagen se corta en capturas solapadas de igual ancho; se
+informa el error de los desplazamientos encontrados por correlación y la
+diferencia de las métricas frente a la imagen completa (suavizada con la
+misma ventana en píxeles).
+
+Uso:
+    python benchmark_bordes.py [carpeta] [--repeticiones N] [--casos N]
+
+Requisitos: numpy, matplotlib, scipy, opencv-python
+"""
+
+import os
+import sys
+import time
+import shutil
+import tempfile
+import argparse
+import importlib.util
+import cv2
+import numpy as np
+
+CARPETA_SCRIPT = os.path.dirname(os.path.abspath(__file__))
+RUTA_PIPELINE = os.path.join(CARPETA_SCRIPT, "untitled5_mejorada_2.0.py")
+
+
+def cargar_pipeline():
+    # El nombre del script no es un identificador válido, se carga por ruta
+    spec = importlib.util.spec_from_file_location("pdsei_pipeline", RUTA_PIPELINE)
+    modulo = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(modulo)
+    return modulo
+
+
+def medir(funcion, repeticiones):
+    tiempos = []
+    for _ in range(repeticiones):
+        t0 = time.perf_counter()
+        resultado = funcion()
+        tiempos.append(time.perf_counter() - t0)
+    return min(tiempos), resultado
+
+
+def perfil_con_huecos(rng, n, prob_hueco, largo_max):
+    perfil = np.cumsum(rng.normal(0, 1, n)) + 200
+    x = 0
+    while x < n:
+        if rng.random() < prob_hueco:
+            largo = int(rng.integers(1, largo_max + 1))
+            perfil[x:x + largo] = np.nan
+            x += largo
+        x += 1
+    return perfil
+
+
+def verificar_relleno(pdsei, casos, semilla=0):
+    # Comparación por propiedades: la versión vectorizada debe coincidir
+    # exactamente con la original para cualquier perfil y max_gap.
+    rng = np.random.default_rng(semilla)
+    for caso in range(casos):
+        n = int(rng.integers(1, 700))
+        perfil = perfil_con_huecos(rng, n, rng.random() * 0.5, int(rng.integers(1, 120)))
+        if rng.random() < 0.02:
+            perfil[:] = np.nan
+        max_gap = int(rng.integers(0, 100))
+
+        esperado = pdsei.fill_gaps_in_profile_bucles(perfil, max_gap=max_gap)
+        obtenido = pdsei.fill_gaps_in_profile(perfil, max_gap=max_gap)
+        if not np.array_equal(esperado, obtenido, equal_nan=True):
+            print(f"* Relleno distinto en el caso {caso} (n={n}, max_gap={max_gap})")
+            return False
+    return True
+
+
+def benchmark_relleno(pdsei, repeticiones):
+    rng = np.random.default_rng(1)
+    perfiles = [perfil_con_huecos(rng, 640, 0.3, 8) for _ in range(20)]
+    t_bucles, _ = medir(lambda: [pdsei.fill_gaps_in_profile_bucles(p, pdsei.MAX_GAP_FILL) for p in perfiles],
+                        repeticiones)
+    t_vect, _ = medir(lambda: [pdsei.fill_gaps_in_profile(p, pdsei.MAX_GAP_FILL) for p in perfiles],
+                      repeticiones)
+    huecos = int(np.mean([np.count_nonzero(np.diff(np.isnan(p).astype(int)) == 1) for p in perfiles]))
+    print(f"\nRelleno de huecos (20 perfiles de 640 px, ~{huecos} huecos c/u):")
+    print(f"  bucles: {t_bucles * 1e3:.2f} ms   vector: {t_vect * 1e3:.2f} ms   speedup: {t_bucles / t_vect:.1f}x")
+
+
+def verificar_piramide(pdsei, carpeta, files, repeticiones):
+    grises = [pdsei.leer_gris(os.path.join(carpeta, f)) for f in files]
+    t_completa, completos = medir(lambda: [pdsei.canny_gris(g) for g in grises], repeticiones)
+
+    def piramide():
+        pdsei.banda_previa = None
+        return [pdsei.canny_piramide(g) for g in grises]
+    t_piramide, reducidos = medir(piramide, repeticiones)
+
+    identicos = 0
+    max_dif = 0.0
+    filas_banda = []
+    for edges_full, (edges_pir, banda) in zip(completos, reducidos):
+        ref = pdsei.extract_fiber_edges(edges_full, max_pixel_jump=pdsei.MAX_PIXEL_JUMP)
+        pir = pdsei.extract_fiber_edges(edges_pir, max_pixel_jump=pdsei.MAX_PIXEL_JUMP, filas=banda)
+        if all(np.array_equal(a, b, equal_nan=True) for a, b in zip(ref, pir)):
+            identicos += 1
+        else:
+            max_dif = max(max_dif, max(float(np.nanmax(np.abs(a - b))) for a, b in zip(ref, pir)))
+        filas_banda.append(banda[1] - banda[0] if banda else edges_full.shape[0])
+
+    print(f"\nCanny en modo pirámide ({len(files)} imágenes, banda media {np.mean(filas_banda):.0f} filas):")
+    print(f"  completa: {t_completa * 1e3:.2f} ms   pirámide: {t_piramide * 1e3:.2f} ms   "
+          f"speedup: {t_completa / t_piramide:.1f}x")
+    print(f"  perfiles RAW idénticos a la imagen completa: {identicos}/{len(files)}"
+          + (f"   (mayor diferencia: {max_dif:.1f} px)" if identicos < len(files) else ""))
+    return identicos == len(files)
+
+
+def verificar_costura(pdsei, carpeta, files, ancho=320, paso=160):
+    inicios = list(range(0, 640 - ancho + 1, paso))
+    campos = ("ancho_minimo_waist", "x_waist", "longitud_taper", "longitud_cintura")
+    temporal = tempfile.mkdtemp(prefix="costura_")
+    errores, difs, tiempos, poco_confiables = [], [], [], 0
+    try:
+        for fname in files:
+            gray = pdsei.leer_gris(os.path.join(carpeta, fname))
+            rutas = []
+            for i, x0 in enumerate(inicios):
+                rutas.append(os.path.join(temporal, f"{i:02d}.png"))
+                cv2.imwrite(rutas[-1], gray[:, x0:x0 + ancho])
+            try:
+                t0 = time.perf_counter()
+                info, _, _, _, posiciones_um, r = pdsei.coser_imagenes(rutas)
+                tiempos.append(time.perf_counter() - t0)
+            except ValueError:
+                continue    # alguna captura se descarta (p. ej. fibra sin estirar)
+            escala = pdsei.height_real_um / gray.shape[0]
+            if r.min() < pdsei.COSTURA_R_MIN:
+                poco_confiables += 1
+                continue
+            errores.append(np.max(np.abs(posiciones_um / escala - inicios)))
+
+            # Referencia: imagen completa con la ventana de suavizado de una captura
+            edges = pdsei.canny_gris(gray)
+            up, low = pdsei.extract_fiber_edges(edges, max_pixel_jump=pdsei.MAX_PIXEL_JUMP)
+            up_s, low_s = pdsei.suavizar_perfiles_individuales(
+                up, low, window_length_factor=pdsei.SMOOTH_WINDOW_FACTOR * ancho / gray.shape[1],
+                polyorder=pdsei.SMOOTH_POLYORDER)
+            x_um, y_up, y_low = pdsei.perfiles_centrados_um(up_s, low_s, gray.shape[0])
+            ref = pdsei.recognize_fiber_taper(x_um, y_up, y_low,
+                                              taper_angle_threshold_factor=pdsei.TAPER_ANGLE_THRESHOLD_FACTOR,
+                                              waist_angle_threshold_factor=pdsei.WAIST_ANGLE_THRESHOLD_FACTOR)
+            difs.append([abs(info[c] - ref[c]) for c in campos])
+    finally:
+        shutil.rmtree(temporal, ignore_errors=True)
+
+    print(f"\nCostura ({len(inicios)} capturas de {ancho} px cada {paso} px, {len(errores)} imágenes comparadas, "
+          f"{poco_confiables} con r < {pdsei.COSTURA_R_MIN}):")
+    if not errores:
+        return False
+    print(f"  tiempo medio: {np.mean(tiempos) * 1e3:.1f} ms   "
+          f"mayor error de desplazamiento: {max(errores):.2f} px")
+    difs = np.array(difs)
+    for j, c in enumerate(campos):
+        print(f"  {c:<20} diferencia mediana {np.median(difs[:, j]):8.1f} µm   máx {difs[:, j].max():8.1f} µm")
+    return max(errores) < 1.0
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de extract_fiber_edges")
+    parser.add_argument("carpeta", nargs="?", default=os.path.join(CARPETA_SCRIPT, "caracterizar"))
+    parser.add_argument("--repeticiones", type=int, default=3)
+    parser.add_argument("--casos", type=int, default=2000,
+                        help="perfiles aleatorios para verificar fill_gaps_in_profile")
+    args = parser.parse_args()
+
+    pdsei = cargar_pipeline()
+    files = sorted(f for f in os.listdir(args.carpeta) if pdsei.is_image_file(f))
+    if not files:
+        print("No se encontraron imágenes en:", args.carpeta)
+        return 1
+
+    total_bucles = 0.0
+    total_vect = 0.0
+    diferencias = 0
+
+    print(f"{'imagen':<16}{'bucles [ms]':>14}{'vector [ms]':>14}{'speedup':>10}  idéntico")
+    for fname in files:
+        edges = pdsei.process_image_with_canny(os.path.join(args.carpeta, fname))
+
+        t_bucles, (up_ref, low_ref) = medir(
+            lambda: pdsei.extract_fiber_edges_bucles(edges, max_pixel_jump=pdsei.MAX_PIXEL_JUMP),
+            args.repeticiones)
+        t_vect, (up_vec, low_vec) = medir(
+            lambda: pdsei.extract_fiber_edges(edges, max_pixel_jump=pdsei.MAX_PIXEL_JUMP),
+            args.repeticiones)
+
+        identico = (np.array_equal(up_ref, up_vec, equal_nan=True)
+                    and np.array_equal(low_ref, low_vec, equal_nan=True))
+        if not identico:
+            diferencias += 1
+
+        total_bucles += t_bucles
+        total_vect += t_vect
+        print(f"{fname:<16}{t_bucles * 1e3:>14.2f}{t_vect * 1e3:>14.2f}{t_bucles / t_vect:>9.1f}x  {'sí' if identico else 'NO'}")
+
+    print("-" * 62)
+    print(f"{'TOTAL':<16}{total_bucles * 1e3:>14.2f}{total_vect * 1e3:>14.2f}{total_bucles / total_vect:>9.1f}x")
+    benchmark_relleno(pdsei, args.repeticiones)
+    relleno_ok = verificar_relleno(pdsei, args.casos)
+    if relleno_ok:
+        print(f"  {args.casos} perfiles aleatorios: relleno idéntico a la versión original.")
+    # Informativo: el modo pirámide es opcional y puede diferir cerca de la banda
+    verificar_piramide(pdsei, args.carpeta, files, args.repeticiones)
+    verificar_costura(pdsei, args.carpeta, files)
+
+    if diferencias:
+        print(f"\n* {diferencias} imagen(es) con perfiles distintos a la versión original")
+        return 1
+    if not relleno_ok:
+        return 1
+    print("\nTodos los perfiles coinciden con la versión original.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,266 @@
+# -- coding: utf-8 --
+"""
+Benchmark reproducible del pipeline de PDSeI sobre las imágenes incluidas
+en el repositorio (caracterizar/ y validacion/).
+
+Mide:
+ - Imágenes/s de cada etapa (decodificación, Canny, bordes, relleno de
+   huecos, suavizado, reconocimiento, escritura), con los tiempos por etapa
+   de --tiempos, en una corrida secuencial sin gráficas.
+ - Imágenes/s de punta a punta con y sin gráficas, con 1..N procesos,
+   ejecutando el script por línea de comandos (incluye el arranque).
+
+Además compara las métricas de cada imagen con los CSV de referencia de la
+carpeta golden/, de modo que cualquier optimización de extract_fiber_edges,
+fill_gaps_in_profile o recognize_fiber_taper demuestre que no cambia las
+longitudes ni los diámetros medidos. La API importable (medidor_taper.py) se
+compara con los mismos CSV y se informa su tiempo y la memoria que reserva
+por imagen.
+
+Cada conjunto usa su calibración (píxeles por diámetro):
+    caracterizar: 15.15    validacion: 16.7
+
+Uso:
+    python benchmark_pdsei.py [--conjuntos caracterizar,validacion]
+                              [--workers-max N] [--sin-graficas]
+                              [--max-graficas N] [--actualizar-golden]
+                              [--piramide]
+
+Requisitos: numpy, matplotlib, scipy, opencv-python
+"""
+
+import os
+import sys
+import csv
+import time
+import tracemalloc
+import shutil
+import argparse
+import subprocess
+import tempfile
+import importlib.util
+import numpy as np
+
+CARPETA_SCRIPT = os.path.dirname(os.path.abspath(__file__))
+RUTA_PIPELINE = os.path.join(CARPETA_SCRIPT, "untitled5_mejorada_2.0.py")
+CARPETA_GOLDEN = os.path.join(CARPETA_SCRIPT, "golden")
+
+CONJUNTOS = {"caracterizar": 15.15, "validacion": 16.7}
+
+# Tolerancia relativa frente a golden: el pipeline por imagen es exacto, pero
+# el suavizado en lote puede diferir en el último bit (~1e-12 relativo).
+RTOL_GOLDEN = 1e-9
+
+# La columna "sin arranque" resta un arranque medido una vez (1 proceso, sin
+# imágenes); con menos procesamiento neto que esta fracción de él se muestra n/a
+RUIDO_ARRANQUE = 0.10
+
+
+def cargar_pipeline():
+    # El nombre del script no es un identificador válido, se carga por ruta
+    spec = importlib.util.spec_from_file_location("pdsei_pipeline", RUTA_PIPELINE)
+    modulo = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(modulo)
+    return modulo
+
+
+def configurar(pdsei, carpeta, calibracion, salida, piramide=False):
+    pdsei.input_dir = carpeta
+    pdsei.output_dir = salida
+    pdsei.fijar_calibracion(calibracion)
+    pdsei.cache = None
+    pdsei.almacen = None
+    pdsei.cronometro = None
+    pdsei.PIRAMIDE = piramide
+    pdsei.banda_previa = None
+
+
+def correr_lote(pdsei, files, workers, graficas):
+    filas = []
+    for fname, row, error in pdsei.procesar_lote(files, workers=workers, graficas=graficas):
+        if error is not None:
+            raise RuntimeError(f"{fname}: {error}")
+        tiempos = row.pop("tiempos", None)
+        if pdsei.cronometro is not None:
+            pdsei.cronometro.agregar(tiempos)
+        filas.append(row)
+    return filas
+
+
+def correr_cli(carpeta, calibracion, salida, workers, graficas, files, extra=()):
+    # Punta a punta tal como se usa en el laboratorio: el script por línea de
+    # comandos (incluye el arranque de Python y del pool de procesos)
+    entrada = tempfile.mkdtemp(prefix="entrada_", dir=salida)
+    for fname in files:
+        shutil.copy(os.path.join(carpeta, fname), entrada)
+    carpeta_salida = os.path.join(entrada, "salida")
+    try:
+        t0 = time.perf_counter()
+        subprocess.run([sys.executable, RUTA_PIPELINE, "--entrada", entrada, "--salida", carpeta_salida,
+                        "--calibracion", str(calibracion), "--workers", str(workers),
+                        "--graficas", graficas] + list(extra),
+                       check=True, stdout=subprocess.DEVNULL)
+        return time.perf_counter() - t0
+    finally:
+        shutil.rmtree(entrada, ignore_errors=True)
+
+
+def tiempos_por_etapa(pdsei, files):
+    pdsei.cronometro = pdsei.CronometroEtapas()
+    try:
+        filas = correr_lote(pdsei, files, 1, "ninguna")
+    finally:
+        cronometro, pdsei.cronometro = pdsei.cronometro, None
+    return filas, cronometro
+
+
+def leer_golden(path):
+    with open(path, 'r', newline='', encoding='utf-8') as f:
+        return {row["imagen"]: row for row in csv.DictReader(f)}
+
+
+def escribir_golden(path, filas, campos):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.DictWriter(f, fieldnames=campos)
+        writer.writeheader()
+        for row in filas:
+            writer.writerow({c: (row[c] if c == "imagen" else repr(float(row[c]))) for c in campos})
+
+
+def comparar_golden(filas, golden, campos):
+    # Devuelve la lista de diferencias [(imagen, campo, esperado, obtenido)]
+    diferencias = []
+    obtenidas = {row["imagen"] for row in filas}
+    for img in sorted(set(golden) - obtenidas):
+        diferencias.append((img, "(falta la imagen)", "", ""))
+    for row in filas:
+        esperado = golden.get(row["imagen"])
+        if esperado is None:
+            diferencias.append((row["imagen"], "(no está en golden)", "", ""))
+            continue
+        if row.get("descarte"):
+            diferencias.append((row["imagen"], "(descartada)", "", row["descarte"]))
+            continue
+        for campo in campos[1:]:
+            a, b = float(esperado[campo]), float(row[campo])
+            if not np.isclose(a, b, rtol=RTOL_GOLDEN, atol=0.0):
+                diferencias.append((row["imagen"], campo, a, b))
+    return diferencias
+
+
+def verificar_medidor(carpeta, files, calibracion, golden, campos):
+    # La API con buffers reutilizados debe dar las mismas métricas que el script
+    from medidor_taper import ConfigMedicion, MedidorTaper
+    medidor = MedidorTaper(ConfigMedicion(calibracion=calibracion))
+    grises = [medidor.pdsei.leer_gris(os.path.join(carpeta, f)) for f in files]
+    filas = [medidor.medir(g, os.path.splitext(f)[0]) for g, f in zip(grises, files)]
+
+    t0 = time.perf_counter()
+    for g in grises:
+        medidor.medir(g)
+    dt = (time.perf_counter() - t0) / len(grises)
+
+    tracemalloc.start()
+    base = tracemalloc.get_traced_memory()[0]
+    medidor.medir(grises[0])
+    pico_kb = (tracemalloc.get_traced_memory()[1] - base) / 1024
+    tracemalloc.stop()
+
+    diferencias = comparar_golden(filas, golden, campos)
+    print(f"\nMedidorTaper: {dt * 1e3:.2f} ms/imagen, pico de memoria reservada por imagen {pico_kb:.0f} KB, "
+          + ("métricas idénticas a golden." if not diferencias else f"{len(diferencias)} diferencia(s) con golden"))
+    return not diferencias
+
+
+def benchmark_conjunto(pdsei, nombre, args, salida):
+    carpeta = os.path.join(CARPETA_SCRIPT, nombre)
+    configurar(pdsei, carpeta, CONJUNTOS[nombre], salida, args.piramide)
+    extra = ["--piramide"] if args.piramide else []
+    files = sorted(f for f in os.listdir(carpeta) if pdsei.is_image_file(f))
+    n = len(files)
+    print(f"\n##### {nombre}: {n} imágenes (calibración {CONJUNTOS[nombre]}) #####")
+
+    # --- Por etapa (secuencial, sin gráficas) ---
+    filas, cronometro = tiempos_por_etapa(pdsei, files)
+    print(f"\n{'etapa':<20}{'total [ms]':>12}{'img/s':>12}")
+    for col in cronometro.columnas():
+        total = sum(reg.get(col, 0.0) for reg in cronometro.registros)
+        if total > 0:
+            print(f"{col:<20}{total * 1e3:>12.1f}{n / total:>12.1f}")
+
+    # --- Golden ---
+    campos = [c for c in pdsei.CSV_FIELDNAMES if c == "imagen" or c not in pdsei.CAMPOS_TEXTO]
+    ruta_golden = os.path.join(CARPETA_GOLDEN, nombre + ".csv")
+    golden_ok = True
+    if args.actualizar_golden:
+        escribir_golden(ruta_golden, filas, campos)
+        print(f"\nGolden actualizado: {ruta_golden}")
+    elif not os.path.exists(ruta_golden):
+        print(f"\n* No existe {ruta_golden}; ejecutar con --actualizar-golden")
+        golden_ok = False
+    else:
+        diferencias = comparar_golden(filas, leer_golden(ruta_golden), campos)
+        if diferencias:
+            golden_ok = False
+            print(f"\n* {len(diferencias)} diferencia(s) con {ruta_golden}:")
+            for img, campo, a, b in diferencias[:20]:
+                print(f"    {img:<12}{campo:<24}{a!s:>24}{b!s:>24}")
+        else:
+            print(f"\nMétricas idénticas a golden ({n} imágenes, rtol={RTOL_GOLDEN:g}).")
+        if not args.piramide:
+            golden_ok &= verificar_medidor(carpeta, files, CONJUNTOS[nombre], leer_golden(ruta_golden), campos)
+
+    # --- Punta a punta ---
+    # Arranque del script (imports, carpeta vacía) para separarlo del procesamiento
+    arranque = correr_cli(carpeta, CONJUNTOS[nombre], salida, 1, "ninguna", [], extra)
+    print(f"\nArranque del script: {arranque:.2f} s")
+    print(f"{'gráficas':<12}{'workers':>8}{'imágenes':>10}{'tiempo [s]':>12}{'img/s':>10}{'sin arranque':>14}")
+    modos = ["ninguna"] if args.sin_graficas else ["ninguna", "todas"]
+    for graficas in modos:
+        # Las gráficas tardan segundos por imagen: se limita la cantidad
+        subconjunto = files if graficas == "ninguna" else files[:args.max_graficas]
+        for workers in range(1, args.workers_max + 1):
+            dt = correr_cli(carpeta, CONJUNTOS[nombre], salida, workers, graficas, subconjunto, extra)
+            # Si el procesamiento no supera el ruido del arranque, la tasa neta no significa nada
+            neto = dt - arranque
+            sin_arranque = (f"{len(subconjunto) / neto:>14.2f}" if neto > RUIDO_ARRANQUE * arranque
+                            else f"{'n/a':>14}")
+            print(f"{graficas:<12}{workers:>8}{len(subconjunto):>10}{dt:>12.2f}"
+                  f"{len(subconjunto) / dt:>10.2f}{sin_arranque}")
+
+    return golden_ok
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark del pipeline de PDSeI")
+    parser.add_argument("--conjuntos", default=",".join(CONJUNTOS),
+                        help="conjuntos a medir, separados por comas")
+    parser.add_argument("--workers-max", type=int, default=os.cpu_count() or 1,
+                        help="se mide con 1..N procesos")
+    parser.add_argument("--sin-graficas", action="store_true",
+                        help="no medir el modo con gráficas")
+    parser.add_argument("--max-graficas", type=int, default=4,
+                        help="imágenes usadas en las corridas con gráficas")
+    parser.add_argument("--piramide", action="store_true",
+                        help="medir y verificar el modo pirámide (Canny solo en la banda de la fibra)")
+    parser.add_argument("--actualizar-golden", action="store_true",
+                        help="reescribir golden/<conjunto>.csv con los resultados actuales")
+    args = parser.parse_args()
+
+    pdsei = cargar_pipeline()
+    salida = tempfile.mkdtemp(prefix="benchmark_pdsei_")
+    try:
+        resultados = [benchmark_conjunto(pdsei, nombre.strip(), args, salida)
+                      for nombre in args.conjuntos.split(",") if nombre.strip()]
+    finally:
+        shutil.rmtree(salida, ignore_errors=True)
+
+    if not all(resultados):
+        print("\n* Hay métricas distintas a golden")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,116 @@
+# -- coding: utf-8 --
+"""
+Caché en disco de las salidas de cada etapa del pipeline de PDSeI.
+
+Cada entrada es un .npz guardado en <carpeta>/<etapa>/<clave>.npz. La clave
+es un hash de los bytes de la imagen más los parámetros de la etapa y de las
+etapas anteriores (las claves se encadenan), así que al cambiar un parámetro
+solo se recalculan las etapas que dependen de él.
+
+Cuando la carpeta supera max_mb se borran las entradas usadas hace más
+tiempo (LRU, usando la fecha de modificación que se renueva en cada lectura)
+hasta bajar al 90 % de max_mb. El tamaño total se lleva en memoria (índice
+armado al abrir la caché y actualizado en cada escritura), así que la carpeta
+solo se recorre al abrirla y cuando hay que desalojar.
+Las escrituras son atómicas (archivo temporal + os.replace), de modo que
+varios procesos pueden compartir la misma caché.
+"""
+
+import os
+import hashlib
+import tempfile
+import numpy as np
+
+FRACCION_DESALOJO = 0.9   # al desalojar se baja hasta esta fracción de max_mb
+
+
+def hash_archivo(path, bloque=1 << 20):
+    h = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(bloque), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+class CacheEtapas:
+    def __init__(self, carpeta, max_mb=500):
+        self.carpeta = carpeta
+        self.max_mb = max_mb
+        self.max_bytes = int(max_mb * 1024 * 1024)
+        self.aciertos = 0
+        self.fallos = 0
+        os.makedirs(carpeta, exist_ok=True)
+        self._indexar()
+
+    def _indexar(self, lista=None):
+        # ruta -> tamaño de las entradas; otros procesos pueden escribir en la misma carpeta,
+        # por eso se vuelve a armar desde el disco cada vez que se desaloja
+        if lista is None:
+            lista = self.entradas()
+        self._tamanos = {ruta: tam for _, tam, ruta in lista}
+        self.total_bytes = sum(self._tamanos.values())
+
+    @staticmethod
+    def clave(*partes):
+        # Las partes pueden incluir la clave de la etapa anterior
+        return hashlib.sha256(repr(partes).encode('utf-8')).hexdigest()
+
+    def _ruta(self, etapa, clave):
+        return os.path.join(self.carpeta, etapa, clave + ".npz")
+
+    def obtener(self, etapa, clave):
+        ruta = self._ruta(etapa, clave)
+        try:
+            with np.load(ruta) as d:
+                datos = {k: d[k] for k in d.files}
+            os.utime(ruta)   # marcar como usado recientemente
+        except (FileNotFoundError, OSError, ValueError):
+            # Ausente, borrada por otro proceso o incompleta
+            self.fallos += 1
+            return None
+        self.aciertos += 1
+        return datos
+
+    def guardar(self, etapa, clave, **arrays):
+        carpeta_etapa = os.path.join(self.carpeta, etapa)
+        os.makedirs(carpeta_etapa, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=carpeta_etapa, suffix=".tmp")
+        with os.fdopen(fd, 'wb') as f:
+            np.savez_compressed(f, **arrays)
+        ruta = self._ruta(etapa, clave)
+        os.replace(tmp, ruta)
+        tam = os.path.getsize(ruta)
+        self.total_bytes += tam - self._tamanos.get(ruta, 0)
+        self._tamanos[ruta] = tam
+        if self.total_bytes > self.max_bytes:
+            self.desalojar()
+
+    def entradas(self):
+        # [(mtime, tamaño, ruta)] de todas las entradas
+        lista = []
+        for raiz, _, archivos in os.walk(self.carpeta):
+            for nombre in archivos:
+                if not nombre.endswith(".npz"):
+                    continue
+                ruta = os.path.join(raiz, nombre)
+                try:
+                    st = os.stat(ruta)
+                except FileNotFoundError:
+                    continue
+                lista.append((st.st_mtime, st.st_size, ruta))
+        return lista
+
+    def desalojar(self):
+        lista = self.entradas()
+        total = sum(tam for _, tam, _ in lista)
+        if total > self.max_bytes:
+            objetivo = self.max_bytes * FRACCION_DESALOJO
+            lista.sort()
+            while lista and total > objetivo:
+                _, tam, ruta = lista.pop(0)
+                try:
+                    os.remove(ruta)
+                except FileNotFoundError:
+                    pass
+                total -= tam
+        self._indexar(lista)
@@ -0,0 +1,123 @@
+# -- coding: utf-8 --
+"""
+Costura de perfiles de ancho de varias capturas solapadas (modo --costura de
+PDSeI), para tapers más largos que el campo de la cámara.
+
+El desplazamiento entre dos capturas consecutivas se obtiene de la
+correlación 1-D de sus perfiles de ancho, no de registrar las imágenes:
+todas las sumas necesarias para el coeficiente de Pearson en cada
+desplazamiento (solo sobre la zona solapada y sin los NaN) salen de un par de
+FFT, y el máximo se refina a subpíxel con una parábola.
+
+Los perfiles se ubican en una grilla común y en las zonas solapadas se
+promedian con un peso que cae hacia los bordes de cada captura (donde Canny
+es menos confiable), así las uniones no dejan escalones.
+
+La correlación necesita que la zona solapada tenga forma: dos tramos de ancho
+nominal constante solo comparten ruido. Conviene que cada par de capturas
+comparta parte de una transición o del waist.
+"""
+
+import numpy as np
+
+
+def desplazamiento_perfiles(a, b, solape_min=64):
+    """
+    Posición de b en las coordenadas de a (b[x] ~ a[x + d]) que maximiza la
+    correlación de Pearson en la zona solapada, con al menos solape_min
+    puntos válidos en común. Devuelve (d, r); d puede ser negativo y no
+    necesariamente entero.
+    """
+    a = np.asarray(a, dtype=np.float64)
+    b = np.asarray(b, dtype=np.float64)
+    na, nb = len(a), len(b)
+    ma, mb = np.isfinite(a), np.isfinite(b)
+    a0, b0 = np.where(ma, a, 0.0), np.where(mb, b, 0.0)
+    # Sin la media las sumas de cuadrados no pierden precisión
+    a0 -= a0.sum() / max(ma.sum(), 1) * ma
+    b0 -= b0.sum() / max(mb.sum(), 1) * mb
+
+    L = na + nb - 1
+    FA = np.fft.rfft(np.vstack([a0, a0 * a0, ma]), L)
+    FB = np.conj(np.fft.rfft(np.vstack([b0, b0 * b0, mb]), L))
+    sumas = np.fft.irfft(np.vstack([FA[0] * FB[0],     # a*b
+                                    FA[0] * FB[2],     # a
+                                    FA[1] * FB[2],     # a^2
+                                    FA[2] * FB[0],     # b
+                                    FA[2] * FB[1],     # b^2
+                                    FA[2] * FB[2]]),   # puntos en común
+                         L)
+    # Índice k de la correlación circular -> desplazamiento (k >= na son negativos)
+    desplazamientos = np.where(np.arange(L) < na, np.arange(L), np.arange(L) - L)
+
+    s_ab, s_a, s_aa, s_b, s_bb, n = sumas
+    n = np.rint(n)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        cov = s_ab - s_a * s_b / n
+        var_a = s_aa - s_a * s_a / n
+        var_b = s_bb - s_b * s_b / n
+        r = cov / np.sqrt(var_a * var_b)
+    r[(n < solape_min) | ~(var_a > 0) | ~(var_b > 0)] = -np.inf
+    k = int(np.argmax(r))
+    if not np.isfinite(r[k]):
+        raise ValueError(f"Los perfiles no tienen {solape_min} puntos válidos en común")
+
+    # Refinamiento subpíxel con los vecinos (si son desplazamientos válidos)
+    d = float(desplazamientos[k])
+    izq, der = r[(k - 1) % L], r[(k + 1) % L]
+    if np.isfinite(izq) and np.isfinite(der):
+        curvatura = izq - 2 * r[k] + der
+        if curvatura < 0:
+            d += 0.5 * (izq - der) / curvatura
+    return d, float(r[k])
+
+
+def peso_borde(n):
+    # 1 en el centro de la captura, cae linealmente hasta ~0 en los bordes
+    x = np.arange(n)
+    return np.minimum(x + 1, n - x) / ((n + 1) / 2)
+
+
+def coser_perfiles(perfiles, posiciones):
+    """
+    Une perfiles 1-D ubicados en posiciones (en píxeles, la primera
+    cualquiera) sobre una grilla entera común. Devuelve (x, perfil) con x en
+    píxeles desde el extremo izquierdo de la costura; los puntos sin ningún
+    perfil válido quedan NaN.
+    """
+    posiciones = np.asarray(posiciones, dtype=np.float64)
+    inicio = posiciones.min()
+    posiciones = posiciones - inicio
+    n_total = int(np.ceil(max(p + len(perf) - 1 for p, perf in zip(posiciones, perfiles)))) + 1
+    x = np.arange(n_total, dtype=np.float64)
+
+    suma = np.zeros(n_total)
+    pesos = np.zeros(n_total)
+    for p, perf in zip(posiciones, perfiles):
+        perf = np.asarray(perf, dtype=np.float64)
+        xi = np.arange(len(perf))
+        # Cada perfil se remuestrea en la grilla común (interpolación lineal)
+        valores = np.interp(x - p, xi, perf, left=np.nan, right=np.nan)
+        w = np.interp(x - p, xi, peso_borde(len(perf)), left=0.0, right=0.0)
+        validos = np.isfinite(valores) & (w > 0)
+        suma[validos] += w[validos] * valores[validos]
+        pesos[validos] += w[validos]
+
+    with np.errstate(invalid='ignore'):
+        cosido = np.where(pesos > 0, suma / pesos, np.nan)
+    return x, cosido
+
+
+def posiciones_secuencia(perfiles, solape_min=64):
+    """
+    Posición de cada perfil respecto del primero, encadenando los
+    desplazamientos entre capturas consecutivas. Devuelve (posiciones, r) con
+    r el coeficiente de correlación de cada unión.
+    """
+    posiciones = [0.0]
+    correlaciones = []
+    for a, b in zip(perfiles[:-1], perfiles[1:]):
+        d, r = desplazamiento_perfiles(a, b, solape_min)
+        posiciones.append(posiciones[-1] + d)
+        correlaciones.append(r)
+    return np.array(posiciones), np.array(correlaciones)
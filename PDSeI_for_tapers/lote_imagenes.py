@@ -0,0 +1,136 @@
+# -- coding: utf-8 --
+"""
+Carga de una carpeta de capturas como una sola pila (N, alto, ancho) uint8
+para el modo --lote de PDSeI.
+
+La primera vez se decodifica cada imagen y se escribe la pila en un .npy
+dentro de la carpeta de caché; las corridas siguientes lo abren con
+np.load(mmap_mode='r') y no vuelven a decodificar ningún JPEG. El nombre del
+.npy depende de la carpeta y de (nombre, tamaño, fecha) de cada archivo
+apilado, así que agregar o modificar una imagen genera una pila nueva (y la
+anterior de esa carpeta se borra).
+
+Una imagen que no se puede leer, o de tamaño distinto al más frecuente de
+la carpeta, no se apila: se devuelve con su error para que el lote la informe y
+siga con las demás. Las descartadas quedan anotadas en un .json junto a la
+pila (con la firma de todos los archivos de la carpeta), así una corrida con
+caché las informa igual sin decodificar nada.
+
+La pila se escribe directamente en disco (open_memmap), sin tener todas las
+imágenes en memoria a la vez.
+"""
+
+import os
+import glob
+import json
+import hashlib
+from collections import Counter
+import numpy as np
+
+# Tipos de error que se reconstruyen desde el .json (el resto como OSError)
+ERRORES = {"FileNotFoundError": FileNotFoundError, "ValueError": ValueError}
+
+
+def firma_archivos(carpeta, files):
+    h = hashlib.sha256()
+    for fname in files:
+        st = os.stat(os.path.join(carpeta, fname))
+        h.update(f"{fname}|{st.st_size}|{st.st_mtime_ns}\n".encode('utf-8'))
+    return h.hexdigest()
+
+
+def leer_validos(carpeta, files, leer, ruta_tmp, forma=None):
+    # Decodifica en orden y escribe las imágenes válidas (del tamaño forma, o
+    # del de la primera legible) al principio de un memmap de len(files) filas
+    # -> (validos, errores, forma, conteo de tamaños legibles)
+    validos, errores = [], []
+    formas = Counter()
+    pila = None
+    try:
+        for fname in files:
+            try:
+                img = leer(os.path.join(carpeta, fname))
+                formas[img.shape] += 1
+                forma = forma or img.shape
+                if img.shape != forma:
+                    raise ValueError(f"{fname}: tamaño {img.shape} distinto de {forma}")
+            except (OSError, ValueError) as e:
+                errores.append((fname, e))
+                continue
+            if pila is None:
+                pila = np.lib.format.open_memmap(ruta_tmp, mode='w+', dtype=np.uint8,
+                                                 shape=(len(files),) + forma)
+            pila[len(validos)] = img
+            validos.append(fname)
+        if pila is not None:
+            pila.flush()
+    except BaseException:
+        del pila
+        if os.path.exists(ruta_tmp):
+            os.remove(ruta_tmp)
+        raise
+    del pila
+    return validos, errores, forma, formas
+
+
+def cargar_pila(carpeta, files, leer, carpeta_cache):
+    """
+    leer(path) -> imagen 2-D uint8 (en gris). Devuelve (pila, validos,
+    errores): la pila de las imágenes válidas como memmap de solo lectura
+    (None si no queda ninguna), sus nombres en el orden de la pila y una
+    lista de (nombre, excepción) con las que no se pudieron apilar.
+    """
+    if not files:
+        raise ValueError("No hay imágenes para apilar")
+    os.makedirs(carpeta_cache, exist_ok=True)
+    prefijo = "pila_" + hashlib.sha256(os.path.abspath(carpeta).encode('utf-8')).hexdigest()[:12]
+    ruta_indice = os.path.join(carpeta_cache, f"{prefijo}_{firma_archivos(carpeta, files)[:16]}.json")
+
+    def ruta_pila(validos):
+        return os.path.join(carpeta_cache, f"{prefijo}_{firma_archivos(carpeta, validos)[:16]}.npy")
+
+    try:
+        with open(ruta_indice, 'r', encoding='utf-8') as f:
+            indice = json.load(f)
+        validos = indice["validos"]
+        errores = [(fname, ERRORES.get(tipo, OSError)(mensaje)) for fname, tipo, mensaje in indice["errores"]]
+        if not validos:
+            return None, validos, errores
+        if os.path.exists(ruta_pila(validos)):
+            return np.load(ruta_pila(validos), mmap_mode='r'), validos, errores
+    except (OSError, ValueError, KeyError, TypeError):
+        pass
+
+    tmp = ruta_indice[:-len(".json")] + ".tmp.npy"
+    validos, errores, forma, formas = leer_validos(carpeta, files, leer, tmp)
+    if formas and formas[forma] < max(formas.values()):
+        # La primera imagen legible tenía un tamaño minoritario: se repite con el más frecuente
+        forma = formas.most_common(1)[0][0]
+        validos, errores, forma, formas = leer_validos(carpeta, files, leer, tmp, forma)
+    ruta = ruta_pila(validos) if validos else None
+    if validos:
+        if len(validos) == len(files):
+            os.replace(tmp, ruta)
+        else:
+            # Solo las filas escritas (las descartadas dejaron el final vacío)
+            completa = np.load(tmp, mmap_mode='r')
+            pila = np.lib.format.open_memmap(ruta + ".tmp", mode='w+', dtype=np.uint8,
+                                             shape=(len(validos),) + forma)
+            pila[:] = completa[:len(validos)]
+            pila.flush()
+            del pila, completa
+            os.replace(ruta + ".tmp", ruta)
+            os.remove(tmp)
+
+    indice = {"validos": validos,
+              "errores": [[fname, type(e).__name__, str(e)] for fname, e in errores]}
+    with open(ruta_indice + ".tmp", 'w', encoding='utf-8') as f:
+        json.dump(indice, f)
+    os.replace(ruta_indice + ".tmp", ruta_indice)
+
+    # Pilas e índices viejos de la misma carpeta
+    for vieja in glob.glob(os.path.join(carpeta_cache, prefijo + "_*.npy")) + \
+            glob.glob(os.path.join(carpeta_cache, prefijo + "_*.json")):
+        if vieja not in (ruta, ruta_indice):
+            os.remove(vieja)
+    return (np.load(ruta, mmap_mode='r') if validos else None), validos, errores
@@ -0,0 +1,234 @@
+# -- coding: utf-8 --
+"""
+API importable de medición de tapers, para usar el pipeline de PDSeI desde
+la GUI o desde un servicio sin tocar los globales del script.
+
+    from medidor_taper import ConfigMedicion, MedidorTaper
+
+    config = ConfigMedicion(calibracion=16.7)        # el resto, valores del script
+    medidor = MedidorTaper(config, alto=480, ancho=640)
+    fila = medidor.medir(gray)                       # gray: uint8 (alto, ancho)
+    fila = medidor.medir_archivo("c10_gray.jpg")
+
+ConfigMedicion toma sus valores por defecto de los globales de
+untitled5_mejorada_2.0.py (que se carga recién al crear la primera
+configuración, no al importar este módulo) y no los modifica.
+
+MedidorTaper reserva una vez, para un tamaño de imagen, los buffers de la
+imagen suavizada, de Canny, de la máscara de bordes y de los perfiles, y los
+reutiliza en cada llamada: por imagen solo se crean los arreglos chicos (del
+ancho de la imagen) de la regla de continuidad, el suavizado y el
+reconocimiento. Los resultados son los mismos que los del script (modo sin
+pirámide). Una instancia no debe usarse desde dos hilos a la vez.
+
+Para el monitoreo en tiempo real, cintura(gray) calcula solo el ancho mínimo
+(waist) y su posición, sin regiones de taper, cintura ni valles.
+"""
+
+import os
+import sys
+import importlib.util
+import cv2
+import numpy as np
+from scipy.signal import savgol_filter
+
+RUTA_PIPELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "untitled5_mejorada_2.0.py")
+
+# Parámetro de ConfigMedicion -> global del script
+PARAMETROS = {
+    "calibracion": "calibracion",
+    "smooth_window_factor": "SMOOTH_WINDOW_FACTOR",
+    "smooth_polyorder": "SMOOTH_POLYORDER",
+    "gaussian_blur_kernel": "GAUSSIAN_BLUR_KERNEL",
+    "max_gap_fill": "MAX_GAP_FILL",
+    "max_pixel_jump": "MAX_PIXEL_JUMP",
+    "taper_angle_threshold_factor": "TAPER_ANGLE_THRESHOLD_FACTOR",
+    "waist_angle_threshold_factor": "WAIST_ANGLE_THRESHOLD_FACTOR",
+    "factor": "factor",
+    "descarte": "DESCARTE",
+    "descarte_min_bordes": "DESCARTE_MIN_BORDES",
+    "descarte_max_bordes": "DESCARTE_MAX_BORDES",
+    "descarte_max_nan": "DESCARTE_MAX_NAN",
+    "descarte_min_rango_ancho": "DESCARTE_MIN_RANGO_ANCHO",
+}
+
+
+def pipeline():
+    # El nombre del script no es un identificador válido, se carga por ruta
+    # (una sola vez por proceso)
+    modulo = sys.modules.get("pdsei_pipeline")
+    if modulo is None:
+        spec = importlib.util.spec_from_file_location("pdsei_pipeline", RUTA_PIPELINE)
+        modulo = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(modulo)
+        sys.modules["pdsei_pipeline"] = modulo
+    return modulo
+
+
+class ConfigMedicion:
+    def __init__(self, **valores):
+        pdsei = pipeline()
+        desconocidos = set(valores) - set(PARAMETROS)
+        if desconocidos:
+            raise TypeError(f"Parámetros desconocidos: {', '.join(sorted(desconocidos))}")
+        for nombre, global_script in PARAMETROS.items():
+            setattr(self, nombre, valores.get(nombre, getattr(pdsei, global_script)))
+
+    def copiar(self, **cambios):
+        return ConfigMedicion(**{**self.como_dict(), **cambios})
+
+    def como_dict(self):
+        return {nombre: getattr(self, nombre) for nombre in PARAMETROS}
+
+    def escalas_um(self, alto, ancho):
+        # Igual que el script: la imagen de 640x480 px mide (640, 480) / calibracion mm
+        length_real_um = (640 / self.calibracion) * 1000
+        height_real_um = (480 / self.calibracion) * 1000
+        return length_real_um / ancho, height_real_um / alto
+
+    def motivo_descarte(self, indicadores):
+        # Misma regla que motivo_descarte del script, con los umbrales de esta configuración
+        if not self.descarte:
+            return None
+        bordes_por_columna, frac_nan, rango_ancho = indicadores
+        if bordes_por_columna < self.descarte_min_bordes:
+            return "en_blanco"
+        if bordes_por_columna > self.descarte_max_bordes or frac_nan > self.descarte_max_nan:
+            return "ruidosa"
+        if rango_ancho < self.descarte_min_rango_ancho:
+            return "sin_estirar"
+        return None
+
+
+class MedidorTaper:
+    def __init__(self, config=None, alto=480, ancho=640):
+        self.pdsei = pipeline()
+        self.config = config if config is not None else ConfigMedicion()
+        self.alto, self.ancho = alto, ancho
+
+        # Buffers de imagen
+        self._suavizada = np.empty((alto, ancho), dtype=np.uint8)
+        self._bordes = np.empty((alto, ancho), dtype=np.uint8)
+        # Máscaras transpuestas (una columna de la imagen por fila): argmax a
+        # lo largo de una fila contigua no copia la máscara, a lo largo de
+        # una columna sí. La segunda está invertida en Y, para el último borde.
+        self._mascara = np.empty((ancho, alto), dtype=bool)
+        self._mascara_inv = np.empty((ancho, alto), dtype=bool)
+        # Buffers de perfiles
+        self._hay_borde = np.empty(ancho, dtype=bool)
+        self._sin_borde = np.empty(ancho, dtype=bool)
+        self._indice = np.empty(ancho, dtype=np.intp)
+        self._primer_borde = np.empty(ancho, dtype=np.float64)
+        self._ultimo_borde = np.empty(ancho, dtype=np.float64)
+        self._x_px = np.arange(ancho)
+        self._x_um = np.empty(ancho, dtype=np.float64)
+        self._actualizar_escalas()
+
+        # Último resultado de recognize_fiber_taper (None si la imagen se descartó)
+        self.info = None
+
+    def _actualizar_escalas(self):
+        self._escala_x, self._escala_y = self.config.escalas_um(self.alto, self.ancho)
+        np.multiply(self._x_px, self._escala_x, out=self._x_um)
+
+    def fijar_config(self, config):
+        # Cambiar parámetros sin volver a reservar los buffers
+        self.config = config
+        self._actualizar_escalas()
+
+    def bordes(self, gray):
+        """Canny en los buffers del medidor; el resultado se sobrescribe en la llamada siguiente."""
+        if gray.shape != (self.alto, self.ancho) or gray.dtype != np.uint8:
+            raise ValueError(f"Se esperaba una imagen uint8 de {(self.alto, self.ancho)}, "
+                             f"no {gray.dtype} de {gray.shape}")
+        cv2.GaussianBlur(gray, tuple(self.config.gaussian_blur_kernel), 0, dst=self._suavizada)
+        lower, upper = self.pdsei.umbrales_canny(self._suavizada)
+        cv2.Canny(self._suavizada, lower, upper, edges=self._bordes)
+        return self._bordes
+
+    def perfiles_raw(self, gray):
+        """
+        Perfiles RAW superior e inferior en píxeles (continuidad + relleno de
+        huecos) e indicadores de descarte, como extract_fiber_edges.
+        """
+        bordes = self.bordes(gray)
+        np.not_equal(bordes.T, 0, out=self._mascara)
+        np.not_equal(bordes[::-1].T, 0, out=self._mascara_inv)
+        np.any(self._mascara, axis=1, out=self._hay_borde)
+        np.logical_not(self._hay_borde, out=self._sin_borde)
+
+        np.argmax(self._mascara, axis=1, out=self._indice)
+        np.copyto(self._primer_borde, self._indice)
+        np.argmax(self._mascara_inv, axis=1, out=self._indice)
+        np.subtract(self.alto - 1, self._indice, out=self._ultimo_borde)
+        self._primer_borde[self._sin_borde] = np.nan
+        self._ultimo_borde[self._sin_borde] = np.nan
+
+        cfg = self.config
+        y_upper = self.pdsei.fill_gaps_in_profile(
+            self.pdsei.filtrar_saltos_continuidad(self._primer_borde, cfg.max_pixel_jump), max_gap=cfg.max_gap_fill)
+        y_lower = self.pdsei.fill_gaps_in_profile(
+            self.pdsei.filtrar_saltos_continuidad(self._ultimo_borde, cfg.max_pixel_jump), max_gap=cfg.max_gap_fill)
+        indicadores = self.pdsei.indicadores_imagen(np.count_nonzero(bordes), y_upper, y_lower)
+        return y_upper, y_lower, indicadores
+
+    def medir(self, gray, nombre=""):
+        """
+        Métricas de una imagen en gris, con las mismas claves que las filas
+        del resumen CSV del script (incluida "descarte").
+        """
+        cfg = self.config
+        y_upper_raw, y_lower_raw, indicadores = self.perfiles_raw(gray)
+        motivo = cfg.motivo_descarte(indicadores)
+        if motivo is not None:
+            self.info = None
+            return {"imagen": nombre, "descarte": motivo}
+
+        y_upper_smooth, y_lower_smooth = self.pdsei.suavizar_perfiles_individuales(
+            y_upper_raw, y_lower_raw, window_length_factor=cfg.smooth_window_factor,
+            polyorder=cfg.smooth_polyorder)
+
+        # Escala a µm y centrado, como perfiles_centrados_um
+        y_upper_um = y_upper_smooth * self._escala_y
+        y_lower_um = y_lower_smooth * self._escala_y
+        centerline = (y_upper_um + y_lower_um) / 2
+        y_upper_um -= centerline
+        y_lower_um -= centerline
+
+        self.info = self.pdsei.recognize_fiber_taper(
+            self._x_um, y_upper_um, y_lower_um,
+            taper_angle_threshold_factor=cfg.taper_angle_threshold_factor,
+            waist_angle_threshold_factor=cfg.waist_angle_threshold_factor,
+            factor_prominencia=cfg.factor)
+        fila = self.pdsei.fila_metricas(nombre, self.info)
+        fila["descarte"] = None
+        return fila
+
+    def cintura(self, gray):
+        """
+        (ancho mínimo, X del waist) en µm, como ancho_minimo_waist y x_waist
+        de medir(), o None si la imagen se descarta. Los dos suavizados de
+        los bordes se reemplazan por uno del ancho (son lineales), así que
+        puede diferir de medir() en el último dígito.
+        """
+        cfg = self.config
+        y_upper_raw, y_lower_raw, indicadores = self.perfiles_raw(gray)
+        if cfg.motivo_descarte(indicadores) is not None:
+            return None
+
+        ancho = y_lower_raw - y_upper_raw
+        ancho = savgol_filter(ancho, self.pdsei.ventana_suavizado(self.ancho, cfg.smooth_window_factor),
+                              cfg.smooth_polyorder)
+        ancho *= self._escala_y
+        np.abs(ancho, out=ancho)
+        # Mismo segundo suavizado que base_reconocimiento
+        wl = min(self.ancho // 5, 51)
+        if wl % 2 == 0: wl += 1
+        if wl < 3: wl = 3
+        ancho = savgol_filter(ancho, window_length=wl, polyorder=3)
+        i = int(np.argmin(ancho))
+        return float(ancho[i]), float(self._x_um[i])
+
+    def medir_archivo(self, image_path):
+        nombre = os.path.splitext(os.path.basename(image_path))[0]
+        return self.medir(self.pdsei.leer_gris(image_path), nombre)
@@ -0,0 +1,135 @@
+# -- coding: utf-8 --
+"""
+Medición de tiempos por etapa del pipeline de PDSeI (modo --tiempos).
+
+Cada imagen produce un registro {etapa: segundos} más el total y el pico de
+memoria. Las etapas pueden anidarse (p. ej. el relleno de huecos dentro de la
+extracción de bordes): a cada etapa se le cuenta solo su tiempo propio, así
+la suma de las etapas no supera el total.
+
+El pico de memoria es opcional (memoria=True) y se toma con tracemalloc:
+incluye los arreglos de numpy, no la memoria interna de OpenCV, y se reinicia
+al empezar cada imagen. tracemalloc hace bastante más lento el código Python
+puro (sobre todo matplotlib), así que conviene comparar tiempos sin él.
+
+En --lote las primeras etapas (carga de la pila, Canny, bordes, suavizado)
+procesan todas las imágenes juntas: se miden entre iniciar_lote() y
+terminar_lote(n), se informan como total del lote y se reparten por igual
+entre las n imágenes, así el registro de cada una sigue sumando todo su costo.
+
+Al final del lote se imprime una tabla con p50, p95 y máximo por etapa.
+"""
+
+import csv
+import time
+import tracemalloc
+from contextlib import contextmanager
+import numpy as np
+
+
+class CronometroEtapas:
+    def __init__(self, memoria=False):
+        self.memoria = memoria
+        self.registros = []
+        self._actual = None
+        self._pila = []     # [nombre, instante en que se reanudó]
+        self._t0 = 0.0
+        self.lote = None        # registro de las etapas en lote (--lote)
+        self._reparto = {}      # parte de cada etapa en lote que corresponde a una imagen
+        if memoria and not tracemalloc.is_tracing():
+            tracemalloc.start()
+
+    def iniciar_lote(self):
+        self.iniciar_imagen("lote")
+        self._reparto = {}
+
+    def terminar_lote(self, n):
+        self.lote = self.terminar_imagen()
+        self.lote["imagenes"] = n
+        self._reparto = {k: v / max(n, 1) for k, v in self.lote.items()
+                         if k not in ("imagen", "imagenes", "mem_pico_mb")}
+
+    def iniciar_imagen(self, nombre):
+        self._actual = {"imagen": nombre}
+        self._actual.update((k, v) for k, v in self._reparto.items() if k != "total")
+        self._pila = []
+        if self.memoria:
+            tracemalloc.reset_peak()
+        self._t0 = time.perf_counter()
+
+    def terminar_imagen(self):
+        registro = self._actual
+        if registro is None:
+            return None
+        registro["total"] = time.perf_counter() - self._t0 + self._reparto.get("total", 0.0)
+        if self.memoria:
+            registro["mem_pico_mb"] = tracemalloc.get_traced_memory()[1] / 2**20
+        self._actual = None
+        return registro
+
+    def _sumar(self, nombre, segundos):
+        self._actual[nombre] = self._actual.get(nombre, 0.0) + segundos
+
+    @contextmanager
+    def etapa(self, nombre):
+        if self._actual is None:
+            yield
+            return
+        ahora = time.perf_counter()
+        if self._pila:
+            # Pausar la etapa que contiene a esta
+            padre = self._pila[-1]
+            self._sumar(padre[0], ahora - padre[1])
+        self._pila.append([nombre, ahora])
+        try:
+            yield
+        finally:
+            fin = time.perf_counter()
+            nombre, inicio = self._pila.pop()
+            self._sumar(nombre, fin - inicio)
+            if self._pila:
+                self._pila[-1][1] = fin
+
+    def agregar(self, registro):
+        if registro is not None:
+            self.registros.append(registro)
+
+    def columnas(self):
+        # Etapas en el orden en que aparecieron; total y memoria al final
+        cols = []
+        for reg in self.registros:
+            for k in reg:
+                if k not in cols and k not in ("imagen", "total", "mem_pico_mb"):
+                    cols.append(k)
+        return cols + ["total"] + (["mem_pico_mb"] if self.memoria else [])
+
+    def resumen(self):
+        # [(etapa, p50, p95, máx)]; una etapa ausente en una imagen cuenta como 0
+        filas = []
+        for col in self.columnas():
+            valores = np.array([reg.get(col, 0.0) for reg in self.registros])
+            filas.append((col, np.percentile(valores, 50), np.percentile(valores, 95), valores.max()))
+        return filas
+
+    def imprimir_resumen(self):
+        if not self.registros:
+            return
+        print(f"\nTiempos por etapa ({len(self.registros)} imágenes):")
+        print(f"  {'etapa':<18}{'p50':>12}{'p95':>12}{'máx':>12}")
+        for col, p50, p95, maximo in self.resumen():
+            if col == "mem_pico_mb":
+                print(f"  {'memoria pico':<18}{p50:>9.1f} MB{p95:>9.1f} MB{maximo:>9.1f} MB")
+            else:
+                print(f"  {col:<18}{p50 * 1e3:>9.2f} ms{p95 * 1e3:>9.2f} ms{maximo * 1e3:>9.2f} ms")
+        if self.lote is not None:
+            n = self.lote["imagenes"]
+            print(f"Etapas en lote ({n} imágenes juntas; en la tabla, repartidas por igual):")
+            for col, valor in self.lote.items():
+                if col not in ("imagen", "imagenes", "mem_pico_mb"):
+                    print(f"  {col:<18}{valor:>9.3f} s  ({valor / max(n, 1) * 1e3:.2f} ms/imagen)")
+
+    def guardar_csv(self, path):
+        with open(path, 'w', newline='', encoding='utf-8') as f:
+            writer = csv.DictWriter(f, fieldnames=["imagen"] + self.columnas(), restval=0.0)
+            writer.writeheader()
+            writer.writerows(self.registros)
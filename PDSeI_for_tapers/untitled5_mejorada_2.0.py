@@ -6,16 +6,51 @@ Para cada imagen:
  - Guarda PNGs de depuración y resultados.
  - Guarda .txt con métricas.
  - Agrega fila a un resumen maestro CSV.
+ - Las imágenes en blanco, sin estirar o demasiado ruidosas se descartan
+   antes del reconocimiento y quedan marcadas en la columna "descarte".
+ - Opcional (--almacen): guarda métricas y perfiles en una base SQLite.
+
+Uso:
+    python untitled5_mejorada_2.0.py [--entrada CARPETA] [--salida CARPETA]
+                                     [--workers N] [--reanudar] [--calibracion PX]
+                                     [--graficas todas|ninguna|diferidas]
+                                     [--cache CARPETA] [--cache-max-mb MB]
+                                     [--almacen ARCHIVO.sqlite] [--run-id ID]
+                                     [--lote [--lote-cache CARPETA]]
+                                     [--piramide] [--sin-descarte]
+                                     [--tiempos [--memoria]]
+    python untitled5_mejorada_2.0.py --perfilar IMAGEN [--entrada ...] [--salida ...]
+    python untitled5_mejorada_2.0.py --salida CARPETA --renderizar [--workers N]
+    python untitled5_mejorada_2.0.py --barrido [--barrido-factor 0.05,0.08,...]
+                                     [--barrido-taper ...] [--barrido-cintura ...]
+                                     [--barrido-ventana ...]
+    python untitled5_mejorada_2.0.py --vigilar [--entrada ...] [--salida ...]
+                                     [--debounce S] [--max-cola N]
+    python untitled5_mejorada_2.0.py --costura [--entrada ...] [--salida ...]
+                                     [--graficas todas|ninguna]
 
 Requisitos: numpy, matplotlib, scipy, opencv-python
 """
 
 import os
 import csv
+import time
+import argparse
+import cProfile
+import pstats
+from contextlib import nullcontext
 import cv2
 import numpy as np
 import matplotlib.pyplot as plt
 from scipy.signal import savgol_filter, find_peaks
+from concurrent.futures import ProcessPoolExecutor
+
+from vigilante import VigilanteCarpeta
+from cache_etapas import CacheEtapas, hash_archivo
+from almacen_resultados import AlmacenResultados
+from tiempos_etapas import CronometroEtapas
+from lote_imagenes import cargar_pila
+from costura_perfiles import posiciones_secuencia, coser_perfiles
 
 # =========================
 # === PARÁMETROS GLOBALES ===
@@ -24,7 +59,6 @@ from scipy.signal import savgol_filter, find_peaks
 # Carpeta con imágenes a procesar (CAMBIA ESTO)
 input_dir  = r"C:\Users\tangi\OneDrive\Documentos\UNT\TESIS II\DESARROLLO\AUTOMATIZAR\caracterizar"      # <- pon tu carpeta
 output_dir = r"C:\Users\tangi\OneDrive\Documentos\UNT\TESIS II\DESARROLLO\AUTOMATIZAR\caracterizar_V5"        # <- carpeta de salida
-os.makedirs(output_dir, exist_ok=True)
 
 # Calibración (pixeles por diámetro) y escalas
 calibracion = 15.15 # calibración para caracterizacion 
@@ -42,6 +76,29 @@ GAUSSIAN_BLUR_KERNEL = (1, 1)
 CANNY_LOW_THRESHOLD  = 50
 CANNY_HIGH_THRESHOLD = 150
 
+# Modo pirámide (--piramide): la banda de la fibra se busca en la imagen
+# reducida PIRAMIDE_NIVELES veces (pyrDown) y Canny a resolución completa
+# corre solo en esa banda más PIRAMIDE_MARGEN filas arriba y abajo. La banda
+# se reutiliza en la imagen siguiente mientras la fibra siga dentro de ella.
+PIRAMIDE = False
+PIRAMIDE_NIVELES = 2
+PIRAMIDE_MARGEN = 16
+banda_previa = None
+
+# Descarte temprano (antes del reconocimiento y las gráficas). Valores de las
+# imágenes incluidas: 2.6-4.3 bordes por columna, 0 % NaN y rango de ancho >= 0.087.
+DESCARTE = True
+DESCARTE_MIN_BORDES = 0.5        # bordes Canny por columna; menos = imagen en blanco
+DESCARTE_MAX_BORDES = 20         # más = imagen ruidosa
+DESCARTE_MAX_NAN = 0.2           # fracción del perfil de ancho RAW sin borde
+DESCARTE_MIN_RANGO_ANCHO = 0.05  # (p95 - p5) / p95 del ancho RAW; menos = fibra sin estirar
+
+# Modo costura (--costura): las imágenes de --entrada, en orden, son capturas
+# solapadas de un mismo taper. Cada par consecutivo debe compartir al menos
+# COSTURA_SOLAPE_MIN columnas; una correlación menor que COSTURA_R_MIN se avisa.
+COSTURA_SOLAPE_MIN = 64
+COSTURA_R_MIN = 0.95
+
 # Relleno de huecos y límite de saltos
 MAX_GAP_FILL   = 50
 MAX_PIXEL_JUMP = 10
@@ -58,37 +115,190 @@ factor = 0.08
 # V4 = 0.2
 # V5 = 0.08
 
+# Caché por etapa (Canny, perfiles RAW, perfiles suavizados). None = desactivada.
+# Se activa con --cache CARPETA; subir CACHE_VERSION si cambia el algoritmo de
+# alguna de esas etapas para no reutilizar resultados viejos.
+cache = None
+CACHE_VERSION = 2
+
+# Almacén SQLite de resultados (métricas + perfiles float32). None = desactivado.
+# Se activa con --almacen ARCHIVO; cada ejecución se registra con su run_id.
+almacen = None
+run_id = None
+
+# Tiempos por etapa (--tiempos) y pico de memoria por imagen (--memoria). None = desactivado.
+cronometro = None
+
 # =========================
 # === FUNCIONES BASE     ===
 # =========================
 
-def process_image_with_canny(image_path, save_path_edges_png=None):
-    img = cv2.imread(image_path)
-    if img is None:
+def etapa(nombre):
+    # Mide la etapa si --tiempos está activo; si no, no hace nada
+    return cronometro.etapa(nombre) if cronometro is not None else nullcontext()
+
+def componentes_jpeg(image_path):
+    # Número de componentes de color del JPEG (1 = escala de grises), leído del
+    # marcador SOF del encabezado; None si no es un JPEG o no se puede leer
+    try:
+        with open(image_path, 'rb') as f:
+            if f.read(2) != b"\xff\xd8":
+                return None
+            while True:
+                marcador = f.read(2)
+                if len(marcador) < 2 or marcador[0] != 0xFF:
+                    return None
+                m = marcador[1]
+                if m == 0x01 or 0xD0 <= m <= 0xD7:
+                    continue
+                largo = f.read(2)
+                if len(largo) < 2:
+                    return None
+                largo = int.from_bytes(largo, 'big')
+                if 0xC0 <= m <= 0xCF and m not in (0xC4, 0xC8, 0xCC):
+                    cabecera = f.read(6)
+                    return cabecera[5] if len(cabecera) == 6 else None
+                f.seek(largo - 2, os.SEEK_CUR)
+    except OSError:
+        return None
+
+def leer_gris(image_path):
+    # Solo los JPEG de un componente (grises de verdad) se decodifican directo
+    # a un canal. Todo lo demás pasa por BGR->GRAY, aunque el nombre diga
+    # "_gray": en un JPEG a color el decodificador directo redondea distinto
+    # y cambia las métricas. Se decide por el archivo, no por el nombre.
+    if componentes_jpeg(image_path) == 1:
+        gray = cv2.imread(image_path, cv2.IMREAD_GRAYSCALE)
+    else:
+        img = cv2.imread(image_path)
+        gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY) if img is not None else None
+    if gray is None:
         raise FileNotFoundError(f"No se pudo cargar la imagen: {image_path}")
+    return gray
+
+def mediana_uint8(img):
+    # Igual que np.median para uint8, con un histograma en lugar de ordenar
+    # (los conteos en float32 de calcHist son exactos hasta 2**24 píxeles)
+    acumulado = cv2.calcHist([img], [0], None, [256], [0, 256]).ravel().astype(np.int64).cumsum()
+    n = img.size
+    a = np.searchsorted(acumulado, (n - 1) // 2, side='right')
+    b = np.searchsorted(acumulado, n // 2, side='right')
+    return (a + b) / 2
+
+def umbrales_canny(blurred):
+    mediana = mediana_uint8(blurred)
+    lower = int(max(0, 0.66 * mediana))
+    upper = int(min(255, 1.33 * mediana))
+    return lower, upper
 
-    gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
-
+def canny_gris(gray):
+    blurred = cv2.GaussianBlur(gray, GAUSSIAN_BLUR_KERNEL, 0)
+    lower, upper = umbrales_canny(blurred)
+    return cv2.Canny(blurred, lower, upper)
+
+def banda_fibra(blurred, lower, upper, niveles=2, margen=16):
+    # Filas [y0, y1) que contienen bordes en la imagen reducida, llevadas a
+    # resolución completa y ampliadas por el margen. None si no hay bordes.
+    reducida = blurred
+    for _ in range(niveles):
+        reducida = cv2.pyrDown(reducida)
+    filas = np.flatnonzero(cv2.Canny(reducida, lower, upper).any(axis=1))
+    if len(filas) == 0:
+        return None
+    escala = 2 ** niveles
+    y0 = max(0, filas[0] * escala - margen)
+    y1 = min(blurred.shape[0], (filas[-1] + 1) * escala + margen)
+    return int(y0), int(y1)
+
+def banda_contiene_bordes(edges_roi, margen):
+    # La fibra debe quedar lejos de los bordes de la banda; si no, la banda
+    # quedó corta (la fibra se movió) y hay que volver a buscarla
+    filas = np.flatnonzero(edges_roi.any(axis=1))
+    return (len(filas) > 0 and filas[0] >= margen // 2
+            and filas[-1] < edges_roi.shape[0] - margen // 2)
+
+def canny_piramide(gray):
+    """
+    Canny solo dentro de la banda de la fibra. Devuelve (edges, banda): edges
+    tiene el tamaño completo con ceros fuera de la banda, y banda = (y0, y1),
+    o None si se procesó la imagen completa. Los umbrales salen de la mediana
+    de la imagen completa, igual que en canny_gris.
+    """
+    global banda_previa
     blurred = cv2.GaussianBlur(gray, GAUSSIAN_BLUR_KERNEL, 0)
+    lower, upper = umbrales_canny(blurred)
+
+    banda, edges_roi = banda_previa, None
+    if banda is not None:
+        edges_roi = cv2.Canny(blurred[banda[0]:banda[1]], lower, upper)
+        if not banda_contiene_bordes(edges_roi, PIRAMIDE_MARGEN):
+            banda = None
+    if banda is None:
+        banda = banda_fibra(blurred, lower, upper, PIRAMIDE_NIVELES, PIRAMIDE_MARGEN)
+        if banda is None:
+            banda_previa = None
+            return cv2.Canny(blurred, lower, upper), None
+        edges_roi = cv2.Canny(blurred[banda[0]:banda[1]], lower, upper)
+
+    banda_previa = banda
+    edges = np.zeros_like(gray)
+    edges[banda[0]:banda[1]] = edges_roi
+    return edges, banda
+
+def canny_imagen(gray):
+    return canny_piramide(gray)[0] if PIRAMIDE else canny_gris(gray)
 
-    mediana = np.median(blurred)
-    lower = int(max(0, 0.66 * mediana))
-    upper = int(min(255, 1.33 * mediana))
+def process_image_with_canny(image_path, save_path_edges_png=None):
+    with etapa("decodificacion"):
+        gray = leer_gris(image_path)
 
-    edges = cv2.Canny(blurred, lower, upper)
+    with etapa("canny"):
+        edges = canny_imagen(gray)
 
     if save_path_edges_png:
-        plt.figure(figsize=(8, 4))
-        plt.imshow(edges, cmap='gray')
-        plt.title(f"Bordes Canny - {os.path.basename(image_path)}")
-        plt.axis('off')
-        plt.tight_layout()
-        plt.savefig(save_path_edges_png, dpi=200)
-        plt.close()
+        plot_canny(edges, os.path.basename(image_path), save_path_edges_png)
 
     return edges
 
+def plot_canny(edges, image_fname, save_path_edges_png):
+    plt.figure(figsize=(8, 4))
+    plt.imshow(edges, cmap='gray')
+    plt.title(f"Bordes Canny - {image_fname}")
+    plt.axis('off')
+    plt.tight_layout()
+    plt.savefig(save_path_edges_png, dpi=200)
+    plt.close()
+
 def fill_gaps_in_profile(profile_px, max_gap=100):
+    # Versión vectorizada en una sola pasada, mismo resultado que fill_gaps_in_profile_bucles:
+    # se extienden los extremos, los huecos de hasta max_gap puntos se interpolan
+    # linealmente y los más largos quedan en NaN.
+    x_indices = np.arange(len(profile_px))
+    interp_profile = np.copy(profile_px)
+    valid_mask = ~np.isnan(profile_px)
+
+    valid_idx = np.flatnonzero(valid_mask)
+    if len(valid_idx) == 0:
+        return interp_profile
+
+    # Extremos
+    interp_profile[:valid_idx[0]] = profile_px[valid_idx[0]]
+    interp_profile[valid_idx[-1] + 1:] = profile_px[valid_idx[-1]]
+
+    # Para cada punto: índice del válido anterior y del siguiente
+    prev_valid = np.maximum.accumulate(np.where(valid_mask, x_indices, -1))
+    next_valid = np.minimum.accumulate(np.where(valid_mask, x_indices, len(profile_px))[::-1])[::-1]
+
+    gap_length = next_valid - prev_valid - 1
+    interior = (x_indices > valid_idx[0]) & (x_indices < valid_idx[-1])
+    to_fill = ~valid_mask & interior & (gap_length <= max_gap)
+
+    interp_profile[to_fill] = np.interp(x_indices[to_fill], valid_idx, profile_px[valid_idx])
+    return interp_profile
+
+def fill_gaps_in_profile_bucles(profile_px, max_gap=100):
+    # Implementación original hueco a hueco (O(huecos x ancho)). Se conserva como
+    # referencia para verificar y medir la versión vectorizada (benchmark_bordes.py).
     x_indices = np.arange(len(profile_px))
     interp_profile = np.copy(profile_px)
     nan_mask = np.isnan(profile_px)
@@ -143,7 +353,83 @@ def fill_gaps_in_profile(profile_px, max_gap=100):
 
     return interp_profile
 
-def extract_fiber_edges(edges_img, max_pixel_jump=20):
+def filtrar_saltos_continuidad(perfil_px, max_pixel_jump=20):
+    """
+    Regla de continuidad de extract_fiber_edges aplicada sobre arreglos:
+    un borde se acepta si dista <= max_pixel_jump del último borde aceptado.
+    Cada iteración del while procesa de golpe un tramo continuo, así que solo
+    se itera una vez por cada salto rechazado (normalmente muy pocos).
+    """
+    salida = np.full(len(perfil_px), np.nan)
+    idx = np.flatnonzero(~np.isnan(perfil_px))
+    if len(idx) == 0:
+        return salida
+
+    vals = perfil_px[idx]
+    n = len(vals)
+    aceptado = np.zeros(n, dtype=bool)
+    saltos_ok = np.abs(np.diff(vals)) <= max_pixel_jump
+
+    # El primer punto válido siempre se acepta. Invariante: vals[i-1] es el último aceptado.
+    aceptado[0] = True
+    i = 1
+    while i < n:
+        fallos = np.flatnonzero(~saltos_ok[i - 1:])
+        if len(fallos) == 0:
+            aceptado[i:] = True
+            break
+        k = i + fallos[0]           # primer candidato rechazado del tramo
+        aceptado[i:k] = True
+
+        # Buscar el siguiente candidato cercano al último aceptado (vals[k-1])
+        cercanos = np.flatnonzero(np.abs(vals[k + 1:] - vals[k - 1]) <= max_pixel_jump)
+        if len(cercanos) == 0:
+            break
+        j = k + 1 + cercanos[0]
+        aceptado[j] = True
+        i = j + 1
+
+    salida[idx[aceptado]] = vals[aceptado]
+    return salida
+
+def extract_fiber_edges(edges_img, max_pixel_jump=20, filas=None):
+    # Versión vectorizada: primer y último borde de todas las columnas a la vez.
+    # Produce exactamente el mismo resultado que extract_fiber_edges_bucles.
+    # Acepta también una pila (N, alto, ancho) y devuelve perfiles (N, ancho).
+    # filas=(y0, y1): buscar solo en esas filas (fuera de ellas no hay bordes).
+    y0 = 0
+    if filas is not None:
+        y0 = filas[0]
+        edges_img = edges_img[..., filas[0]:filas[1], :]
+    height = edges_img.shape[-2]
+    mask = edges_img > 0
+    hay_borde = mask.any(axis=-2)
+
+    primer_borde = (np.argmax(mask, axis=-2) + y0).astype(float)
+    ultimo_borde = (y0 + height - 1 - np.argmax(mask[..., ::-1, :], axis=-2)).astype(float)
+    primer_borde[~hay_borde] = np.nan
+    ultimo_borde[~hay_borde] = np.nan
+
+    if edges_img.ndim == 3:
+        # La regla de continuidad es secuencial: una imagen a la vez
+        perfiles = [continuidad_y_relleno(p, u, max_pixel_jump) for p, u in zip(primer_borde, ultimo_borde)]
+        return (np.array([up for up, _ in perfiles]).reshape(primer_borde.shape),
+                np.array([low for _, low in perfiles]).reshape(ultimo_borde.shape))
+    return continuidad_y_relleno(primer_borde, ultimo_borde, max_pixel_jump)
+
+def continuidad_y_relleno(primer_borde, ultimo_borde, max_pixel_jump):
+    y_upper_px = filtrar_saltos_continuidad(primer_borde, max_pixel_jump)
+    y_lower_px = filtrar_saltos_continuidad(ultimo_borde, max_pixel_jump)
+
+    with etapa("relleno_huecos"):
+        y_upper_px_filtered = fill_gaps_in_profile(y_upper_px, max_gap=MAX_GAP_FILL)
+        y_lower_px_filtered = fill_gaps_in_profile(y_lower_px, max_gap=MAX_GAP_FILL)
+
+    return y_upper_px_filtered, y_lower_px_filtered
+
+def extract_fiber_edges_bucles(edges_img, max_pixel_jump=20):
+    # Implementación original columna a columna. Se conserva como referencia
+    # para verificar y medir la versión vectorizada (benchmark_bordes.py).
     height, width = edges_img.shape
     y_upper_px = np.full(width, np.nan)
     y_lower_px = np.full(width, np.nan)
@@ -196,21 +482,28 @@ def extract_fiber_edges(edges_img, max_pixel_jump=20):
 
     return y_upper_px_filtered, y_lower_px_filtered
 
-def suavizar_perfiles_individuales(y_upper_px, y_lower_px, window_length_factor=0.05, polyorder=3):
-    N = len(y_upper_px)
+def ventana_suavizado(N, window_length_factor=0.05):
     wl = int(N * window_length_factor)
     if wl % 2 == 0: wl += 1
     if wl < 3: wl = 3
     if wl >= N: wl = N - 1 if N % 2 == 0 else N
     if wl < 3: wl = 3
+    return wl
+
+def suavizar_perfiles_individuales(y_upper_px, y_lower_px, window_length_factor=0.05, polyorder=3, axis=-1):
+    # Con pilas (N, ancho) se suavizan todos los perfiles en una sola llamada
+    wl = ventana_suavizado(np.shape(y_upper_px)[axis], window_length_factor)
 
-    y_upper_smooth = savgol_filter(y_upper_px, wl, polyorder)
-    y_lower_smooth = savgol_filter(y_lower_px, wl, polyorder)
+    y_upper_smooth = savgol_filter(y_upper_px, wl, polyorder, axis=axis)
+    y_lower_smooth = savgol_filter(y_lower_px, wl, polyorder, axis=axis)
     
     return y_upper_smooth, y_lower_smooth
 
-def longitud_taper_por_picos_ancho(x_coords, y_upper_coords, y_lower_coords,
-                                   window_length_factor=0.05, polyorder=3, plot_debug=False, debug_path=False):
+def candidatos_valles_ancho(x_coords, y_upper_coords, y_lower_coords,
+                            window_length_factor=0.05, polyorder=3):
+    # Suavizado + find_peaks del perfil de ancho, sin umbral de prominencia.
+    # seleccionar_valles aplica después el umbral (factor), así el barrido de
+    # parámetros no repite el suavizado ni la búsqueda de picos por cada factor.
     x = np.asarray(x_coords, dtype=float)
     y_upper = np.asarray(y_upper_coords, dtype=float)
     y_lower = np.asarray(y_lower_coords, dtype=float)
@@ -218,7 +511,8 @@ def longitud_taper_por_picos_ancho(x_coords, y_upper_coords, y_lower_coords,
 
     N = len(width)
     if N < 5:
-        return float(x[-1] - x[0]), float(x[0]), float(x[-1])
+        return {"x": x, "ancho": width, "ancho_suavizado": width,
+                "candidatos": np.array([], dtype=int), "prominencias": np.array([])}
 
     wl = int(max(3, round(N * window_length_factor)))
     if wl % 2 == 0: 
@@ -228,7 +522,24 @@ def longitud_taper_por_picos_ancho(x_coords, y_upper_coords, y_lower_coords,
 
     peaks, props = find_peaks(-width_smooth,
                               distance=max(5, N // 10),
-                              prominence=np.ptp(width_smooth) * factor)
+                              prominence=0)
+
+    return {"x": x, "ancho": width, "ancho_suavizado": width_smooth,
+            "candidatos": peaks, "prominencias": props["prominences"]}
+
+def seleccionar_valles(candidatos, factor_prominencia):
+    x = candidatos["x"]
+    width = candidatos["ancho"]
+    width_smooth = candidatos["ancho_suavizado"]
+
+    N = len(width)
+    if N < 5:
+        return {"ancho": width, "ancho_suavizado": width, "valles": np.array([], dtype=int),
+                "longitud": float(x[-1] - x[0]), "x_izq": float(x[0]), "x_der": float(x[-1])}
+
+    # find_peaks filtra por distancia antes que por prominencia, así que esto
+    # equivale a find_peaks(..., prominence=np.ptp(width_smooth) * factor_prominencia)
+    peaks = candidatos["candidatos"][candidatos["prominencias"] >= np.ptp(width_smooth) * factor_prominencia]
 
     if len(peaks) < 2:
         i_left  = np.argmin(width_smooth[:N//2])
@@ -243,37 +554,75 @@ def longitud_taper_por_picos_ancho(x_coords, y_upper_coords, y_lower_coords,
 
     x_left = float(x[i_left])
     x_right = float(x[i_right])
-    L = float(x_right - x_left)
-
-    if plot_debug and debug_path:
-        plt.figure(figsize=(8, 4))
-        plt.plot(x, width, label="Perfil de ancho (sin suavizar)", alpha=0.4)
-        plt.plot(x, width_smooth, label="Perfil de ancho suavizado", linewidth=2)
-        if len(peaks) > 0:
-            plt.scatter(x[peaks], width_smooth[peaks], zorder=5, label="Valles detectados")
-        plt.axvline(x_left,  linestyle='--', label='Valle Izquierdo')
-        plt.axvline(x_right, linestyle='--', label='Valle Derecho')
-        plt.title("Detección de valles (mínimos de diámetro)")
-        plt.xlabel("Posición X [µm]")
-        plt.ylabel("Diámetro [µm]")
-        plt.legend()
-        plt.grid(True, alpha=0.3)
-        plt.tight_layout()
-        plt.savefig(debug_path, dpi=200)
-        plt.close()
-
-    return L, x_left, x_right
+
+    return {"ancho": width, "ancho_suavizado": width_smooth, "valles": peaks,
+            "longitud": float(x_right - x_left), "x_izq": x_left, "x_der": x_right}
+
+def detectar_valles_ancho(x_coords, y_upper_coords, y_lower_coords,
+                          window_length_factor=0.05, polyorder=3, factor_prominencia=None):
+    # Devuelve también los arreglos intermedios para que la gráfica de
+    # depuración no repita el cálculo. factor_prominencia=None usa el global factor.
+    candidatos = candidatos_valles_ancho(x_coords, y_upper_coords, y_lower_coords,
+                                         window_length_factor=window_length_factor, polyorder=polyorder)
+    return seleccionar_valles(candidatos, factor if factor_prominencia is None else factor_prominencia)
+
+def plot_valles(x_coords, valles, debug_path):
+    x = np.asarray(x_coords, dtype=float)
+    width_smooth = valles["ancho_suavizado"]
+    peaks = valles["valles"]
+
+    plt.figure(figsize=(8, 4))
+    plt.plot(x, valles["ancho"], label="Perfil de ancho (sin suavizar)", alpha=0.4)
+    plt.plot(x, width_smooth, label="Perfil de ancho suavizado", linewidth=2)
+    if len(peaks) > 0:
+        plt.scatter(x[peaks], width_smooth[peaks], zorder=5, label="Valles detectados")
+    plt.axvline(valles["x_izq"],  linestyle='--', label='Valle Izquierdo')
+    plt.axvline(valles["x_der"], linestyle='--', label='Valle Derecho')
+    plt.title("Detección de valles (mínimos de diámetro)")
+    plt.xlabel("Posición X [µm]")
+    plt.ylabel("Diámetro [µm]")
+    plt.legend()
+    plt.grid(True, alpha=0.3)
+    plt.tight_layout()
+    plt.savefig(debug_path, dpi=200)
+    plt.close()
+
+def longitud_taper_por_picos_ancho(x_coords, y_upper_coords, y_lower_coords,
+                                   window_length_factor=0.05, polyorder=3, plot_debug=False, debug_path=False):
+    valles = detectar_valles_ancho(x_coords, y_upper_coords, y_lower_coords,
+                                   window_length_factor=window_length_factor, polyorder=polyorder)
+
+    if plot_debug and debug_path and len(valles["ancho"]) >= 5:
+        plot_valles(x_coords, valles, debug_path)
+
+    return valles["longitud"], valles["x_izq"], valles["x_der"]
+
+def fijar_calibracion(valor):
+    # Recalcula las escalas de la imagen para otra calibración (píxeles por diámetro)
+    global calibracion, length_real_um, height_real_um
+    calibracion = valor
+    length_real_um = (640 / calibracion) * 1000
+    height_real_um = (480 / calibracion) * 1000
 
 def pixel_to_microns(x_pixels, y_pixels, scale_x_um_per_pixel, scale_y_um_per_pixel):
     x_um = np.array(x_pixels) * scale_x_um_per_pixel
     y_um = np.array(y_pixels) * scale_y_um_per_pixel
     return x_um, y_um
 
-def recognize_fiber_taper(x_coords, y_upper_coords, y_lower_coords,
-                          taper_angle_threshold_factor=0.03,
-                          waist_angle_threshold_factor=0.005,
-                          width_tolerance_factor=0.05):
+def primer_verdadero(mask):
+    # Índice del primer True de mask, o -1 si no hay ninguno
+    return int(np.argmax(mask)) if mask.any() else -1
+
+def base_reconocimiento(x_coords, y_upper_coords, y_lower_coords, width_tolerance_factor=0.05):
+    """
+    Parte de recognize_fiber_taper que no depende de los umbrales de taper y
+    cintura. Los barridos punto a punto se reemplazan por máximos acumulados
+    desde el waist hacia afuera: como son no decrecientes, el primer punto que
+    supera cualquier umbral se obtiene con searchsorted, para uno o muchos
+    umbrales a la vez (ver regiones_taper y regiones_cintura).
+    """
     widths = np.abs(y_upper_coords - y_lower_coords)
+    N = len(x_coords)
 
     window_length_width_smooth = min(len(widths) // 5, 51)
     if window_length_width_smooth % 2 == 0: window_length_width_smooth += 1
@@ -296,99 +645,143 @@ def recognize_fiber_taper(x_coords, y_upper_coords, y_lower_coords,
 
     width_gradients = np.gradient(smoothed_widths, x_coords)
     abs_gradients = np.abs(width_gradients)
-
     max_gradient_value = np.max(abs_gradients)
-    taper_angle_threshold = max_gradient_value * taper_angle_threshold_factor
 
-    left_taper_start_idx = 0
-    for i in range(1, min_width_idx + 1):
-        if abs_gradients[i] > taper_angle_threshold and smoothed_widths[i] < nominal_width * (1 - width_tolerance_factor/2):
-            left_taper_start_idx = i
-            break
+    m = min_width_idx
+    bajo_nominal = smoothed_widths < nominal_width * (1 - width_tolerance_factor/2)
+    sobre_nominal = smoothed_widths > nominal_width * (1 - width_tolerance_factor)
 
-    right_taper_end_idx = len(x_coords) - 1
-    for i in range(len(x_coords) - 2, min_width_idx - 1, -1):
-        if abs_gradients[i] > taper_angle_threshold and smoothed_widths[i] < nominal_width * (1 - width_tolerance_factor/2):
-            right_taper_end_idx = i
-            break
-        
-    # Ajuste para casos donde los inicios/fines de taper están muy cerca del mínimo
-    if abs(x_coords[left_taper_start_idx] - x_at_min_width) < (nominal_width * 0.1) and left_taper_start_idx > 0:
-        for i in range(min_width_idx, -1, -1):
-            if smoothed_widths[i] > nominal_width * (1 - width_tolerance_factor):
-                left_taper_start_idx = i
-                break
+    # Pendientes candidatas a taper (-inf donde el ancho no está bajo el nominal)
+    g_taper = np.where(bajo_nominal & ~np.isnan(abs_gradients), abs_gradients, -np.inf)
 
-    if abs(x_coords[right_taper_end_idx] - x_at_min_width) < (nominal_width * 0.1) and right_taper_end_idx < len(x_coords) - 1:
-        for i in range(min_width_idx, len(x_coords)):
-            if smoothed_widths[i] > nominal_width * (1 - width_tolerance_factor):
-                right_taper_end_idx = i
-                break
+    # Ajuste para inicios/fines de taper muy cerca del mínimo: último punto sobre
+    # el nominal a la izquierda del waist y primero a la derecha (-1 si no hay)
+    i = primer_verdadero(sobre_nominal[:m + 1][::-1])
+    ajuste_izq = m - i if i >= 0 else -1
+    i = primer_verdadero(sobre_nominal[m:])
+    ajuste_der = m + i if i >= 0 else -1
 
-    if left_taper_start_idx >= right_taper_end_idx:
-        left_taper_start_idx = 0
-        right_taper_end_idx = len(x_coords) - 1
+    return {
+        "N": N,
+        "min_width_idx": min_width_idx,
+        "ancho_minimo_waist": min_width_value,
+        "x_waist": x_at_min_width,
+        "ancho_nominal": nominal_width,
+        "perfil_ancho_suavizado": smoothed_widths,
+        "pendientes_ancho_suavizadas": width_gradients,
+        "max_gradient_value": max_gradient_value,
+        # barrido izquierdo i = 1..m y derecho i = N-2..m
+        "acum_taper_izq": np.maximum.accumulate(g_taper[1:m + 1]),
+        "acum_taper_der": np.maximum.accumulate(g_taper[m:N - 1][::-1]),
+        "ajuste_izq": ajuste_izq,
+        "ajuste_der": ajuste_der,
+        # la cintura crece desde m mientras la pendiente sea <= umbral
+        "acum_plano_izq": np.maximum.accumulate(abs_gradients[m::-1]),
+        "acum_plano_der": np.maximum.accumulate(abs_gradients[m:]),
+    }
 
-    x_taper_start = x_coords[left_taper_start_idx]
-    x_taper_end   = x_coords[right_taper_end_idx]
-    taper_length  = x_taper_end - x_taper_start
+def regiones_taper(base, x_coords, taper_angle_threshold_factors):
+    """Índices de inicio/fin de taper para un arreglo de factores de umbral."""
+    N = base["N"]
+    m = base["min_width_idx"]
+    nominal_width = base["ancho_nominal"]
+    umbrales = base["max_gradient_value"] * np.asarray(taper_angle_threshold_factors, dtype=float)
 
-    waist_abs_gradient_threshold = max_gradient_value * waist_angle_threshold_factor
-    if waist_abs_gradient_threshold < 1e-6: # Evitar umbral muy pequeño
-        waist_abs_gradient_threshold = 1e-6
+    # Primer punto de taper en [1, m] y último en [m, N-2]
+    k = np.searchsorted(base["acum_taper_izq"], umbrales, side='right')
+    izq = np.where(k < len(base["acum_taper_izq"]), 1 + k, 0)
+    k = np.searchsorted(base["acum_taper_der"], umbrales, side='right')
+    der = np.where(k < len(base["acum_taper_der"]), N - 2 - k, N - 1)
 
-    waist_start_idx = min_width_idx
-    for i in range(min_width_idx, -1, -1):
-        if abs_gradients[i] <= waist_abs_gradient_threshold:
-            waist_start_idx = i
-        else:
-            break
+    # Ajuste para casos donde los inicios/fines de taper están muy cerca del mínimo
+    cerca = np.abs(x_coords[izq] - base["x_waist"]) < (nominal_width * 0.1)
+    izq = np.where(cerca & (izq > 0) & (base["ajuste_izq"] >= 0), base["ajuste_izq"], izq)
+    cerca = np.abs(x_coords[der] - base["x_waist"]) < (nominal_width * 0.1)
+    der = np.where(cerca & (der < N - 1) & (base["ajuste_der"] >= 0), base["ajuste_der"], der)
+
+    invertido = izq >= der
+    izq = np.where(invertido, 0, izq)
+    der = np.where(invertido, N - 1, der)
+    return izq, der, umbrales
+
+def regiones_cintura(base, x_coords, waist_angle_threshold_factors):
+    """Inicio/fin de cintura (en µm) para un arreglo de factores de umbral."""
+    m = base["min_width_idx"]
+    umbrales = base["max_gradient_value"] * np.asarray(waist_angle_threshold_factors, dtype=float)
+    umbrales = np.where(umbrales < 1e-6, 1e-6, umbrales)  # Evitar umbral muy pequeño
+
+    # Cantidad de puntos consecutivos desde el waist con pendiente <= umbral
+    # (un umbral NaN no acepta ningún punto, igual que la comparación directa)
+    racha_izq = np.where(np.isnan(umbrales), 0, np.searchsorted(base["acum_plano_izq"], umbrales, side='right'))
+    racha_der = np.where(np.isnan(umbrales), 0, np.searchsorted(base["acum_plano_der"], umbrales, side='right'))
+    ini = np.where(racha_izq > 0, m - racha_izq + 1, m)
+    fin = np.where(racha_der > 0, m + racha_der - 1, m)
+
+    x_waist_start = x_coords[ini]
+    x_waist_end = x_coords[fin]
+    longitud_cintura = x_waist_end - x_waist_start
 
-    waist_end_idx = min_width_idx
-    for i in range(min_width_idx, len(x_coords)):
-        if abs_gradients[i] <= waist_abs_gradient_threshold:
-            waist_end_idx = i
-        else:
-            break
+    # Ajuste final si la cintura es casi un punto (menor a 2 píxeles de longitud)
+    if len(x_coords) > 1:
+        minimo = (x_coords[1] - x_coords[0]) * 2
+        casi_punto = longitud_cintura < minimo
+        longitud_cintura = np.where(casi_punto, minimo, longitud_cintura)
+        x_waist_start = np.where(casi_punto, base["x_waist"] - minimo / 2, x_waist_start)
+        x_waist_end = np.where(casi_punto, base["x_waist"] + minimo / 2, x_waist_end)
 
-    if waist_end_idx < waist_start_idx: # Si la detección falla o la cintura es muy corta
-        waist_start_idx = min_width_idx
-        waist_end_idx = min_width_idx
+    return longitud_cintura, x_waist_start, x_waist_end, umbrales
 
-    x_waist_start = x_coords[waist_start_idx]
-    x_waist_end = x_coords[waist_end_idx]
-    longitud_cintura = x_waist_end - x_waist_start
+def recognize_fiber_taper(x_coords, y_upper_coords, y_lower_coords,
+                          taper_angle_threshold_factor=0.03,
+                          waist_angle_threshold_factor=0.005,
+                          width_tolerance_factor=0.05,
+                          factor_prominencia=None):
+    base = base_reconocimiento(x_coords, y_upper_coords, y_lower_coords,
+                               width_tolerance_factor=width_tolerance_factor)
+
+    izq, der, taper_angle_threshold = regiones_taper(base, x_coords, [taper_angle_threshold_factor])
+    x_taper_start = x_coords[izq[0]]
+    x_taper_end   = x_coords[der[0]]
+    taper_length  = x_taper_end - x_taper_start
 
-    # Ajuste final si la cintura es casi un punto
-    if longitud_cintura < (x_coords[1] - x_coords[0]) * 2 and len(x_coords) > 1: # Si es menor a 2 píxeles de longitud
-        longitud_cintura = (x_coords[1] - x_coords[0]) * 2
-        x_waist_start = x_at_min_width - longitud_cintura / 2
-        x_waist_end = x_at_min_width + longitud_cintura / 2
+    longitud_cintura, x_waist_start, x_waist_end, waist_abs_gradient_threshold = \
+        regiones_cintura(base, x_coords, [waist_angle_threshold_factor])
 
-    # --- NUEVO: Longitud de taper por picos del perfil superior ---
-        L_picos, x_pico_izq, x_pico_der = longitud_taper_por_picos_ancho(
-        x_coords, y_upper_coords, y_lower_coords, plot_debug=True
-    )
+    # --- Longitud de taper por valles del perfil de ancho (una sola vez por imagen) ---
+    valles = detectar_valles_ancho(x_coords, y_upper_coords, y_lower_coords,
+                                   factor_prominencia=factor_prominencia)
 
     return {
-        "ancho_nominal": nominal_width,
-        "ancho_minimo_waist": min_width_value,
-        "x_waist": x_at_min_width,
+        "ancho_nominal": base["ancho_nominal"],
+        "ancho_minimo_waist": base["ancho_minimo_waist"],
+        "x_waist": base["x_waist"],
         "longitud_taper": taper_length,
         "x_inicio_taper": x_taper_start,
         "x_fin_taper": x_taper_end,
-        "longitud_cintura": longitud_cintura,
-        "x_inicio_cintura": x_waist_start,
-        "x_fin_cintura": x_waist_end,
-        "perfil_ancho_suavizado": smoothed_widths,
-        "pendientes_ancho_suavizadas": width_gradients,
-        "taper_angle_threshold": taper_angle_threshold,
-        "waist_abs_gradient_threshold": waist_abs_gradient_threshold,
-        "longitud_taper_por_picos": L_picos,
-        "x_pico_izquierdo": x_pico_izq,
-        "x_pico_derecho": x_pico_der
+        "longitud_cintura": longitud_cintura[0],
+        "x_inicio_cintura": x_waist_start[0],
+        "x_fin_cintura": x_waist_end[0],
+        "perfil_ancho_suavizado": base["perfil_ancho_suavizado"],
+        "pendientes_ancho_suavizadas": base["pendientes_ancho_suavizadas"],
+        "taper_angle_threshold": taper_angle_threshold[0],
+        "waist_abs_gradient_threshold": waist_abs_gradient_threshold[0],
+        "longitud_taper_por_picos": valles["longitud"],
+        "x_pico_izquierdo": valles["x_izq"],
+        "x_pico_derecho": valles["x_der"],
+        # Intermedios de la detección de valles, reutilizados por la gráfica de depuración
+        "perfil_ancho_valles": valles["ancho"],
+        "perfil_ancho_valles_suavizado": valles["ancho_suavizado"],
+        "indices_valles": valles["valles"]
     }
 
+def save_text_descarte(txt_path, image_name, motivo, indicadores):
+    with open(txt_path, 'w', encoding='utf-8') as f:
+        f.write(f"Imagen: {image_name}\n")
+        f.write(f"Descartada: {motivo}\n")
+        f.write(f"Bordes por columna: {indicadores[0]:.4f}\n")
+        f.write(f"Fracción sin borde: {indicadores[1]:.4f}\n")
+        f.write(f"Rango relativo del ancho: {indicadores[2]:.4f}\n")
+
 def plot_and_save_profiles(basepath_png, x_data, y_upper, y_lower, taper_info):
     # Perfil completo del ancho + regiones
     fig1 = plt.figure(figsize=(12, 7))
@@ -453,24 +846,15 @@ def save_text_metrics(txt_path, image_name, info):
         f.write(f"Valle der X: {info['x_pico_derecho']:.4f} µm\n")
 
 # =========================
-# === PIPELINE POR IMAGEN ===
+# === GRÁFICAS DE DEPURACIÓN ===
 # =========================
 
-def process_single_image(image_path):
-    img_name = os.path.splitext(os.path.basename(image_path))[0]
-    basepath = os.path.join(output_dir, img_name)
-
-    # 1) Canny (guardar PNG)
-    edges_png = basepath + "_canny.png"
-    edges_img = process_image_with_canny(image_path, save_path_edges_png=edges_png)
-    img_h, img_w = edges_img.shape
+def plot_perfiles_px(basepath, img_name, y_upper_px_raw, y_lower_px_raw,
+                     y_upper_px_smooth, y_lower_px_smooth):
+    x_pixels = np.arange(len(y_upper_px_raw))
 
-    # 2) Perfiles en píxeles
-    y_upper_px_raw, y_lower_px_raw = extract_fiber_edges(edges_img, max_pixel_jump=MAX_PIXEL_JUMP)
-
-    # 3) Visual RAW perfiles (píxeles)
+    # Visual RAW perfiles (píxeles)
     fig = plt.figure(figsize=(10, 4))
-    x_pixels = np.arange(img_w)
     plt.plot(x_pixels, y_upper_px_raw, 'b-', label='Borde Superior (RAW)')
     plt.plot(x_pixels, y_lower_px_raw, 'r-', label='Borde Inferior (RAW)')
     plt.title(f"Perfil de Píxeles (RAW) - {img_name}")
@@ -481,13 +865,6 @@ def process_single_image(image_path):
     fig.savefig(basepath + "_perfil_raw_px.png", dpi=200)
     plt.close(fig)
 
-    # 4) Suavizado
-    y_upper_px_smooth, y_lower_px_smooth = suavizar_perfiles_individuales(
-        y_upper_px_raw, y_lower_px_raw,
-        window_length_factor=SMOOTH_WINDOW_FACTOR,
-        polyorder=SMOOTH_POLYORDER
-    )
-    
     # --- Visualización del perfil suavizado (Individual) ---
     fig_s = plt.figure(figsize=(10, 4))
     plt.plot(x_pixels, y_upper_px_smooth, 'b-', label='Borde Superior (Suavizado)')
@@ -501,8 +878,183 @@ def process_single_image(image_path):
     fig_s.savefig(basepath + "_perfil_suav_px.png", dpi=200)
     plt.close(fig_s)
 
+def plot_valles_ancho(basepath, x_um, info):
+    # Reutiliza los valles ya calculados en recognize_fiber_taper
+    if len(info["perfil_ancho_valles"]) < 5:
+        return
+    valles = {"ancho": info["perfil_ancho_valles"],
+              "ancho_suavizado": info["perfil_ancho_valles_suavizado"],
+              "valles": info["indices_valles"],
+              "x_izq": info["x_pico_izquierdo"],
+              "x_der": info["x_pico_derecho"]}
+    plot_valles(x_um, valles, basepath + "_valles_ancho.png")
+
+# Modo "diferidas": process_single_image solo guarda en <imagen>_graficas.npz
+# los arreglos necesarios; las 6 figuras se generan después con
+# renderizar_graficas (bajo demanda o con --renderizar y varios workers).
+# Al terminar se escribe <imagen>_graficas.hecho: no todas las figuras existen
+# siempre (p. ej. _valles_ancho.png necesita al menos 5 puntos), así que el
+# marcador no puede ser una de ellas.
+
+def guardar_datos_graficas(basepath, image_fname, edges_img,
+                           y_upper_px_raw, y_lower_px_raw,
+                           y_upper_px_smooth, y_lower_px_smooth,
+                           x_um, y_upper_centered, y_lower_centered, info):
+    np.savez_compressed(
+        basepath + "_graficas.npz",
+        image_fname=image_fname,
+        edges=edges_img,
+        y_upper_px_raw=y_upper_px_raw, y_lower_px_raw=y_lower_px_raw,
+        y_upper_px_smooth=y_upper_px_smooth, y_lower_px_smooth=y_lower_px_smooth,
+        x_um=x_um, y_upper_centered=y_upper_centered, y_lower_centered=y_lower_centered,
+        **{"info_" + k: v for k, v in info.items()}
+    )
+
+def renderizar_graficas(npz_path):
+    basepath = npz_path[:-len("_graficas.npz")]
+    img_name = os.path.basename(basepath)
+    with np.load(npz_path) as d:
+        datos = {k: d[k] for k in d.files}
+    info = {k[len("info_"):]: (v.item() if v.ndim == 0 else v)
+            for k, v in datos.items() if k.startswith("info_")}
+
+    plot_canny(datos["edges"], str(datos["image_fname"]), basepath + "_canny.png")
+    plot_perfiles_px(basepath, img_name,
+                     datos["y_upper_px_raw"], datos["y_lower_px_raw"],
+                     datos["y_upper_px_smooth"], datos["y_lower_px_smooth"])
+    plot_and_save_profiles(basepath, datos["x_um"], datos["y_upper_centered"],
+                           datos["y_lower_centered"], info)
+    plot_valles_ancho(basepath, datos["x_um"], info)
+    # Marcador de imagen renderizada (se escribe siempre, haya o no figura de valles)
+    with open(basepath + "_graficas.hecho", 'w', encoding='utf-8'):
+        pass
+    return basepath
+
+def renderizada(npz_path):
+    # Hecho si el marcador existe y no es anterior al .npz (un .npz reescrito vuelve a quedar pendiente)
+    marcador = npz_path[:-len(".npz")] + ".hecho"
+    return os.path.exists(marcador) and os.path.getmtime(marcador) >= os.path.getmtime(npz_path)
+
+def graficas_pendientes():
+    return sorted(
+        os.path.join(output_dir, f) for f in os.listdir(output_dir)
+        if f.endswith("_graficas.npz") and not renderizada(os.path.join(output_dir, f))
+    )
+
+def renderizar_pendientes(workers=1):
+    pendientes = graficas_pendientes()
+    print(f"Gráficas pendientes: {len(pendientes)}")
+    if workers <= 1:
+        for npz_path in pendientes:
+            print("  - Renderizado:", renderizar_graficas(npz_path))
+        return
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        for basepath in pool.map(renderizar_graficas, pendientes):
+            print("  - Renderizado:", basepath)
+
+# =========================
+# === PIPELINE POR IMAGEN ===
+# =========================
 
-    # 5) Escala a µm y centrado
+def indicadores_imagen(n_bordes, y_upper_px_raw, y_lower_px_raw):
+    # [bordes por columna, fracción NaN del ancho RAW, rango relativo del ancho]
+    ancho = y_lower_px_raw - y_upper_px_raw
+    validos = ancho[~np.isnan(ancho)]
+    rango = 0.0
+    if len(validos) > 0:
+        p5, p95 = np.percentile(validos, [5, 95])
+        rango = (p95 - p5) / p95 if p95 > 0 else 0.0
+    return np.array([n_bordes / len(ancho), 1 - len(validos) / len(ancho), rango])
+
+def motivo_descarte(indicadores):
+    # None si la imagen sigue al reconocimiento; si no, el motivo del descarte
+    bordes_por_columna, frac_nan, rango_ancho = indicadores
+    if bordes_por_columna < DESCARTE_MIN_BORDES:
+        return "en_blanco"
+    if bordes_por_columna > DESCARTE_MAX_BORDES or frac_nan > DESCARTE_MAX_NAN:
+        return "ruidosa"
+    if rango_ancho < DESCARTE_MIN_RANGO_ANCHO:
+        return "sin_estirar"
+    return None
+
+def descartar(indicadores):
+    return DESCARTE and motivo_descarte(indicadores) is not None
+
+def perfiles_imagen(image_path, intermedios=True):
+    """
+    Canny -> perfiles RAW -> perfiles suavizados, pasando por la caché si está
+    activa. Con intermedios=False solo se garantiza "suavizado" (basta para
+    las métricas), y un acierto en esa etapa evita leer las anteriores.
+    Devuelve (edges, raw, suavizado, alto_imagen, indicadores); edges/raw
+    pueden ser None, y suavizado es None si la imagen se descarta (un perfil
+    casi todo NaN haría fallar a savgol_filter).
+    """
+    if cache is None:
+        edges_img = process_image_with_canny(image_path)
+        with etapa("bordes"):
+            # En modo pirámide banda_previa es la banda que acaba de usar Canny
+            y_upper_px_raw, y_lower_px_raw = extract_fiber_edges(
+                edges_img, max_pixel_jump=MAX_PIXEL_JUMP, filas=banda_previa if PIRAMIDE else None)
+            indicadores = indicadores_imagen(np.count_nonzero(edges_img), y_upper_px_raw, y_lower_px_raw)
+        if descartar(indicadores):
+            return edges_img, (y_upper_px_raw, y_lower_px_raw), None, edges_img.shape[0], indicadores
+        with etapa("suavizado"):
+            y_upper_px_smooth, y_lower_px_smooth = suavizar_perfiles_individuales(
+                y_upper_px_raw, y_lower_px_raw,
+                window_length_factor=SMOOTH_WINDOW_FACTOR,
+                polyorder=SMOOTH_POLYORDER
+            )
+        return (edges_img, (y_upper_px_raw, y_lower_px_raw),
+                (y_upper_px_smooth, y_lower_px_smooth), edges_img.shape[0], indicadores)
+
+    # Cada clave incluye la de la etapa anterior y solo los parámetros propios
+    k_canny = cache.clave(CACHE_VERSION, hash_archivo(image_path), GAUSSIAN_BLUR_KERNEL,
+                          (PIRAMIDE_NIVELES, PIRAMIDE_MARGEN) if PIRAMIDE else None)
+    k_raw   = cache.clave(k_canny, MAX_PIXEL_JUMP, MAX_GAP_FILL)
+    k_suav  = cache.clave(k_raw, SMOOTH_WINDOW_FACTOR, SMOOTH_POLYORDER)
+
+    edges = raw = None
+    with etapa("cache"):
+        suav = cache.obtener("suavizado", k_suav)
+    if suav is None or intermedios:
+        with etapa("cache"):
+            raw = cache.obtener("perfiles_raw", k_raw)
+        if raw is None or intermedios:
+            with etapa("cache"):
+                edges = cache.obtener("canny", k_canny)
+            if edges is None:
+                edges = {"edges": process_image_with_canny(image_path)}
+                with etapa("cache"):
+                    cache.guardar("canny", k_canny, **edges)
+        if raw is None:
+            with etapa("bordes"):
+                y_upper_px_raw, y_lower_px_raw = extract_fiber_edges(edges["edges"], max_pixel_jump=MAX_PIXEL_JUMP)
+                indicadores = indicadores_imagen(np.count_nonzero(edges["edges"]), y_upper_px_raw, y_lower_px_raw)
+            raw = {"upper": y_upper_px_raw, "lower": y_lower_px_raw,
+                   "alto": np.array(edges["edges"].shape[0]), "indicadores": indicadores}
+            with etapa("cache"):
+                cache.guardar("perfiles_raw", k_raw, **raw)
+    if suav is None and descartar(raw["indicadores"]):
+        return (edges["edges"] if edges is not None else None, (raw["upper"], raw["lower"]),
+                None, int(raw["alto"]), raw["indicadores"])
+    if suav is None:
+        with etapa("suavizado"):
+            y_upper_px_smooth, y_lower_px_smooth = suavizar_perfiles_individuales(
+                raw["upper"], raw["lower"],
+                window_length_factor=SMOOTH_WINDOW_FACTOR,
+                polyorder=SMOOTH_POLYORDER
+            )
+        suav = {"upper": y_upper_px_smooth, "lower": y_lower_px_smooth, "alto": raw["alto"],
+                "indicadores": raw["indicadores"]}
+        with etapa("cache"):
+            cache.guardar("suavizado", k_suav, **suav)
+
+    return (edges["edges"] if edges is not None else None,
+            (raw["upper"], raw["lower"]) if raw is not None else None,
+            (suav["upper"], suav["lower"]), int(suav["alto"]), suav["indicadores"])
+
+def perfiles_centrados_um(y_upper_px_smooth, y_lower_px_smooth, img_h):
+    img_w = len(y_upper_px_smooth)
     scale_x_um_per_pixel = length_real_um / img_w
     scale_y_um_per_pixel = height_real_um / img_h
 
@@ -513,28 +1065,99 @@ def process_single_image(image_path):
     centerline = (y_upper_um + y_lower_um) / 2
     y_upper_centered = y_upper_um - centerline
     y_lower_centered = y_lower_um - centerline
+    return x_um, y_upper_centered, y_lower_centered
+
+MODOS_GRAFICAS = ("todas", "ninguna", "diferidas")
+
+def process_single_image(image_path, graficas="todas", devolver_perfiles=False):
+    """
+    graficas:
+      - "todas":     genera las 6 figuras PNG de depuración
+      - "ninguna":   solo métricas, no se renderiza nada
+      - "diferidas": guarda los arreglos en <imagen>_graficas.npz para renderizar después
+    devolver_perfiles: agrega a la fila la clave "perfiles" con
+      (ancho suavizado, pendiente, escala X en µm/px) para el almacén.
+    """
+    if graficas not in MODOS_GRAFICAS:
+        raise ValueError(f"Modo de gráficas no válido: {graficas}")
 
-    # 6) Reconocer regiones
-    info = recognize_fiber_taper(
-        x_um, y_upper_centered, y_lower_centered,
-        taper_angle_threshold_factor=TAPER_ANGLE_THRESHOLD_FACTOR,
-        waist_angle_threshold_factor=WAIST_ANGLE_THRESHOLD_FACTOR
-    )
+    img_name = os.path.splitext(os.path.basename(image_path))[0]
+    if cronometro is not None:
+        cronometro.iniciar_imagen(img_name)
+
+    # 1-3) Canny, perfiles en píxeles y suavizado (con caché si está activa)
+    edges_img, raw, suavizado, img_h, indicadores = perfiles_imagen(image_path, intermedios=graficas != "ninguna")
+    return resultados_imagen(image_path, edges_img, raw, suavizado, img_h, graficas, devolver_perfiles,
+                             indicadores)
+
+def resultados_imagen(image_path, edges_img, raw, suavizado, img_h, graficas="todas", devolver_perfiles=False,
+                      indicadores=None):
+    # Pasos 4-10 de process_single_image a partir de los perfiles ya calculados
+    img_name = os.path.splitext(os.path.basename(image_path))[0]
+    basepath = os.path.join(output_dir, img_name)
+
+    # Descarte temprano: sin reconocimiento ni gráficas
+    if indicadores is not None and descartar(indicadores):
+        motivo = motivo_descarte(indicadores)
+        with etapa("escritura"):
+            save_text_descarte(basepath + "_resultados.txt", img_name, motivo, indicadores)
+        fila = {"imagen": img_name, "descarte": motivo}
+        if cronometro is not None:
+            fila["tiempos"] = cronometro.terminar_imagen()
+        return fila
+
+    y_upper_px_smooth, y_lower_px_smooth = suavizado
+    img_w = len(y_upper_px_smooth)
+
+    # 4) Visual Canny y perfiles RAW y suavizado (píxeles)
+    if graficas == "todas":
+        with etapa("graficas"):
+            plot_canny(edges_img, os.path.basename(image_path), basepath + "_canny.png")
+            plot_perfiles_px(basepath, img_name, raw[0], raw[1],
+                             y_upper_px_smooth, y_lower_px_smooth)
+
+    with etapa("reconocimiento"):
+        # 5) Escala a µm y centrado
+        x_um, y_upper_centered, y_lower_centered = perfiles_centrados_um(
+            y_upper_px_smooth, y_lower_px_smooth, img_h)
+
+        # 6) Reconocer regiones
+        info = recognize_fiber_taper(
+            x_um, y_upper_centered, y_lower_centered,
+            taper_angle_threshold_factor=TAPER_ANGLE_THRESHOLD_FACTOR,
+            waist_angle_threshold_factor=WAIST_ANGLE_THRESHOLD_FACTOR
+        )
 
     # 7) Gráficas finales
-    plot_and_save_profiles(basepath, x_um, y_upper_centered, y_lower_centered, info)
+    if graficas == "todas":
+        with etapa("graficas"):
+            plot_and_save_profiles(basepath, x_um, y_upper_centered, y_lower_centered, info)
 
     # 8) .txt con métricas
-    save_text_metrics(basepath + "_resultados.txt", img_name, info)
-
-    # 9) Extra (opcional): depuración de valles
-    longitud_taper_por_picos_ancho(
-        x_um, y_upper_centered, y_lower_centered,
-        window_length_factor=0.05, polyorder=3,
-        plot_debug=True, debug_path=basepath + "_valles_ancho.png"
-    )
+    with etapa("escritura"):
+        save_text_metrics(basepath + "_resultados.txt", img_name, info)
+
+    # 9) Extra (opcional): depuración de valles, o datos para renderizar todo después
+    if graficas == "todas":
+        with etapa("graficas"):
+            plot_valles_ancho(basepath, x_um, info)
+    elif graficas == "diferidas":
+        with etapa("graficas"):
+            guardar_datos_graficas(basepath, os.path.basename(image_path), edges_img,
+                                   raw[0], raw[1],
+                                   y_upper_px_smooth, y_lower_px_smooth,
+                                   x_um, y_upper_centered, y_lower_centered, info)
 
     # 10) Devolver fila para resumen CSV
+    fila = fila_metricas(img_name, info)
+    if devolver_perfiles:
+        fila["perfiles"] = (info['perfil_ancho_suavizado'], info['pendientes_ancho_suavizadas'],
+                            length_real_um / img_w)
+    if cronometro is not None:
+        fila["tiempos"] = cronometro.terminar_imagen()
+    return fila
+
+def fila_metricas(img_name, info):
     return {
         "imagen": img_name,
         "ancho_nominal_um": info['ancho_nominal'],
@@ -555,11 +1178,263 @@ def process_single_image(image_path):
 # === MAIN: LOTE CARPETA ===
 # =========================
 
+CSV_FIELDNAMES = [
+    "imagen",
+    "ancho_nominal_um", "ancho_min_waist_um", "x_waist_um",
+    "long_taper_grad_um", "x_ini_taper_um", "x_fin_taper_um",
+    "long_cintura_um", "x_ini_cintura_um", "x_fin_cintura_um",
+    "long_taper_valles_um", "x_valle_izq_um", "x_valle_der_um",
+    "descarte"
+]
+CAMPOS_TEXTO = ("imagen", "descarte")
+
 def is_image_file(fname):
     ext = os.path.splitext(fname)[1].lower()
     return ext in {".jpg", ".jpeg", ".png", ".bmp", ".tif", ".tiff"}
 
-def main():
+def ruta_resultados_txt(fname):
+    img_name = os.path.splitext(os.path.basename(fname))[0]
+    return os.path.join(output_dir, img_name + "_resultados.txt")
+
+def fila_desde_txt(txt_path):
+    # Reconstruye la fila del CSV a partir del .txt de métricas.
+    # Las líneas de save_text_metrics siguen el mismo orden que CSV_FIELDNAMES.
+    with open(txt_path, 'r', encoding='utf-8') as f:
+        lineas = [l.strip() for l in f if l.strip()]
+    row = {"imagen": lineas[0].split(":", 1)[1].strip()}
+    if len(lineas) > 1 and lineas[1].startswith("Descartada:"):
+        row["descarte"] = lineas[1].split(":", 1)[1].strip()
+        return row
+    for campo, linea in zip(CSV_FIELDNAMES[1:], lineas[1:]):
+        row[campo] = float(linea.split(":", 1)[1].split()[0])
+    return row
+
+def preparar_resumen_csv(resumen_csv):
+    # Devuelve True si hay que escribir el encabezado. Un CSV de una versión
+    # anterior (sin columnas nuevas, p. ej. "descarte") se reescribe con el
+    # encabezado actual para poder seguir agregando filas.
+    if not os.path.exists(resumen_csv):
+        return True
+    with open(resumen_csv, 'r', newline='', encoding='utf-8') as f:
+        lector = csv.DictReader(f)
+        if lector.fieldnames == CSV_FIELDNAMES or not lector.fieldnames:
+            return not lector.fieldnames
+        filas = list(lector)
+    with open(resumen_csv, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.DictWriter(f, fieldnames=CSV_FIELDNAMES, extrasaction='ignore')
+        writer.writeheader()
+        writer.writerows(filas)
+    return False
+
+def imagenes_en_csv(resumen_csv):
+    if not os.path.exists(resumen_csv):
+        return set()
+    with open(resumen_csv, 'r', newline='', encoding='utf-8') as f:
+        return {row["imagen"] for row in csv.DictReader(f)}
+
+def _inicializar_trabajador(carpeta_salida, calib, carpeta_cache=None, cache_max_mb=500,
+                            medir_tiempos=False, medir_memoria=False, piramide=False, descarte=True):
+    # Con "spawn" (Windows) los procesos hijos reimportan el script y no ven
+    # los globales modificados desde la línea de comandos.
+    global output_dir, cache, cronometro, PIRAMIDE, DESCARTE
+    output_dir = carpeta_salida
+    PIRAMIDE = piramide
+    DESCARTE = descarte
+    fijar_calibracion(calib)
+    cache = CacheEtapas(carpeta_cache, cache_max_mb) if carpeta_cache else None
+    cronometro = CronometroEtapas(memoria=medir_memoria) if medir_tiempos else None
+
+def procesar_lote(files, workers=1, graficas="todas"):
+    """
+    Procesa las imágenes y entrega (fname, row, error) en el mismo orden de
+    files, aunque en paralelo terminen en otro orden.
+    """
+    perfiles = almacen is not None
+    if workers <= 1:
+        for fname in files:
+            try:
+                yield fname, process_single_image(os.path.join(input_dir, fname), graficas, perfiles), None
+            except Exception as e:
+                yield fname, None, e
+        return
+
+    with ProcessPoolExecutor(max_workers=workers,
+                             initializer=_inicializar_trabajador,
+                             initargs=(output_dir, calibracion,
+                                       cache.carpeta if cache else None,
+                                       cache.max_mb if cache else 500,
+                                       cronometro is not None,
+                                       cronometro is not None and cronometro.memoria,
+                                       PIRAMIDE, DESCARTE)) as pool:
+        futuros = [pool.submit(process_single_image, os.path.join(input_dir, fname), graficas, perfiles)
+                   for fname in files]
+        for fname, futuro in zip(files, futuros):
+            try:
+                yield fname, futuro.result(), None
+            except Exception as e:
+                yield fname, None, e
+
+def parametros_pipeline():
+    # Parámetros que definen una corrida, guardados junto al run_id
+    return {
+        "calibracion": calibracion,
+        "SMOOTH_WINDOW_FACTOR": SMOOTH_WINDOW_FACTOR,
+        "SMOOTH_POLYORDER": SMOOTH_POLYORDER,
+        "GAUSSIAN_BLUR_KERNEL": list(GAUSSIAN_BLUR_KERNEL),
+        "CANNY_LOW_THRESHOLD": CANNY_LOW_THRESHOLD,
+        "CANNY_HIGH_THRESHOLD": CANNY_HIGH_THRESHOLD,
+        "MAX_GAP_FILL": MAX_GAP_FILL,
+        "MAX_PIXEL_JUMP": MAX_PIXEL_JUMP,
+        "TAPER_ANGLE_THRESHOLD_FACTOR": TAPER_ANGLE_THRESHOLD_FACTOR,
+        "WAIST_ANGLE_THRESHOLD_FACTOR": WAIST_ANGLE_THRESHOLD_FACTOR,
+        "factor": factor,
+        "entrada": input_dir,
+    }
+
+def abrir_almacen(ruta, id_corrida=None):
+    global almacen, run_id
+    almacen = AlmacenResultados(ruta, columnas=CSV_FIELDNAMES[1:], columnas_texto=CAMPOS_TEXTO)
+    run_id = id_corrida or time.strftime("%Y%m%d-%H%M%S")
+    almacen.guardar_corrida(run_id, parametros_pipeline())
+    print(f"Almacén de resultados: {ruta} (run_id={run_id})")
+
+def resumen_tiempos():
+    if cronometro is None or not cronometro.registros:
+        return
+    cronometro.imprimir_resumen()
+    tiempos_csv = os.path.join(output_dir, "tiempos_etapas.csv")
+    cronometro.guardar_csv(tiempos_csv)
+    print("Tiempos por imagen:", tiempos_csv)
+
+def perfilar_imagen(nombre, graficas="todas", lineas=25):
+    # cProfile de una sola imagen: guarda <imagen>.prof y muestra las funciones más costosas
+    os.makedirs(output_dir, exist_ok=True)
+    perfil = cProfile.Profile()
+    perfil.runcall(process_single_image, os.path.join(input_dir, nombre), graficas)
+    ruta_prof = os.path.join(output_dir, os.path.splitext(nombre)[0] + ".prof")
+    perfil.dump_stats(ruta_prof)
+    pstats.Stats(perfil).sort_stats("cumulative").print_stats(lineas)
+    print("Perfil cProfile:", ruta_prof, "(abrir con pstats o snakeviz)")
+
+BLOQUE_LOTE = 64   # imágenes con Canny en memoria a la vez en --lote
+
+def procesar_lote_apilado(files, graficas="todas", carpeta_cache=None):
+    """
+    Variante de procesar_lote para --lote: la carpeta se carga como una pila
+    (N, alto, ancho) con caché .npy en memoria mapeada, los bordes se extraen
+    por bloques de imágenes y los N perfiles se suavizan en una sola llamada.
+    Entrega (fname, row, error) igual que procesar_lote; las imágenes que no
+    se pueden leer o no tienen el tamaño de la pila salen con su error.
+    """
+    if graficas not in MODOS_GRAFICAS:
+        raise ValueError(f"Modo de gráficas no válido: {graficas}")
+    carpeta_cache = carpeta_cache or os.path.join(output_dir, "cache_lote")
+    # Las etapas en lote se miden aparte y se reparten entre las imágenes (--tiempos)
+    if cronometro is not None:
+        cronometro.iniciar_lote()
+    t0 = time.perf_counter()
+    with etapa("decodificacion"):
+        pila, validos, errores = cargar_pila(input_dir, files, leer_gris, carpeta_cache)
+    errores = dict(errores)
+    if pila is None:
+        if cronometro is not None:
+            cronometro.terminar_lote(0)
+        for fname in files:
+            yield fname, None, errores[fname]
+        return
+    n, img_h, img_w = pila.shape
+    print(f"Pila de {n} imágenes {img_h}x{img_w} lista en {time.perf_counter() - t0:.2f} s")
+
+    y_upper_px_raw = np.empty((n, img_w))
+    y_lower_px_raw = np.empty((n, img_w))
+    n_bordes = np.empty(n)
+    for i in range(0, n, BLOQUE_LOTE):
+        with etapa("canny"):
+            edges = np.stack([canny_imagen(gray) for gray in pila[i:i + BLOQUE_LOTE]])
+        with etapa("bordes"):
+            y_upper_px_raw[i:i + BLOQUE_LOTE], y_lower_px_raw[i:i + BLOQUE_LOTE] = \
+                extract_fiber_edges(edges, max_pixel_jump=MAX_PIXEL_JUMP)
+            n_bordes[i:i + BLOQUE_LOTE] = np.count_nonzero(edges, axis=(1, 2))
+
+    with etapa("bordes"):
+        indicadores = [indicadores_imagen(n_bordes[i], y_upper_px_raw[i], y_lower_px_raw[i]) for i in range(n)]
+
+    # Una sola llamada para todos los perfiles completos; los que tienen NaN
+    # (descartados, o que fallarían igual que en el modo por imagen) aparte
+    completos = (np.isfinite(y_upper_px_raw).all(axis=1) & np.isfinite(y_lower_px_raw).all(axis=1)
+                 & ~np.array([descartar(ind) for ind in indicadores], dtype=bool))
+    y_upper_px_smooth = np.full_like(y_upper_px_raw, np.nan)
+    y_lower_px_smooth = np.full_like(y_lower_px_raw, np.nan)
+    if completos.any():
+        with etapa("suavizado"):
+            y_upper_px_smooth[completos], y_lower_px_smooth[completos] = suavizar_perfiles_individuales(
+                y_upper_px_raw[completos], y_lower_px_raw[completos],
+                window_length_factor=SMOOTH_WINDOW_FACTOR,
+                polyorder=SMOOTH_POLYORDER
+            )
+    if cronometro is not None:
+        cronometro.terminar_lote(n)
+
+    perfiles = almacen is not None
+    indices = {fname: i for i, fname in enumerate(validos)}
+    for fname in files:
+        if fname in errores:
+            yield fname, None, errores[fname]
+            continue
+        i = indices[fname]
+        try:
+            if cronometro is not None:
+                cronometro.iniciar_imagen(os.path.splitext(fname)[0])
+            suavizado = (y_upper_px_smooth[i], y_lower_px_smooth[i])
+            if not completos[i] and not descartar(indicadores[i]):
+                suavizado = suavizar_perfiles_individuales(
+                    y_upper_px_raw[i], y_lower_px_raw[i],
+                    window_length_factor=SMOOTH_WINDOW_FACTOR,
+                    polyorder=SMOOTH_POLYORDER
+                )
+            # Canny se recalcula (es barato) solo si hace falta para las gráficas
+            edges_img = canny_imagen(pila[i]) if graficas != "ninguna" else None
+            row = resultados_imagen(os.path.join(input_dir, fname), edges_img,
+                                    (y_upper_px_raw[i], y_lower_px_raw[i]),
+                                    suavizado, img_h, graficas, perfiles, indicadores[i])
+            yield fname, row, None
+        except Exception as e:
+            yield fname, None, e
+
+def escribir_fila(writer, csvfile, fname, row, error):
+    print(f"\n=== Procesando: {fname} ===")
+    if isinstance(error, FileNotFoundError):
+        print("  * Error:", error)
+        return
+    if error is not None:
+        print("  * Error inesperado:", error)
+        return
+
+    perfiles = row.pop("perfiles", None)
+    tiempos = row.pop("tiempos", None)
+    t0 = time.perf_counter()
+    writer.writerow(row)
+    csvfile.flush()
+    if almacen is not None:
+        almacen.guardar(run_id, row, *(perfiles or ()))
+    if tiempos is not None:
+        # La escritura del CSV/almacén ocurre en el proceso principal
+        tiempos["escritura_resumen"] = time.perf_counter() - t0
+        cronometro.agregar(tiempos)
+
+    # También imprime a terminal un resumen corto
+    if row.get("descarte"):
+        print(f"  - Descartada: {row['descarte']}")
+        return
+    print(f"  - Ancho nominal: {row['ancho_nominal_um']:.2f} µm")
+    print(f"  - Waist min: {row['ancho_min_waist_um']:.2f} µm en X={row['x_waist_um']:.2f} µm")
+    print(f"  - Long taper (grad): {row['long_taper_grad_um']:.2f} µm")
+    print(f"  - Long cintura: {row['long_cintura_um']:.2f} µm")
+    print(f"  - Long taper (valles): {row['long_taper_valles_um']:.2f} µm")
+
+def main(workers=1, reanudar=False, graficas="todas", lote=False, lote_cache=None):
+    os.makedirs(output_dir, exist_ok=True)
+
     files = [f for f in os.listdir(input_dir) if is_image_file(f)]
     files.sort()
     if not files:
@@ -567,41 +1442,354 @@ def main():
         return
 
     resumen_csv = os.path.join(output_dir, "resumen_resultados.csv")
-    write_header = not os.path.exists(resumen_csv)
+    write_header = preparar_resumen_csv(resumen_csv)
+
+    # Reanudar: no repetir imágenes que ya tienen su .txt de resultados
+    recuperadas = []
+    if reanudar:
+        terminadas = [f for f in files if os.path.exists(ruta_resultados_txt(f))]
+        if terminadas:
+            print(f"Reanudando: se omiten {len(terminadas)} imágenes ya procesadas.")
+        # Una corrida interrumpida puede dejar el .txt escrito sin su fila en el CSV
+        en_csv = imagenes_en_csv(resumen_csv)
+        recuperadas = [f for f in terminadas if os.path.splitext(f)[0] not in en_csv]
+        files = [f for f in files if f not in set(terminadas)]
 
     with open(resumen_csv, 'a', newline='', encoding='utf-8') as csvfile:
-        fieldnames = [
-            "imagen",
-            "ancho_nominal_um", "ancho_min_waist_um", "x_waist_um",
-            "long_taper_grad_um", "x_ini_taper_um", "x_fin_taper_um",
-            "long_cintura_um", "x_ini_cintura_um", "x_fin_cintura_um",
-            "long_taper_valles_um", "x_valle_izq_um", "x_valle_der_um"
-        ]
-        writer = csv.DictWriter(csvfile, fieldnames=fieldnames)
+        writer = csv.DictWriter(csvfile, fieldnames=CSV_FIELDNAMES)
         if write_header:
             writer.writeheader()
 
-        for fname in files:
-            path = os.path.join(input_dir, fname)
-            print(f"\n=== Procesando: {fname} ===")
-            try:
-                row = process_single_image(path)
-                writer.writerow(row)
-
-                # También imprime a terminal un resumen corto
-                print(f"  - Ancho nominal: {row['ancho_nominal_um']:.2f} µm")
-                print(f"  - Waist min: {row['ancho_min_waist_um']:.2f} µm en X={row['x_waist_um']:.2f} µm")
-                print(f"  - Long taper (grad): {row['long_taper_grad_um']:.2f} µm")
-                print(f"  - Long cintura: {row['long_cintura_um']:.2f} µm")
-                print(f"  - Long taper (valles): {row['long_taper_valles_um']:.2f} µm")
-
-            except FileNotFoundError as e:
-                print("  * Error:", e)
-            except Exception as e:
-                print("  * Error inesperado:", e)
+        for fname in recuperadas:
+            row = fila_desde_txt(ruta_resultados_txt(fname))
+            writer.writerow(row)
+            if almacen is not None:
+                almacen.guardar(run_id, row)
+
+        if lote:
+            resultados = procesar_lote_apilado(files, graficas=graficas, carpeta_cache=lote_cache) if files else []
+        else:
+            resultados = procesar_lote(files, workers=workers, graficas=graficas)
+        for fname, row, error in resultados:
+            escribir_fila(writer, csvfile, fname, row, error)
 
     print("\nListo. Revisa la carpeta de salida:", output_dir)
     print("Resumen maestro CSV:", resumen_csv)
+    resumen_tiempos()
+    if graficas == "diferidas":
+        print("Gráficas diferidas: ejecuta con --renderizar para generarlas.")
+
+# =========================
+# === BARRIDO DE PARÁMETROS ===
+# =========================
+
+PARAMETROS_BARRIDO = ["factor", "taper_angle_threshold_factor",
+                      "waist_angle_threshold_factor", "smooth_window_factor"]
+
+def barrido_parametros(image_paths, factores, umbrales_taper, umbrales_cintura, ventanas):
+    """
+    Evalúa todas las combinaciones de parámetros sobre todas las imágenes y
+    devuelve una fila por imagen y combinación.
+     - Canny y perfiles RAW: una vez por imagen.
+     - Suavizado: una llamada por ventana para todas las imágenes juntas.
+     - Reconocimiento: la base y los candidatos a valle una vez por imagen y
+       ventana; los umbrales de taper/cintura y el factor de valles se
+       evalúan vectorizados sobre la grilla.
+    """
+    nombres, raw_up, raw_low, altos = [], [], [], []
+    for path in image_paths:
+        edges_img = process_image_with_canny(path)
+        y_upper_px_raw, y_lower_px_raw = extract_fiber_edges(edges_img, max_pixel_jump=MAX_PIXEL_JUMP)
+        nombres.append(os.path.splitext(os.path.basename(path))[0])
+        raw_up.append(y_upper_px_raw)
+        raw_low.append(y_lower_px_raw)
+        altos.append(edges_img.shape[0])
+
+    # Imágenes agrupadas por ancho para poder apilar los perfiles
+    grupos = {}
+    for i, perfil in enumerate(raw_up):
+        grupos.setdefault(len(perfil), []).append(i)
+
+    filas = []
+    for ventana in ventanas:
+        suavizados = {}
+        for indices in grupos.values():
+            pila_up, pila_low = suavizar_perfiles_individuales(
+                np.vstack([raw_up[i] for i in indices]), np.vstack([raw_low[i] for i in indices]),
+                window_length_factor=ventana, polyorder=SMOOTH_POLYORDER)
+            for j, i in enumerate(indices):
+                suavizados[i] = (pila_up[j], pila_low[j])
+
+        for i, img_name in enumerate(nombres):
+            x_um, y_upper_centered, y_lower_centered = perfiles_centrados_um(*suavizados[i], altos[i])
+
+            base = base_reconocimiento(x_um, y_upper_centered, y_lower_centered)
+            izq, der, _ = regiones_taper(base, x_um, umbrales_taper)
+            long_cint, x_ini_cint, x_fin_cint, _ = regiones_cintura(base, x_um, umbrales_cintura)
+            candidatos = candidatos_valles_ancho(x_um, y_upper_centered, y_lower_centered)
+            valles = [seleccionar_valles(candidatos, f) for f in factores]
+
+            for f, v in zip(factores, valles):
+                for it, t in enumerate(umbrales_taper):
+                    for iw, w in enumerate(umbrales_cintura):
+                        filas.append({
+                            "imagen": img_name,
+                            "factor": f,
+                            "taper_angle_threshold_factor": t,
+                            "waist_angle_threshold_factor": w,
+                            "smooth_window_factor": ventana,
+                            "ancho_nominal_um": base["ancho_nominal"],
+                            "ancho_min_waist_um": base["ancho_minimo_waist"],
+                            "x_waist_um": base["x_waist"],
+                            "long_taper_grad_um": x_um[der[it]] - x_um[izq[it]],
+                            "x_ini_taper_um": x_um[izq[it]],
+                            "x_fin_taper_um": x_um[der[it]],
+                            "long_cintura_um": long_cint[iw],
+                            "x_ini_cintura_um": x_ini_cint[iw],
+                            "x_fin_cintura_um": x_fin_cint[iw],
+                            "long_taper_valles_um": v["longitud"],
+                            "x_valle_izq_um": v["x_izq"],
+                            "x_valle_der_um": v["x_der"],
+                        })
+
+    filas.sort(key=lambda r: (r["imagen"],) + tuple(r[p] for p in PARAMETROS_BARRIDO))
+    return filas
+
+def barrido(factores, umbrales_taper, umbrales_cintura, ventanas):
+    os.makedirs(output_dir, exist_ok=True)
+    files = sorted(f for f in os.listdir(input_dir) if is_image_file(f))
+    if not files:
+        print("No se encontraron imágenes en:", input_dir)
+        return
+
+    n_comb = len(factores) * len(umbrales_taper) * len(umbrales_cintura) * len(ventanas)
+    print(f"Barrido: {len(files)} imágenes x {n_comb} combinaciones")
+    t0 = time.perf_counter()
+    filas = barrido_parametros([os.path.join(input_dir, f) for f in files],
+                               factores, umbrales_taper, umbrales_cintura, ventanas)
+    print(f"  - {len(filas)} filas en {time.perf_counter() - t0:.2f} s")
+
+    barrido_csv = os.path.join(output_dir, "barrido_resultados.csv")
+    with open(barrido_csv, 'w', newline='', encoding='utf-8') as csvfile:
+        writer = csv.DictWriter(csvfile, fieldnames=CSV_FIELDNAMES[:1] + PARAMETROS_BARRIDO + CSV_FIELDNAMES[1:])
+        writer.writeheader()
+        writer.writerows(filas)
+    print("Resultados del barrido:", barrido_csv)
+
+def lista_floats(texto):
+    return [float(v) for v in texto.split(",") if v.strip()]
+
+# =========================
+# === MODO COSTURA ===
+# =========================
+
+def coser_imagenes(image_paths):
+    """
+    Une los perfiles de ancho de capturas solapadas de un mismo taper y
+    reconoce las regiones sobre el perfil completo.
+     - Canny y perfiles RAW por captura, como en process_single_image.
+     - Desplazamiento entre capturas consecutivas por correlación (FFT) de
+       los perfiles de semiancho RAW; ver costura_perfiles.py.
+     - Suavizado del perfil cosido con la misma ventana en píxeles que una
+       captura sola, y recognize_fiber_taper sobre el resultado.
+    Devuelve (info, x_um, y_upper_centered, y_lower_centered, posiciones_um, correlaciones).
+    """
+    semianchos, altos = [], set()
+    for path in image_paths:
+        edges_img = process_image_with_canny(path)
+        y_upper_px_raw, y_lower_px_raw = extract_fiber_edges(edges_img, max_pixel_jump=MAX_PIXEL_JUMP)
+        indicadores = indicadores_imagen(np.count_nonzero(edges_img), y_upper_px_raw, y_lower_px_raw)
+        if descartar(indicadores):
+            raise ValueError(f"{os.path.basename(path)}: {motivo_descarte(indicadores)}, "
+                             "no se puede coser la secuencia")
+        # Centrado en la línea media: la fibra puede moverse en Y entre capturas
+        semianchos.append((y_upper_px_raw - y_lower_px_raw) / 2)
+        altos.add(edges_img.shape[0])
+    if len(altos) != 1:
+        raise ValueError("Las capturas de la costura deben tener el mismo alto")
+    # Píxeles cuadrados: para 640x480 coincide con length_real_um / 640
+    escala_um = height_real_um / altos.pop()
+
+    posiciones, correlaciones = posiciones_secuencia(semianchos, COSTURA_SOLAPE_MIN)
+    x_px, semiancho = coser_perfiles(semianchos, posiciones)
+    # Columnas sin borde en ninguna captura: se interpolan como un hueco más
+    semiancho = fill_gaps_in_profile(semiancho, max_gap=len(semiancho))
+
+    ventana = SMOOTH_WINDOW_FACTOR * len(semianchos[0]) / len(semiancho)
+    y_upper_px_smooth, y_lower_px_smooth = suavizar_perfiles_individuales(
+        semiancho, -semiancho, window_length_factor=ventana, polyorder=SMOOTH_POLYORDER)
+
+    x_um = x_px * escala_um
+    y_upper_centered = y_upper_px_smooth * escala_um
+    y_lower_centered = y_lower_px_smooth * escala_um
+    info = recognize_fiber_taper(
+        x_um, y_upper_centered, y_lower_centered,
+        taper_angle_threshold_factor=TAPER_ANGLE_THRESHOLD_FACTOR,
+        waist_angle_threshold_factor=WAIST_ANGLE_THRESHOLD_FACTOR
+    )
+    posiciones_um = (posiciones - posiciones.min()) * escala_um
+    return info, x_um, y_upper_centered, y_lower_centered, posiciones_um, correlaciones
+
+def costura(graficas="todas"):
+    os.makedirs(output_dir, exist_ok=True)
+    files = sorted(f for f in os.listdir(input_dir) if is_image_file(f))
+    if len(files) < 2:
+        print("Se necesitan al menos dos capturas para la costura en:", input_dir)
+        return
+
+    nombre = os.path.basename(os.path.normpath(input_dir)) + "_costura"
+    basepath = os.path.join(output_dir, nombre)
+    print(f"Costura: {len(files)} capturas")
+    t0 = time.perf_counter()
+    info, x_um, y_upper_centered, y_lower_centered, posiciones_um, correlaciones = coser_imagenes(
+        [os.path.join(input_dir, f) for f in files])
+    print(f"  - perfil de {x_um[-1] / 1000:.2f} mm en {time.perf_counter() - t0:.2f} s")
+
+    with open(basepath + "_posiciones.csv", 'w', newline='', encoding='utf-8') as csvfile:
+        writer = csv.writer(csvfile)
+        writer.writerow(["imagen", "posicion_um", "correlacion"])
+        for i, fname in enumerate(files):
+            r = correlaciones[i - 1] if i > 0 else ""
+            writer.writerow([fname, posiciones_um[i], r])
+            print(f"  {fname:<24}{posiciones_um[i]:>12.1f} µm" + (f"   r = {r:.3f}" if i > 0 else ""))
+            if i > 0 and r < COSTURA_R_MIN:
+                print(f"    * Unión poco confiable con la captura anterior (r < {COSTURA_R_MIN})")
+
+    save_text_metrics(basepath + "_resultados.txt", nombre, info)
+    with open(basepath + "_resumen.csv", 'w', newline='', encoding='utf-8') as csvfile:
+        writer = csv.DictWriter(csvfile, fieldnames=CSV_FIELDNAMES)
+        writer.writeheader()
+        writer.writerow(fila_metricas(nombre, info))
+    if graficas == "todas":
+        plot_and_save_profiles(basepath, x_um, y_upper_centered, y_lower_centered, info)
+        plot_valles_ancho(basepath, x_um, info)
+    print("Resultados de la costura:", basepath + "_resultados.txt")
+
+# =========================
+# === MODO VIGILANCIA ===
+# =========================
+
+def vigilar(graficas="todas", debounce=1.0, intervalo=0.5, max_cola=16):
+    """
+    Proceso continuo: cada imagen nueva que aparece en input_dir se procesa
+    una sola vez y su fila se agrega de inmediato al CSV maestro.
+    Las imágenes con _resultados.txt se consideran ya procesadas.
+    Ctrl+C para terminar.
+    """
+    os.makedirs(output_dir, exist_ok=True)
+
+    resumen_csv = os.path.join(output_dir, "resumen_resultados.csv")
+    write_header = preparar_resumen_csv(resumen_csv)
+
+    ya_procesados = [f for f in os.listdir(input_dir)
+                     if is_image_file(f) and os.path.exists(ruta_resultados_txt(f))]
+    vigilante = VigilanteCarpeta(input_dir, is_image_file, ya_procesados=ya_procesados,
+                                 debounce=debounce, intervalo=intervalo, max_cola=max_cola)
+
+    with open(resumen_csv, 'a', newline='', encoding='utf-8') as csvfile:
+        writer = csv.DictWriter(csvfile, fieldnames=CSV_FIELDNAMES)
+        if write_header:
+            writer.writeheader()
+            csvfile.flush()
+
+        print(f"Vigilando {input_dir} (Ctrl+C para terminar)...")
+        vigilante.iniciar()
+        try:
+            for fname in vigilante:
+                try:
+                    row = process_single_image(os.path.join(input_dir, fname), graficas, almacen is not None)
+                    error = None
+                except Exception as e:
+                    row, error = None, e
+                escribir_fila(writer, csvfile, fname, row, error)
+        except KeyboardInterrupt:
+            print("\nVigilancia detenida.")
+        finally:
+            vigilante.detener()
+
+    print("Resumen maestro CSV:", resumen_csv)
+    resumen_tiempos()
 
 if __name__ == "__main__":
-    main()
+    parser = argparse.ArgumentParser(description="Procesamiento automático de tapers por carpeta")
+    parser.add_argument("--entrada", default=input_dir, help="carpeta con imágenes a procesar")
+    parser.add_argument("--salida", default=output_dir, help="carpeta de salida")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="número de procesos en paralelo (1 = secuencial)")
+    parser.add_argument("--calibracion", type=float, default=calibracion,
+                        help="píxeles por diámetro de fibra (15.15 caracterización, 16.7 validación)")
+    parser.add_argument("--reanudar", action="store_true",
+                        help="omitir imágenes cuyo _resultados.txt ya existe")
+    parser.add_argument("--graficas", choices=MODOS_GRAFICAS, default="todas",
+                        help="todas: PNGs de depuración; ninguna: solo métricas; "
+                             "diferidas: guardar datos para renderizar después")
+    parser.add_argument("--renderizar", action="store_true",
+                        help="solo renderizar las gráficas diferidas pendientes en --salida")
+    parser.add_argument("--cache", default=None, metavar="CARPETA",
+                        help="caché en disco de Canny y perfiles; solo se recalculan las etapas cuyos parámetros cambiaron")
+    parser.add_argument("--cache-max-mb", type=float, default=500,
+                        help="tamaño máximo de la caché (se borran las entradas menos usadas)")
+    parser.add_argument("--lote", action="store_true",
+                        help="cargar la carpeta como una pila de imágenes (caché .npy) y suavizar todo en una llamada")
+    parser.add_argument("--lote-cache", default=None, metavar="CARPETA",
+                        help="carpeta de la pila .npy de --lote (por defecto <salida>/cache_lote)")
+    parser.add_argument("--piramide", action="store_true",
+                        help="buscar la banda de la fibra en la imagen reducida y correr Canny solo en esa banda")
+    parser.add_argument("--sin-descarte", action="store_true",
+                        help="no descartar imágenes en blanco, sin estirar o ruidosas antes del reconocimiento")
+    parser.add_argument("--almacen", default=None, metavar="ARCHIVO",
+                        help="base SQLite donde guardar métricas y perfiles (upsert por run_id e imagen)")
+    parser.add_argument("--run-id", default=None,
+                        help="identificador de la corrida en el almacén (por defecto, fecha y hora)")
+    parser.add_argument("--barrido", action="store_true",
+                        help="evaluar la grilla de parámetros --barrido-* sobre todas las imágenes")
+    parser.add_argument("--barrido-factor", type=lista_floats, default=[factor],
+                        help="valores de factor (prominencia de valles), separados por comas")
+    parser.add_argument("--barrido-taper", type=lista_floats, default=[TAPER_ANGLE_THRESHOLD_FACTOR],
+                        help="valores de TAPER_ANGLE_THRESHOLD_FACTOR, separados por comas")
+    parser.add_argument("--barrido-cintura", type=lista_floats, default=[WAIST_ANGLE_THRESHOLD_FACTOR],
+                        help="valores de WAIST_ANGLE_THRESHOLD_FACTOR, separados por comas")
+    parser.add_argument("--barrido-ventana", type=lista_floats, default=[SMOOTH_WINDOW_FACTOR],
+                        help="valores de SMOOTH_WINDOW_FACTOR, separados por comas")
+    parser.add_argument("--tiempos", action="store_true",
+                        help="medir el tiempo de cada etapa por imagen; resumen p50/p95/máx al final")
+    parser.add_argument("--memoria", action="store_true",
+                        help="con --tiempos, registrar también el pico de memoria por imagen "
+                             "(tracemalloc; hace más lentas las gráficas)")
+    parser.add_argument("--perfilar", default=None, metavar="IMAGEN",
+                        help="ejecutar cProfile sobre una sola imagen de --entrada y guardar el .prof en --salida")
+    parser.add_argument("--costura", action="store_true",
+                        help="tratar las imágenes de --entrada, en orden, como capturas solapadas de un solo taper "
+                             "y reconocerlo sobre el perfil cosido")
+    parser.add_argument("--vigilar", action="store_true",
+                        help="quedarse vigilando --entrada y procesar cada imagen nueva")
+    parser.add_argument("--debounce", type=float, default=1.0,
+                        help="segundos sin cambios antes de considerar completo un archivo (--vigilar)")
+    parser.add_argument("--max-cola", type=int, default=16,
+                        help="máximo de imágenes pendientes en memoria (--vigilar)")
+    args = parser.parse_args()
+
+    input_dir = args.entrada
+    output_dir = args.salida
+    fijar_calibracion(args.calibracion)
+    PIRAMIDE = args.piramide
+    DESCARTE = not args.sin_descarte
+    if args.cache:
+        cache = CacheEtapas(args.cache, args.cache_max_mb)
+    if args.almacen and not (args.renderizar or args.barrido or args.perfilar or args.costura):
+        abrir_almacen(args.almacen, args.run_id)
+    if args.tiempos:
+        cronometro = CronometroEtapas(memoria=args.memoria)
+    if args.perfilar:
+        perfilar_imagen(args.perfilar, graficas=args.graficas)
+    elif args.renderizar:
+        renderizar_pendientes(workers=args.workers)
+    elif args.barrido:
+        barrido(args.barrido_factor, args.barrido_taper, args.barrido_cintura, args.barrido_ventana)
+    elif args.costura:
+        costura(graficas="ninguna" if args.graficas == "ninguna" else "todas")
+    elif args.vigilar:
+        vigilar(graficas=args.graficas, debounce=args.debounce, max_cola=args.max_cola)
+    else:
+        main(workers=args.workers, reanudar=args.reanudar, graficas=args.graficas,
+             lote=args.lote, lote_cache=args.lote_cache)
@@ -0,0 +1,87 @@
+# -- coding: utf-8 --
+"""
+Vigilancia de una carpeta de capturas para el modo --vigilar de PDSeI.
+
+Un hilo revisa la carpeta cada `intervalo` segundos y encola cada archivo
+nuevo una sola vez, cuando su tamaño y fecha de modificación no cambiaron
+durante `debounce` segundos (la cámara terminó de escribirlo).
+
+La cola es acotada: si el procesamiento va más lento que las capturas, el
+hilo deja de encolar y los archivos esperan en disco hasta que haya lugar,
+así una ráfaga de fotos no llena la memoria del PC del laboratorio.
+
+Solo usa la biblioteca estándar.
+"""
+
+import os
+import time
+import queue
+import threading
+
+
+class VigilanteCarpeta:
+    def __init__(self, carpeta, filtro, ya_procesados=(), debounce=1.0, intervalo=0.5, max_cola=16):
+        self.carpeta = carpeta
+        self.filtro = filtro
+        self.debounce = debounce
+        self.intervalo = intervalo
+        self.cola = queue.Queue(maxsize=max_cola)
+
+        self._vistos = set(ya_procesados)   # encolados alguna vez (o procesados antes)
+        self._candidatos = {}               # nombre -> (tamaño, mtime, instante del último cambio)
+        self._detener = threading.Event()
+        self._hilo = None
+
+    def escanear(self):
+        ahora = time.monotonic()
+        nombres = sorted(f for f in os.listdir(self.carpeta)
+                         if self.filtro(f) and f not in self._vistos)
+
+        for nombre in nombres:
+            try:
+                st = os.stat(os.path.join(self.carpeta, nombre))
+            except FileNotFoundError:
+                self._candidatos.pop(nombre, None)
+                continue
+
+            firma = (st.st_size, st.st_mtime)
+            previo = self._candidatos.get(nombre)
+            if previo is None or previo[:2] != firma:
+                # Nuevo o todavía escribiéndose: reiniciar el debounce
+                self._candidatos[nombre] = firma + (ahora,)
+                continue
+
+            if st.st_size == 0 or ahora - previo[2] < self.debounce:
+                continue
+
+            try:
+                self.cola.put_nowait(nombre)
+            except queue.Full:
+                break   # se reintenta en el siguiente escaneo
+            self._vistos.add(nombre)
+            del self._candidatos[nombre]
+
+    def _bucle(self):
+        while not self._detener.is_set():
+            try:
+                self.escanear()
+            except OSError as e:
+                print("  * Error al revisar la carpeta:", e)
+            self._detener.wait(self.intervalo)
+
+    def iniciar(self):
+        self._hilo = threading.Thread(target=self._bucle, daemon=True)
+        self._hilo.start()
+
+    def detener(self):
+        self._detener.set()
+        if self._hilo is not None:
+            self._hilo.join()
+
+    def __iter__(self):
+        # Entrega los archivos listos, en orden de llegada, hasta que se detenga
+        while not self._detener.is_set():
+            try:
+                yield self.cola.get(timeout=self.intervalo)
+            except queue.Empty:
+                continue